@@ -0,0 +1,129 @@
+# acumuladores.py
+
+# ==============================================================================
+# ACUMULADORES EN CURSO POR AÑO Y POR MES
+# ==============================================================================
+# En vez de copiar la serie diaria a listas por año (y luego promediarlas), cada
+# valor se suma a unas estadísticas en curso (n, suma, mín, máx) de su año y de su
+# mes. La memoria depende sólo de la cantidad de años/meses y de variables, nunca
+# de la cantidad de días. Junto con lector_json.py permite agregar una descarga de
+# décadas sin construir nunca el JSON completo.
+
+from datetime import date
+
+# Posiciones dentro de cada estadística [n, suma, mín, máx]
+N, SUMA, MINIMO, MAXIMO = range(4)
+
+
+class AcumuladorPeriodos:
+    """
+    Estadísticas en curso por variable, por año y por mes. El día de cada valor se
+    deduce de la fecha inicial de la descarga y de su índice en el arreglo.
+    """
+
+    def __init__(self, inicio):
+        if isinstance(inicio, str):
+            inicio = date.fromisoformat(inicio)
+        self.inicio = inicio
+        self.reiniciar()
+
+    def reiniciar(self):
+        # { 1980: {'temperature_2m_max': [n, suma, mín, máx], ...}, ... }
+        self.años = {}
+        # { (1980, 1): {...}, ... }
+        self.meses = {}
+
+    def agregar(self, variable, indice, valor):
+        """
+        Suma un valor diario (los None y la columna 'time' se ignoran).
+        """
+        if valor is None or variable == 'time':
+            return
+        dia = date.fromordinal(self.inicio.toordinal() + indice)
+        for grupos, clave in ((self.años, dia.year), (self.meses, (dia.year, dia.month))):
+            grupo = grupos.get(clave)
+            if grupo is None:
+                grupo = grupos[clave] = {}
+            stats = grupo.get(variable)
+            if stats is None:
+                grupo[variable] = [1, valor, valor, valor]
+            else:
+                stats[N] += 1
+                stats[SUMA] += valor
+                if valor < stats[MINIMO]:
+                    stats[MINIMO] = valor
+                if valor > stats[MAXIMO]:
+                    stats[MAXIMO] = valor
+
+    def agregar_diario(self, daily):
+        """
+        Suma un bloque 'daily' ya cargado (mismo formato que la respuesta de la API).
+        """
+        for variable, serie in daily.items():
+            for indice, valor in enumerate(serie):
+                self.agregar(variable, indice, valor)
+
+    def anual(self):
+        """
+        Serie anual para los gráficos de evolución, en el formato de process_daily_to_annual.
+        Sólo se incluyen los años con temperaturas máxima y mínima.
+        """
+        final_data = []
+        for year in sorted(self.años):
+            g = self.años[year]
+            tmax = g.get('temperature_2m_max')
+            tmin = g.get('temperature_2m_min')
+            if not tmax or not tmin:
+                continue
+            final_data.append({
+                'year': str(year),
+                'temp_max_avg': round(tmax[SUMA] / tmax[N], 1),
+                'temp_min_avg': round(tmin[SUMA] / tmin[N], 1),
+                'precip_sum': round(g['precipitation_sum'][SUMA], 1) if 'precipitation_sum' in g else 0,
+                'radiation_sum': round(g['shortwave_radiation_sum'][SUMA], 1) if 'shortwave_radiation_sum' in g else 0,
+            })
+        return final_data
+
+    def matriz_mensual(self, variable, estadistica, decimales=1):
+        """
+        Matriz densa año × mes de una variable: (años, [[12 valores], ...]).
+        'estadistica' es 'media', 'suma', 'minimo' o 'maximo'; los meses sin datos son None.
+        """
+        años = sorted(self.años)
+        matriz = []
+        for año in años:
+            fila = []
+            for mes in range(1, 13):
+                stats = self.meses.get((año, mes), {}).get(variable)
+                if stats is None:
+                    fila.append(None)
+                    continue
+                if estadistica == 'media':
+                    valor = stats[SUMA] / stats[N]
+                elif estadistica == 'suma':
+                    valor = stats[SUMA]
+                elif estadistica == 'minimo':
+                    valor = stats[MINIMO]
+                else:
+                    valor = stats[MAXIMO]
+                fila.append(round(valor, decimales))
+            matriz.append(fila)
+        return años, matriz
+
+    def combinar(self, otro):
+        """
+        Suma a este acumulador los periodos de otro (ej: el tramo siguiente de la serie).
+        """
+        for grupos, otros in ((self.años, otro.años), (self.meses, otro.meses)):
+            for clave, variables in otros.items():
+                grupo = grupos.setdefault(clave, {})
+                for variable, stats in variables.items():
+                    actual = grupo.get(variable)
+                    if actual is None:
+                        grupo[variable] = list(stats)
+                    else:
+                        actual[N] += stats[N]
+                        actual[SUMA] += stats[SUMA]
+                        actual[MINIMO] = min(actual[MINIMO], stats[MINIMO])
+                        actual[MAXIMO] = max(actual[MAXIMO], stats[MAXIMO])
+        return self
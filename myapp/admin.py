@@ -1,3 +1,64 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-# Register your models here.
+from .models import RegistroClima, RegistroDiario
+from .logica_exportacion import FILAS_POR_LOTE, respuesta_exportacion, validar_formato
+
+# Tipo de columna de exportación según el tipo de campo del modelo
+TIPOS_EXPORTACION = {
+    'DateField': 'fecha',
+    'DateTimeField': 'fecha_hora',
+    'FloatField': 'real',
+    'DecimalField': 'real',
+    'IntegerField': 'entero',
+    'BigAutoField': 'entero',
+}
+
+
+# ==============================================================================
+# ACCIONES DE EXPORTACIÓN (CSV / NDJSON / PARQUET)
+# ==============================================================================
+class ExportacionAdminMixin:
+    """
+    Añade acciones que exportan los registros seleccionados en streaming,
+    recorriendo la consulta por lotes (memoria constante).
+    """
+    actions = ['exportar_csv', 'exportar_ndjson', 'exportar_parquet']
+
+    def _exportar(self, request, queryset, formato):
+        error = validar_formato(formato)
+        if error:
+            self.message_user(request, error, level=messages.ERROR)
+            return None
+
+        campos = [f for f in self.model._meta.concrete_fields]
+        columnas = [f.attname for f in campos]
+        tipos = [TIPOS_EXPORTACION.get(f.get_internal_type(), 'texto') for f in campos]
+        filas = queryset.values_list(*columnas).iterator(chunk_size=FILAS_POR_LOTE)
+        return respuesta_exportacion(filas, columnas, tipos, formato, self.model._meta.model_name)
+
+    @admin.action(description="Exportar seleccionados a CSV")
+    def exportar_csv(self, request, queryset):
+        return self._exportar(request, queryset, 'csv')
+
+    @admin.action(description="Exportar seleccionados a NDJSON")
+    def exportar_ndjson(self, request, queryset):
+        return self._exportar(request, queryset, 'ndjson')
+
+    @admin.action(description="Exportar seleccionados a Parquet")
+    def exportar_parquet(self, request, queryset):
+        return self._exportar(request, queryset, 'parquet')
+
+
+@admin.register(RegistroClima)
+class RegistroClimaAdmin(ExportacionAdminMixin, admin.ModelAdmin):
+    list_display = ('region', 'año', 'temp_max_anual', 'fecha_creacion')
+    list_filter = ('region',)
+
+
+@admin.register(RegistroDiario)
+class RegistroDiarioAdmin(ExportacionAdminMixin, admin.ModelAdmin):
+    list_display = ('celda', 'fecha', 'temp_max', 'temp_min', 'precipitacion', 'viento_max', 'radiacion', 'humedad_max')
+    list_filter = ('celda',)
+    date_hierarchy = 'fecha'
+    # Con millones de filas, el conteo exacto del paginador es demasiado costoso
+    show_full_result_count = False
@@ -0,0 +1,116 @@
+# almacen.py
+
+# ==============================================================================
+# ALMACÉN LOCAL DE DATOS DIARIOS (RegistroDiario)
+# ==============================================================================
+# Guarda en la base de datos los días ya cerrados que se descargan del archivo de
+# Open-Meteo, con la clave canónica de la celda de grilla. Así la serie histórica
+# se puede exportar (logica_exportacion.py) sin volver a pedirla a la API.
+# Cada guardado enciende los días correspondientes en el índice de cobertura
+# (cobertura.py), que usa cliente_api.py para pedir a la API sólo lo que falta.
+#
+# En PostgreSQL los días se cargan con COPY a una tabla temporal y un solo
+# INSERT ... ON CONFLICT (ver copiar_diario); en SQLite, con bulk_create por lotes.
+
+import csv
+import io
+from datetime import date
+
+from django.db import connection, transaction
+
+from .models import RegistroDiario, VARIABLES_REGISTRO_DIARIO
+from .cobertura import marcar_cobertura
+
+# Filas por INSERT al guardar
+TAMAÑO_LOTE = 2000
+
+
+def guardar_diario(celda, daily, hasta=None):
+    """
+    Guarda (o completa) en RegistroDiario los días de un bloque 'daily' de la API.
+    Sólo se escriben las variables presentes en la respuesta y los días <= 'hasta'.
+    Devuelve la cantidad de días guardados.
+    """
+    times = daily.get('time') or []
+    campos = {var: campo for var, campo in VARIABLES_REGISTRO_DIARIO.items() if var in daily}
+    if not times or not campos:
+        return 0
+
+    filas = []
+    for i, date_str in enumerate(times):
+        fecha = date.fromisoformat(date_str)
+        if hasta and fecha > hasta:
+            break  # Las fechas vienen ordenadas: el resto tampoco está cerrado
+        filas.append((celda, fecha, *(daily[var][i] for var in campos)))
+
+    # Si el día ya existe (ej: guardado por una descarga con menos variables), se completa
+    if connection.vendor == 'postgresql':
+        copiar_diario(filas, list(campos.values()))
+    else:
+        RegistroDiario.objects.bulk_create(
+            [RegistroDiario(celda=c, fecha=f, **dict(zip(campos.values(), valores))) for c, f, *valores in filas],
+            batch_size=TAMAÑO_LOTE,
+            update_conflicts=True,
+            unique_fields=['celda', 'fecha'],
+            update_fields=list(campos.values()),
+        )
+    # Sólo cuentan como guardados los días que trajeron valor para la variable
+    marcar_cobertura(celda, {
+        var: [fila[1] for fila in filas if fila[2 + j] is not None]
+        for j, var in enumerate(campos)
+    })
+    return len(filas)
+
+
+def copiar_diario(filas, campos):
+    """
+    Upsert de filas (celda, fecha, *campos) por COPY (PostgreSQL): se copian a una
+    tabla temporal y se fusionan con RegistroDiario en un solo INSERT ... ON CONFLICT.
+    """
+    comillas = connection.ops.quote_name
+    columnas = ['celda', 'fecha', *campos]
+    definicion = ', '.join(
+        f"{comillas(c)} {RegistroDiario._meta.get_field(c).db_type(connection)}" for c in columnas
+    )
+    lista = ', '.join(comillas(c) for c in columnas)
+    actualizar = ', '.join(f"{comillas(c)} = EXCLUDED.{comillas(c)}" for c in campos)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE registro_diario_copia ({definicion}) ON COMMIT DROP")
+        copia = f"COPY registro_diario_copia ({lista}) FROM STDIN"
+        crudo = cursor.cursor
+        if hasattr(crudo, 'copy'):
+            # psycopg 3
+            with crudo.copy(copia) as destino:
+                for fila in filas:
+                    destino.write_row(fila)
+        else:
+            # psycopg2: las filas van como CSV (campo vacío sin comillas = NULL)
+            archivo = io.StringIO()
+            csv.writer(archivo).writerows(filas)
+            archivo.seek(0)
+            crudo.copy_expert(f"{copia} WITH (FORMAT csv)", archivo)
+        cursor.execute(
+            f"INSERT INTO {comillas(RegistroDiario._meta.db_table)} ({lista}) "
+            f"SELECT {lista} FROM registro_diario_copia "
+            f"ON CONFLICT (celda, fecha) DO UPDATE SET {actualizar}"
+        )
+        # Se borra ya: un guardado posterior en la misma transacción la vuelve a crear
+        cursor.execute("DROP TABLE registro_diario_copia")
+
+
+def leer_diario(celda, desde, hasta, variables):
+    """
+    Bloque 'daily' (mismo formato que la API) de [desde, hasta] leído del almacén, o
+    None si falta algún día o algún valor (el índice de cobertura quedó desactualizado).
+    """
+    campos = [VARIABLES_REGISTRO_DIARIO[v] for v in variables]
+    filas = list(RegistroDiario.objects.filter(celda=celda, fecha__range=(desde, hasta))
+                 .order_by('fecha').values_list('fecha', *campos))
+    if len(filas) != (hasta - desde).days + 1 or any(None in fila for fila in filas):
+        return None
+
+    daily = {'time': [fila[0].isoformat() for fila in filas]}
+    for j, variable in enumerate(variables):
+        daily[variable] = [fila[j + 1] for fila in filas]
+    return daily
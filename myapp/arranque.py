@@ -0,0 +1,119 @@
+# arranque.py
+
+# ==============================================================================
+# ARRANQUE RÁPIDO DE LOS PROCESOS DEL SERVIDOR
+# ==============================================================================
+# Los procesos web se crean y destruyen según el tráfico, así que cada uno debe
+# quedar listo pronto:
+#   - importacion_diferida(): los módulos pesados (ej: 'requests', ~100 ms de
+#     importación) no se cargan al importar la app, así que los comandos y las
+#     pruebas que no los usan no pagan ese costo.
+#   - precalentar(): lo llaman wsgi.py / asgi.py ANTES de que el proceso reciba
+#     tráfico: resuelve las rutas, compila las plantillas (loader en caché, ver
+#     settings.TEMPLATES), importa los módulos diferidos, abre la caché y carga el
+#     registro de comunas y el manifiesto de snapshots. Así la primera petición
+#     tampoco paga ninguna de esas cargas.
+# El comando 'perfil_arranque' mide el efecto de ambos en un proceso nuevo.
+
+import importlib
+import time
+from pathlib import Path
+
+
+class ModuloDiferido:
+    """
+    Sustituto de un módulo que lo importa en el primer acceso a un atributo.
+    Seguro entre hilos: import_module usa el bloqueo de importación de Python.
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+
+    def __getattr__(self, atributo):
+        return getattr(importlib.import_module(self._nombre), atributo)
+
+    def __repr__(self):
+        return f"<módulo diferido '{self._nombre}'>"
+
+
+def importacion_diferida(nombre):
+    """
+    Uso: requests = importacion_diferida('requests') en lugar de 'import requests'.
+    """
+    return ModuloDiferido(nombre)
+
+# ==============================================================================
+# PRECALENTAMIENTO (antes de aceptar tráfico)
+# ==============================================================================
+def _rutas():
+    from django.urls import get_resolver
+    # Importa myapp.urls y con ello todas las vistas y módulos de lógica
+    get_resolver().reverse_dict
+
+
+def _plantillas():
+    from django.apps import apps
+    from django.template.loader import get_template
+
+    directorio = Path(apps.get_app_config('myapp').path) / 'templates'
+    for ruta in sorted(directorio.rglob('*.html')):
+        nombre = ruta.relative_to(directorio).as_posix()
+        try:
+            get_template(nombre)
+        except Exception as e:
+            # Una plantilla rota no debe impedir que el proceso arranque
+            print(f"⚠️ No se pudo compilar la plantilla {nombre}: {e}")
+
+    # Los widgets del formulario usan su propio motor de plantillas (FORM_RENDERER)
+    from .forms import ClimaSearchForm
+    str(ClimaSearchForm())
+
+
+# Módulos cargados con importacion_diferida() que un proceso web usa siempre
+MODULOS_DIFERIDOS = ['requests']
+
+
+def _modulos_diferidos():
+    for nombre in MODULOS_DIFERIDOS:
+        importlib.import_module(nombre)
+
+
+def _cache():
+    from django.core.cache import cache
+    # Crea el backend de la caché (y su conexión, si es externa)
+    cache.get('precalentar')
+
+
+def _regiones():
+    from .regiones import indice_comunas, opciones_comunas
+    indice_comunas()  # Lee el CSV de comunas y arma el árbol KD
+    opciones_comunas()  # Lista de comunas por región del formulario
+
+
+def _snapshots():
+    from .snapshots import leer_manifiesto
+    leer_manifiesto()
+
+
+ETAPAS_PRECALENTAMIENTO = [
+    ('rutas', _rutas),
+    ('plantillas', _plantillas),
+    ('modulos_diferidos', _modulos_diferidos),
+    ('cache', _cache),
+    ('regiones', _regiones),
+    ('snapshots', _snapshots),
+]
+
+
+def precalentar():
+    """
+    Deja el proceso listo para responder rápido desde la primera petición.
+    Devuelve los milisegundos de cada etapa.
+    """
+    tiempos = {}
+    for nombre, etapa in ETAPAS_PRECALENTAMIENTO:
+        inicio = time.perf_counter()
+        etapa()
+        tiempos[nombre] = round((time.perf_counter() - inicio) * 1000, 1)
+    print(f"🔥 Proceso precalentado en {sum(tiempos.values()):.0f} ms {tiempos}")
+    return tiempos
@@ -0,0 +1,438 @@
+# cliente_api.py
+
+# ==============================================================================
+# CLIENTE ÚNICO DE OPEN-METEO (con caché por celda de grilla)
+# ==============================================================================
+# Todas las descargas de los módulos logica_* pasan por aquí: las coordenadas se
+# ajustan a la celda de la grilla y la respuesta se guarda en la caché de Django
+# con la clave canónica de la celda, de modo que regiones con alias (o dos
+# lugares en la misma celda) comparten una sola petición. Los días ya cerrados
+# del archivo se guardan además en el almacén local (almacen.py). Cada petición
+# real consume un token de la cuota compartida entre procesos (cuota_api.py).
+# Las descargas largas se pueden leer en flujo (consultar_en_flujo), agregando los
+# valores a medida que llegan en vez de construir el JSON completo.
+# La caché guarda cada serie (variable) por separado: una consulta que pide sólo
+# algunas variables reutiliza las que ya estén y descarga únicamente las que faltan.
+# Las consultas al archivo (consultar_archivo) leen del almacén los días cerrados
+# ya guardados y piden a la API sólo los rangos que faltan (cobertura.py).
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from .regiones import celda_grilla, clave_celda
+from .almacen import guardar_diario, leer_diario
+from .cobertura import rangos_faltantes
+from .cuota_api import adquirir, registrar_respuesta
+from .lector_json import iterar_arreglos
+from .arranque import importacion_diferida
+from .perfilado import en_hilo_perfilado
+
+# 'requests' (~100 ms de importación) se carga en la primera descarga, no al arrancar
+requests = importacion_diferida('requests')
+
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+
+# Las seis variables diarias que usa calculate_metrics
+VARIABLES_DIARIAS = 'temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max,shortwave_radiation_sum,relative_humidity_2m_max'
+
+# El archivo (ERA5) se publica con unos días de retraso: lo anterior ya no cambia.
+RETRASO_ARCHIVO_DIAS = 5
+TTL_HISTORICO = 60 * 60 * 24 * 30   # 30 días para periodos cerrados
+TTL_RECIENTE = 60 * 60              # 1 hora para pronóstico y días recientes
+
+# Descargas largas (décadas): se dividen en tramos de años que se piden en paralelo
+AÑOS_POR_TRAMO = 5
+MAX_DESCARGAS_CONCURRENTES = 4      # Tamaño del pool: no saturar a Open-Meteo
+REINTENTOS_TRAMO = 3                # Intentos por tramo antes de darlo por fallido
+ESPERA_REINTENTO = 0.5              # Segundos; se duplica en cada reintento
+
+# Tamaño de los bloques que se leen de la respuesta en el modo en flujo
+BYTES_POR_BLOQUE = 64 * 1024
+
+
+def clave_cache(api_url, lat, lon, start_date, end_date, daily, hourly=None):
+    """
+    Clave de caché de una consulta completa, construida sobre la clave canónica de la
+    celda (la usa el modo en flujo, que guarda el acumulador y no las series).
+    """
+    fuente = 'archive' if api_url == ARCHIVE_URL else 'forecast'
+    return f"openmeteo:{fuente}:{clave_celda(lat, lon)}:{start_date}:{end_date}:{daily or ''}:{hourly or ''}"
+
+
+def _ttl(api_url, end_date):
+    """
+    Tiempo de vida en caché según si el periodo ya está cerrado en el archivo.
+    """
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+    cerrado = end_date < date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS)
+    return TTL_HISTORICO if (api_url == ARCHIVE_URL and cerrado) else TTL_RECIENTE
+
+
+def _parametros(lat, lon, start_date, end_date, daily=None, hourly=None):
+    lat_c, lon_c = celda_grilla(lat, lon)
+    params = {
+        'latitude': lat_c,
+        'longitude': lon_c,
+        'start_date': start_date,
+        'end_date': end_date,
+        'timezone': 'auto'
+    }
+    if daily:
+        params['daily'] = daily
+    if hourly:
+        params['hourly'] = hourly
+    return params
+
+
+def clave_serie(api_url, lat, lon, start_date, end_date, seccion, variable):
+    """
+    Clave de caché de UNA serie ('daily' u 'hourly', incluida su columna 'time').
+    """
+    fuente = 'archive' if api_url == ARCHIVE_URL else 'forecast'
+    return f"openmeteo:{fuente}:{clave_celda(lat, lon)}:{start_date}:{end_date}:{seccion}:{variable}"
+
+
+def lista_variables(variables):
+    """
+    'a,b,c' (formato de Open-Meteo) -> ['a', 'b', 'c']; None o '' -> [].
+    """
+    return [v for v in (variables or '').split(',') if v]
+
+
+def claves_series(api_url, lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS, hourly=None):
+    """
+    { clave: (sección, variable) } de todas las series de una consulta.
+    """
+    claves = {}
+    for seccion, variables in (('daily', daily), ('hourly', hourly)):
+        nombres = lista_variables(variables)
+        if nombres:
+            for variable in ['time'] + nombres:
+                claves[clave_serie(api_url, lat, lon, start_date, end_date, seccion, variable)] = (seccion, variable)
+    return claves
+
+
+def armar_respuesta(series):
+    """
+    { (sección, variable): valores } -> {'daily': {...}, 'hourly': {...}} (forma de la API).
+    """
+    api_data = {}
+    for (seccion, variable), valores in series.items():
+        api_data.setdefault(seccion, {})[variable] = valores
+    return api_data
+
+
+def leer_cache(api_url, lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS, hourly=None):
+    """
+    La respuesta armada desde la caché si TODAS sus series están guardadas; si no, None.
+    No descarga nada.
+    """
+    claves = claves_series(api_url, lat, lon, start_date, end_date, daily, hourly)
+    encontradas = cache.get_many(list(claves))
+    if len(encontradas) < len(claves):
+        return None
+    return armar_respuesta({claves[clave]: valores for clave, valores in encontradas.items()})
+
+
+def consultar_open_meteo(api_url, lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS, hourly=None, timeout=None):
+    """
+    Devuelve el JSON de Open-Meteo para la celda que contiene (lat, lon), con sólo
+    las series pedidas. Las que ya están en caché no se vuelven a descargar.
+    Los errores HTTP se propagan (requests.exceptions.HTTPError).
+    """
+    claves = claves_series(api_url, lat, lon, start_date, end_date, daily, hourly)
+    series = {claves[clave]: valores for clave, valores in cache.get_many(list(claves)).items()}
+    if len(series) == len(claves):
+        return armar_respuesta(series)
+
+    # Sólo se piden las variables que faltan (la columna 'time' viene siempre); si lo
+    # único que falta es 'time', se vuelve a pedir la sección completa
+    pedir = {}
+    for seccion, variables in (('daily', daily), ('hourly', hourly)):
+        nombres = lista_variables(variables)
+        faltantes = [v for v in nombres if (seccion, v) not in series]
+        if not faltantes and nombres and (seccion, 'time') not in series:
+            faltantes = nombres
+        pedir[seccion] = ','.join(faltantes) or None
+
+    params = _parametros(lat, lon, start_date, end_date, pedir['daily'], pedir['hourly'])
+
+    # Espera turno en la cuota compartida (las vistas tienen prioridad sobre los comandos)
+    adquirir()
+    response = requests.get(api_url, params=params, timeout=timeout)
+    registrar_respuesta(response.status_code, response.headers.get('Retry-After'))
+    response.raise_for_status()
+    descargado = response.json()
+
+    nuevas = {}
+    for seccion in ('daily', 'hourly'):
+        for variable, valores in (descargado.get(seccion) or {}).items():
+            series[(seccion, variable)] = valores
+            nuevas[clave_serie(api_url, lat, lon, start_date, end_date, seccion, variable)] = valores
+    cache.set_many(nuevas, _ttl(api_url, end_date))
+
+    # Los días cerrados del archivo ya no cambian: se guardan en el almacén local
+    if api_url == ARCHIVE_URL and descargado.get('daily'):
+        try:
+            guardar_diario(clave_celda(lat, lon), descargado['daily'],
+                           hasta=date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS))
+        except DatabaseError as e:
+            # El almacén es un complemento: un fallo al guardar no debe romper la consulta
+            print(f"❌ Error al guardar en el almacén: {str(e)}")
+
+    return armar_respuesta(series)
+
+
+def consultar_en_flujo(api_url, lat, lon, start_date, end_date, acumulador, daily=VARIABLES_DIARIAS, timeout=None):
+    """
+    Como consultar_open_meteo, pero sin construir el JSON: la respuesta se lee por
+    bloques y cada valor diario pasa directo a acumulador.agregar(variable, indice, valor)
+    (ver acumuladores.py). Se guarda en caché el acumulador, que ocupa poco y no
+    depende de la cantidad de días. Devuelve el acumulador con los datos.
+    """
+    clave = f"{clave_cache(api_url, lat, lon, start_date, end_date, daily)}:flujo:{type(acumulador).__name__}"
+    en_cache = cache.get(clave)
+    if en_cache is not None:
+        return en_cache
+
+    # Si es un reintento, se descarta lo acumulado en el intento anterior
+    acumulador.reiniciar()
+
+    adquirir()
+    with requests.get(api_url, params=_parametros(lat, lon, start_date, end_date, daily),
+                      timeout=timeout, stream=True) as response:
+        registrar_respuesta(response.status_code, response.headers.get('Retry-After'))
+        response.raise_for_status()
+        for variable, indice, valor in iterar_arreglos(response.iter_content(BYTES_POR_BLOQUE)):
+            acumulador.agregar(variable, indice, valor)
+
+    cache.set(clave, acumulador, _ttl(api_url, end_date))
+    return acumulador
+
+
+# ==============================================================================
+# ARCHIVO: ALMACÉN LOCAL + SÓLO LOS RANGOS FALTANTES
+# ==============================================================================
+def _como_fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def plan_archivo(celda, variables, start_date, end_date):
+    """
+    Divide [start_date, end_date] en segmentos consecutivos (desde, hasta, origen):
+    'almacen' para los días cerrados ya guardados con todas las variables y 'api'
+    para los que faltan y para los días aún abiertos del archivo.
+    """
+    start_date, end_date = _como_fecha(start_date), _como_fecha(end_date)
+    ultimo_cerrado = date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS)
+    hasta_cerrado = min(end_date, ultimo_cerrado)
+
+    segmentos = []
+    cursor = start_date
+    if start_date <= hasta_cerrado:
+        for desde, hasta in rangos_faltantes(celda, variables, start_date, hasta_cerrado):
+            if desde > cursor:
+                segmentos.append((cursor, desde - timedelta(days=1), 'almacen'))
+            segmentos.append((desde, hasta, 'api'))
+            cursor = hasta + timedelta(days=1)
+        if cursor <= hasta_cerrado:
+            segmentos.append((cursor, hasta_cerrado, 'almacen'))
+            cursor = hasta_cerrado + timedelta(days=1)
+
+    # Días abiertos: siempre a la API, unidos al último faltante si son contiguos
+    if cursor <= end_date:
+        if segmentos and segmentos[-1][2] == 'api':
+            segmentos[-1] = (segmentos[-1][0], end_date, 'api')
+        else:
+            segmentos.append((cursor, end_date, 'api'))
+    return segmentos
+
+
+def consultar_archivo(lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS, hourly=None, timeout=None):
+    """
+    Como consultar_open_meteo(ARCHIVE_URL, ...), pero los días cerrados que ya están
+    en el almacén se leen de ahí y a la API sólo van los rangos faltantes.
+    Lo horario no se guarda en el almacén: siempre sale de la caché o de la API.
+    """
+    en_cache = leer_cache(ARCHIVE_URL, lat, lon, start_date, end_date, daily, hourly)
+    if en_cache is not None:
+        return en_cache
+
+    celda = clave_celda(lat, lon)
+    variables = lista_variables(daily)
+    segmentos = plan_archivo(celda, variables, start_date, end_date) if variables else []
+    if not segmentos or (hourly and any(origen == 'api' for _d, _h, origen in segmentos)):
+        # Hay que descargar de todos modos: una sola petición con lo diario y lo horario
+        return consultar_open_meteo(ARCHIVE_URL, lat, lon, start_date, end_date, daily, hourly, timeout)
+
+    unido = {}
+    for desde, hasta, origen in segmentos:
+        parte = leer_diario(celda, desde, hasta, variables) if origen == 'almacen' else None
+        if parte is None:
+            # Faltante (o índice desactualizado): se descarga y se guarda en el almacén
+            parte = consultar_open_meteo(ARCHIVE_URL, lat, lon, desde, hasta, daily, None, timeout).get('daily') or {}
+        for variable, serie in parte.items():
+            unido.setdefault(variable, []).extend(serie)
+
+    api_data = {'daily': unido} if unido else {}
+    if hourly:
+        api_data.update(consultar_open_meteo(ARCHIVE_URL, lat, lon, start_date, end_date, None, hourly, timeout))
+    return api_data
+
+
+def consultar_archivo_en_flujo(lat, lon, start_date, end_date, crear_acumulador, daily=VARIABLES_DIARIAS, timeout=None):
+    """
+    Acumulador (ej: AcumuladorPeriodos) de un tramo del archivo: los días guardados se
+    agregan desde el almacén y sólo los rangos faltantes se leen de la API en flujo.
+    """
+    celda = clave_celda(lat, lon)
+    variables = lista_variables(daily)
+    acumulador = crear_acumulador(_como_fecha(start_date))
+    for desde, hasta, origen in plan_archivo(celda, variables, start_date, end_date):
+        diario = leer_diario(celda, desde, hasta, variables) if origen == 'almacen' else None
+        if diario is not None:
+            parte = crear_acumulador(desde)
+            parte.agregar_diario(diario)
+        else:
+            parte = consultar_en_flujo(ARCHIVE_URL, lat, lon, desde.isoformat(), hasta.isoformat(),
+                                       crear_acumulador(desde), daily, timeout)
+        acumulador.combinar(parte)
+    return acumulador
+
+# ==============================================================================
+# DESCARGAS LARGAS: TRAMOS CONCURRENTES CON REINTENTOS
+# ==============================================================================
+def dividir_en_tramos(start_date, end_date, años_por_tramo=AÑOS_POR_TRAMO):
+    """
+    Divide [start_date, end_date] en tramos de 'años_por_tramo' años alineados al
+    1 de enero, devueltos como strings ISO en orden cronológico.
+    """
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    if isinstance(end_date, str):
+        end_date = date.fromisoformat(end_date)
+
+    tramos = []
+    inicio = start_date
+    while inicio <= end_date:
+        fin = min(date(inicio.year + años_por_tramo - 1, 12, 31), end_date)
+        tramos.append((inicio.isoformat(), fin.isoformat()))
+        inicio = fin + timedelta(days=1)
+    return tramos
+
+
+def _es_reintentable(error):
+    """
+    Errores de red, 5xx y 429 se reintentan; un 4xx (parámetros inválidos) no.
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        codigo = error.response.status_code
+        return codigo == 429 or codigo >= 500
+    return isinstance(error, requests.exceptions.RequestException)
+
+
+def _con_reintentos(consulta, *args):
+    """
+    Ejecuta una consulta de UN tramo con reintentos y espera exponencial.
+    """
+    for intento in range(REINTENTOS_TRAMO):
+        try:
+            return consulta(*args)
+        except requests.exceptions.RequestException as e:
+            if intento == REINTENTOS_TRAMO - 1 or not _es_reintentable(e):
+                raise
+            time.sleep(ESPERA_REINTENTO * (2 ** intento))
+
+
+def consultar_con_reintentos(api_url, lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS, hourly=None, timeout=None):
+    """
+    consultar_open_meteo con reintentos y espera exponencial para UN tramo.
+    """
+    return _con_reintentos(consultar_open_meteo, api_url, lat, lon, start_date, end_date, daily, hourly, timeout)
+
+
+def _descargar_tramo(consulta, *args):
+    """
+    Tarea del pool: descarga un tramo y cierra las conexiones a la BD que abrió el hilo.
+    """
+    try:
+        return _con_reintentos(consulta, *args)
+    finally:
+        connections.close_all()
+
+
+def iterar_en_paralelo(tareas):
+    """
+    Ejecuta las tareas [(consulta, *args), ...] en un pool acotado, cada una con sus
+    reintentos, y genera (resultado, error) EN EL MISMO ORDEN a medida que están listas.
+    """
+    executor = ThreadPoolExecutor(max_workers=MAX_DESCARGAS_CONCURRENTES)
+    try:
+        # Cada tarea corre en una copia del contexto: hereda la prioridad de la cuota
+        # y, si la petición se está perfilando, se perfila también en su hilo
+        futuros = [
+            executor.submit(contextvars.copy_context().run, en_hilo_perfilado, _descargar_tramo, *tarea)
+            for tarea in tareas
+        ]
+        for futuro in futuros:
+            try:
+                yield futuro.result(), None
+            except Exception as e:
+                yield None, e
+    finally:
+        # Si el consumidor se detiene (ej: el cliente cerró el streaming) no se descargan las tareas pendientes
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iterar_tramos(api_url, lat, lon, tramos, daily=VARIABLES_DIARIAS, timeout=None, crear_acumulador=None):
+    """
+    Descarga los tramos en paralelo (pool acotado) y los entrega EN ORDEN a medida
+    que están listos: genera (start_date, end_date, api_data, error).
+    Con 'crear_acumulador' (ej: AcumuladorPeriodos) cada tramo se lee en flujo y en
+    lugar de api_data se entrega el acumulador creado con crear_acumulador(start_date).
+    """
+    # Del archivo sólo se descargan los rangos que no están en el almacén
+    def tarea(start, end):
+        if crear_acumulador is not None:
+            if api_url == ARCHIVE_URL:
+                return (consultar_archivo_en_flujo, lat, lon, start, end, crear_acumulador, daily, timeout)
+            return (consultar_en_flujo, api_url, lat, lon, start, end, crear_acumulador(start), daily, timeout)
+        if api_url == ARCHIVE_URL:
+            return (consultar_archivo, lat, lon, start, end, daily, None, timeout)
+        return (consultar_open_meteo, api_url, lat, lon, start, end, daily, None, timeout)
+
+    resultados = iterar_en_paralelo([tarea(start, end) for start, end in tramos])
+    try:
+        for (start, end), (api_data, error) in zip(tramos, resultados):
+            yield start, end, api_data, error
+    finally:
+        resultados.close()
+
+
+def consultar_diario_por_tramos(api_url, lat, lon, start_date, end_date, daily=VARIABLES_DIARIAS,
+                                años_por_tramo=AÑOS_POR_TRAMO, timeout=None):
+    """
+    Equivalente a consultar_open_meteo para rangos largos: descarga por tramos en
+    paralelo y devuelve un único {'daily': {...}} con las series unidas en orden.
+    Si un tramo falla tras sus reintentos, se propaga su error.
+    """
+    tramos = dividir_en_tramos(start_date, end_date, años_por_tramo)
+    if len(tramos) == 1:
+        if api_url == ARCHIVE_URL:
+            return _con_reintentos(consultar_archivo, lat, lon, start_date, end_date, daily, None, timeout)
+        return consultar_con_reintentos(api_url, lat, lon, start_date, end_date, daily, None, timeout)
+
+    unido = {}
+    for _start, _end, api_data, error in iterar_tramos(api_url, lat, lon, tramos, daily, timeout):
+        if error is not None:
+            raise error
+        for clave, serie in (api_data.get('daily') or {}).items():
+            unido.setdefault(clave, []).extend(serie)
+
+    return {'daily': unido} if unido else {}
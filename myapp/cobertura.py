@@ -0,0 +1,135 @@
+# cobertura.py
+
+# ==============================================================================
+# ÍNDICE DE COBERTURA DEL ALMACÉN (UN BIT POR DÍA, CELDA Y VARIABLE)
+# ==============================================================================
+# Para servir una consulta desde el almacén local hay que saber qué días ya están
+# guardados. En vez de contar filas de RegistroDiario en cada petición, cada celda
+# y variable tiene un mapa de bits (CoberturaDatos): bit i = día 1940-01-01 + i.
+# Los rangos faltantes de un periodo se obtienen con operaciones sobre enteros de
+# Python (un mapa de ~90 años ocupa ~4 KB), en microsegundos.
+
+from datetime import date, timedelta
+from django.db import transaction
+
+from .models import CoberturaDatos, VARIABLES_REGISTRO_DIARIO
+
+# Primer día representable (inicio de la serie ERA5 de Open-Meteo)
+FECHA_BASE_COBERTURA = date(1940, 1, 1)
+
+
+def _indice(dia):
+    return (dia - FECHA_BASE_COBERTURA).days
+
+
+def _como_fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+# ==============================================================================
+# OPERACIONES SOBRE LOS MAPAS DE BITS
+# ==============================================================================
+def mascara_de_fechas(fechas):
+    """
+    Entero con un bit encendido por cada fecha (>= FECHA_BASE_COBERTURA). Las fechas
+    consecutivas se encienden de a un rango por vez, no de a un bit.
+    """
+    indices = sorted({_indice(_como_fecha(f)) for f in fechas})
+    mascara = 0
+    inicio = previo = None
+    for i in indices:
+        if i < 0:
+            continue
+        if inicio is None:
+            inicio = previo = i
+        elif i == previo + 1:
+            previo = i
+        else:
+            mascara |= ((1 << (previo - inicio + 1)) - 1) << inicio
+            inicio = previo = i
+    if inicio is not None:
+        mascara |= ((1 << (previo - inicio + 1)) - 1) << inicio
+    return mascara
+
+
+def tramos_en_uno(bits):
+    """
+    Índices (inicio, fin) de cada tramo de bits consecutivos en 1, de menor a mayor.
+    Cada tramo se aísla con aritmética de enteros (bit más bajo y acarreo), sin
+    recorrer bit por bit. También lo usa la detección de eventos (eventos.py).
+    """
+    while bits:
+        bajo = bits & -bits                         # Primer bit del tramo
+        tras = bits + bajo                          # El acarreo apaga el tramo completo
+        yield bajo.bit_length() - 1, (tras & -tras).bit_length() - 2
+        bits &= tras
+
+
+def rangos_en_cero(bits, desde, hasta):
+    """
+    Rangos [(desde, hasta), ...] de días con bit en 0 dentro de [desde, hasta].
+    """
+    rangos = []
+    if desde < FECHA_BASE_COBERTURA:
+        # Antes de la base no hay cobertura posible: todo falta
+        rangos.append((desde, min(hasta, FECHA_BASE_COBERTURA - timedelta(days=1))))
+        desde = FECHA_BASE_COBERTURA
+    if desde > hasta:
+        return rangos
+
+    i0, largo = _indice(desde), (hasta - desde).days + 1
+    faltan = ~(bits >> i0) & ((1 << largo) - 1)
+    for inicio, fin in tramos_en_uno(faltan):
+        rangos.append((desde + timedelta(days=inicio), desde + timedelta(days=fin)))
+    return rangos
+
+# ==============================================================================
+# LECTURA Y ACTUALIZACIÓN
+# ==============================================================================
+def cargar_cobertura(celda, variables):
+    """
+    Un solo mapa con los días guardados para TODAS las variables pedidas (AND de sus mapas).
+    """
+    variables = [v for v in variables if v in VARIABLES_REGISTRO_DIARIO]
+    if not variables:
+        return 0
+    mapas = dict(CoberturaDatos.objects.filter(celda=celda, variable__in=variables).values_list('variable', 'bits'))
+    if len(mapas) < len(variables):
+        return 0  # Alguna variable no tiene ningún día guardado
+    comun = -1  # Todos los bits en 1
+    for bits in mapas.values():
+        comun &= int.from_bytes(bytes(bits), 'little')
+    return comun
+
+
+def rangos_faltantes(celda, variables, desde, hasta):
+    """
+    Rangos mínimos [(desde, hasta), ...] de días de [desde, hasta] a los que les falta
+    alguna de las variables en el almacén: lo único que hay que pedir a la API.
+    """
+    return rangos_en_cero(cargar_cobertura(celda, variables), _como_fecha(desde), _como_fecha(hasta))
+
+
+def marcar_cobertura(celda, fechas_por_variable):
+    """
+    Enciende, para cada variable, los bits de las fechas recién guardadas CON valor
+    ({variable: fechas}): un día que llegó en None sigue faltando.
+    """
+    mascaras = {
+        variable: mascara
+        for variable, fechas in fechas_por_variable.items()
+        if variable in VARIABLES_REGISTRO_DIARIO and (mascara := mascara_de_fechas(fechas))
+    }
+    if not mascaras:
+        return
+
+    # La transacción empieza escribiendo (crea las filas que falten) para tomar el
+    # bloqueo de escritura antes de leer, igual que BEGIN IMMEDIATE en cuota_api.py:
+    # en SQLite leer y después escribir deja a dos hilos esperándose mutuamente.
+    with transaction.atomic():
+        CoberturaDatos.objects.bulk_create(
+            [CoberturaDatos(celda=celda, variable=v) for v in mascaras], ignore_conflicts=True,
+        )
+        for cobertura in CoberturaDatos.objects.select_for_update().filter(celda=celda, variable__in=mascaras):
+            bits = int.from_bytes(bytes(cobertura.bits), 'little') | mascaras[cobertura.variable]
+            cobertura.bits = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+            cobertura.save(update_fields=['bits', 'actualizado'])
@@ -0,0 +1,191 @@
+# cuota_api.py
+
+# ==============================================================================
+# CUOTA COMPARTIDA DE PETICIONES A OPEN-METEO (token bucket en SQLite)
+# ==============================================================================
+# Open-Meteo limita las peticiones por IP. La carga histórica, el cálculo de
+# normales y las consultas de los usuarios salen todas desde la misma IP, así que
+# comparten un único "balde" de tokens guardado en un archivo SQLite: lo ven todos
+# los procesos del servidor y los comandos sin necesitar un servicio externo.
+#
+# Prioridades:
+#   - INTERACTIVA (vistas AJAX): puede usar todo el balde y, mientras espera, los
+#     trabajos de fondo no toman tokens.
+#   - FONDO (comandos): deja siempre una reserva para las interactivas y, tras un
+#     429, se retira un tiempo que crece con cada rechazo seguido.
+
+import contextvars
+import sqlite3
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+PRIORIDAD_INTERACTIVA = 0
+PRIORIDAD_FONDO = 1
+
+# Valores por defecto (se pueden cambiar con settings.CUOTA_OPEN_METEO)
+CONFIGURACION_CUOTA = {
+    'RUTA': 'cuota_open_meteo.sqlite3',
+    'TASA': 5.0,                    # Tokens que se recuperan por segundo
+    'CAPACIDAD': 20.0,              # Máximo de tokens acumulados (ráfaga)
+    'RESERVA_INTERACTIVA': 5.0,     # Tokens que el fondo nunca consume
+    'ESPERA_MAXIMA_INTERACTIVA': 5.0,   # Segundos; después la consulta sale igual
+    'PAUSA_FONDO_429': 10.0,        # Segundos de retiro del fondo tras el primer 429
+    'PAUSA_FONDO_MAXIMA': 300.0,
+}
+
+# Tiempo que se considera "esperando" a una consulta interactiva (se renueva en cada vuelta)
+VIGENCIA_ESPERA_INTERACTIVA = 1.0
+
+_prioridad_actual = contextvars.ContextVar('prioridad_open_meteo', default=PRIORIDAD_INTERACTIVA)
+
+
+def configuracion():
+    return {**CONFIGURACION_CUOTA, **getattr(settings, 'CUOTA_OPEN_METEO', {})}
+
+
+@contextmanager
+def prioridad_fondo():
+    """
+    Marca como FONDO todas las peticiones hechas dentro del bloque (comandos de carga).
+    """
+    token = _prioridad_actual.set(PRIORIDAD_FONDO)
+    try:
+        yield
+    finally:
+        _prioridad_actual.reset(token)
+
+
+def prioridad_actual():
+    return _prioridad_actual.get()
+
+# ==============================================================================
+# ESTADO COMPARTIDO
+# ==============================================================================
+def _conectar():
+    conexion = sqlite3.connect(str(configuracion()['RUTA']), timeout=10, isolation_level=None)
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS balde ("
+        " id INTEGER PRIMARY KEY CHECK (id = 1),"
+        " tokens REAL NOT NULL,"
+        " actualizado REAL NOT NULL,"
+        " pausa_fondo_hasta REAL NOT NULL DEFAULT 0,"
+        " pausa_fondo REAL NOT NULL DEFAULT 0,"
+        " interactiva_esperando_hasta REAL NOT NULL DEFAULT 0)"
+    )
+    return conexion
+
+
+@contextmanager
+def _transaccion():
+    """
+    Transacción con bloqueo de escritura (BEGIN IMMEDIATE): un solo proceso a la vez
+    lee y descuenta tokens. Devuelve la fila del balde ya recargada según el tiempo.
+    """
+    conf = configuracion()
+    conexion = _conectar()
+    try:
+        conexion.execute("BEGIN IMMEDIATE")
+        ahora = time.time()
+        fila = conexion.execute(
+            "SELECT tokens, actualizado, pausa_fondo_hasta, pausa_fondo, interactiva_esperando_hasta FROM balde"
+        ).fetchone()
+        if fila is None:
+            conexion.execute("INSERT INTO balde (id, tokens, actualizado) VALUES (1, ?, ?)", (conf['CAPACIDAD'], ahora))
+            fila = (conf['CAPACIDAD'], ahora, 0.0, 0.0, 0.0)
+
+        tokens, actualizado, pausa_hasta, pausa, esperando_hasta = fila
+        estado = {
+            'tokens': min(conf['CAPACIDAD'], tokens + max(0.0, ahora - actualizado) * conf['TASA']),
+            'actualizado': ahora,
+            'pausa_fondo_hasta': pausa_hasta,
+            'pausa_fondo': pausa,
+            'interactiva_esperando_hasta': esperando_hasta,
+        }
+        yield estado
+
+        conexion.execute(
+            "UPDATE balde SET tokens = ?, actualizado = ?, pausa_fondo_hasta = ?, pausa_fondo = ?,"
+            " interactiva_esperando_hasta = ? WHERE id = 1",
+            (estado['tokens'], estado['actualizado'], estado['pausa_fondo_hasta'],
+             estado['pausa_fondo'], estado['interactiva_esperando_hasta'])
+        )
+        conexion.execute("COMMIT")
+    except BaseException:
+        if conexion.in_transaction:
+            conexion.execute("ROLLBACK")
+        raise
+    finally:
+        conexion.close()
+
+# ==============================================================================
+# API DEL GESTOR
+# ==============================================================================
+def _intentar_tomar(prioridad):
+    """
+    Intenta descontar un token. Devuelve 0 si lo consiguió o los segundos a esperar.
+    """
+    conf = configuracion()
+    with _transaccion() as estado:
+        ahora = estado['actualizado']
+
+        if prioridad == PRIORIDAD_INTERACTIVA:
+            if estado['tokens'] >= 1:
+                estado['tokens'] -= 1
+                return 0
+            # Avisa al fondo que hay una consulta de usuario esperando
+            estado['interactiva_esperando_hasta'] = ahora + VIGENCIA_ESPERA_INTERACTIVA
+            return (1 - estado['tokens']) / conf['TASA']
+
+        if ahora < estado['pausa_fondo_hasta']:
+            return estado['pausa_fondo_hasta'] - ahora
+        if ahora < estado['interactiva_esperando_hasta']:
+            return estado['interactiva_esperando_hasta'] - ahora
+        if estado['tokens'] >= 1 + conf['RESERVA_INTERACTIVA']:
+            estado['tokens'] -= 1
+            return 0
+        return (1 + conf['RESERVA_INTERACTIVA'] - estado['tokens']) / conf['TASA']
+
+
+def adquirir(prioridad=None):
+    """
+    Bloquea hasta obtener permiso para UNA petición a Open-Meteo.
+    Las interactivas esperan como máximo ESPERA_MAXIMA_INTERACTIVA; el fondo, lo necesario.
+    """
+    if prioridad is None:
+        prioridad = prioridad_actual()
+    conf = configuracion()
+    limite = time.monotonic() + conf['ESPERA_MAXIMA_INTERACTIVA']
+
+    while True:
+        espera = _intentar_tomar(prioridad)
+        if not espera:
+            return
+        if prioridad == PRIORIDAD_INTERACTIVA:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                print("⚠️ Cuota de Open-Meteo agotada: la consulta interactiva sale sin esperar más.")
+                return
+            espera = min(espera, restante)
+        time.sleep(min(espera, 1.0))
+
+
+def registrar_respuesta(codigo_estado, retry_after=None):
+    """
+    Ajusta la cuota según la respuesta: un 429 vacía el balde y duplica el retiro
+    del fondo (respetando Retry-After); una respuesta correcta lo va reduciendo.
+    """
+    conf = configuracion()
+    with _transaccion() as estado:
+        if codigo_estado == 429:
+            pausa = min(conf['PAUSA_FONDO_MAXIMA'], max(conf['PAUSA_FONDO_429'], estado['pausa_fondo'] * 2))
+            try:
+                pausa = max(pausa, float(retry_after)) if retry_after else pausa
+            except ValueError:
+                pass
+            estado['tokens'] = 0.0
+            estado['pausa_fondo'] = pausa
+            estado['pausa_fondo_hasta'] = estado['actualizado'] + pausa
+            print(f"⚠️ Open-Meteo respondió 429: el trabajo de fondo se pausa {pausa:.0f} s.")
+        elif codigo_estado < 400 and estado['pausa_fondo']:
+            estado['pausa_fondo'] = estado['pausa_fondo'] / 2 if estado['pausa_fondo'] > conf['PAUSA_FONDO_429'] else 0.0
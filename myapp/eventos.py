@@ -0,0 +1,154 @@
+# eventos.py
+
+# ==============================================================================
+# DETECCIÓN DE EVENTOS EXTREMOS SOBRE LA SERIE DIARIA
+# ==============================================================================
+# Olas de calor, heladas, rachas secas y lluvias intensas se definen como tramos
+# de días consecutivos que cumplen una regla (umbral fijo o percentil del mes en
+# el periodo de referencia 1991-2020) durante un mínimo de días.
+#
+# Cada regla se evalúa una sola vez sobre toda la serie y produce un entero con un
+# bit por día (como el índice de cobertura, ver cobertura.py). Los tramos cortos se
+# descartan con desplazamientos y AND sobre el entero completo (un tramo de k días
+# sobrevive a k-1 desplazamientos) y los que quedan se aíslan con tramos_en_uno:
+# no hay un recorrido día por día para buscar los tramos.
+
+import operator
+from collections import defaultdict, namedtuple
+from datetime import date
+
+from .cobertura import tramos_en_uno
+from .logica_normales import AÑO_INICIO_NORMAL, AÑO_FIN_NORMAL, percentil
+
+# variable: serie diaria de Open-Meteo que se evalúa
+# comparacion: el día cumple si comparacion(valor, umbral del mes)
+# umbral: valor fijo; si además hay 'percentil', sólo filtra la muestra (ej: días con lluvia)
+# percentil: umbral = ese percentil de los valores del mes en el periodo de referencia
+# dias_minimos: largo mínimo del tramo
+# agregacion: cómo se resume el tramo en 'valor'
+Regla = namedtuple('Regla', 'variable comparacion umbral percentil dias_minimos agregacion')
+
+REGLAS_EVENTOS = {
+    # Máxima sobre el p90 del mes durante al menos 3 días seguidos
+    'ola_calor': Regla('temperature_2m_max', operator.gt, None, 90, 3, 'maximo'),
+    # Mínima bajo 0 °C
+    'helada': Regla('temperature_2m_min', operator.lt, 0.0, None, 1, 'minimo'),
+    # Al menos 30 días seguidos con menos de 1 mm
+    'racha_seca': Regla('precipitation_sum', operator.lt, 1.0, None, 30, 'suma'),
+    # Sobre el p95 de los días con lluvia (>= 1 mm) del mes
+    'lluvia_intensa': Regla('precipitation_sum', operator.gt, 1.0, 95, 1, 'suma'),
+}
+
+AGREGACIONES_EVENTO = {
+    'maximo': max,
+    'minimo': min,
+    'suma': sum,
+}
+
+
+def variables_eventos(tipos=None):
+    """
+    Variables diarias de Open-Meteo que necesitan las reglas pedidas ('a,b').
+    """
+    variables = []
+    for tipo in tipos or REGLAS_EVENTOS:
+        variable = REGLAS_EVENTOS[tipo].variable
+        if variable not in variables:
+            variables.append(variable)
+    return ','.join(variables)
+
+# ==============================================================================
+# UMBRALES Y MÁSCARAS
+# ==============================================================================
+def umbrales_mensuales(fechas, valores, regla):
+    """
+    Umbral de la regla para cada mes {1: ..., 12: ...}. Los de percentil salen de los
+    años de referencia presentes en la serie (o de toda la serie si no hay ninguno).
+    """
+    if regla.percentil is None:
+        return {mes: regla.umbral for mes in range(1, 13)}
+
+    referencia = defaultdict(list)
+    todos = defaultdict(list)
+    for fecha, valor in zip(fechas, valores):
+        if valor is None or (regla.umbral is not None and valor < regla.umbral):
+            continue
+        todos[fecha.month].append(valor)
+        if AÑO_INICIO_NORMAL <= fecha.year <= AÑO_FIN_NORMAL:
+            referencia[fecha.month].append(valor)
+
+    umbrales = {}
+    for mes in range(1, 13):
+        muestra = sorted(referencia[mes] or todos[mes])
+        # Mes sin muestra (ej: nunca llueve 1 mm): ningún día puede superar el umbral
+        umbrales[mes] = percentil(muestra, regla.percentil) if muestra else float('inf')
+    return umbrales
+
+
+def mascara_regla(fechas, valores, regla, umbrales):
+    """
+    Entero con el bit i encendido si el día i cumple la regla (los None no cumplen).
+    Como en cobertura.mascara_de_fechas, los días seguidos que cumplen se encienden de
+    a un tramo por vez, no de a un bit.
+    """
+    cumple = regla.comparacion
+    mascara = 0
+    inicio = None
+    dias = 0
+    for dias, (fecha, valor) in enumerate(zip(fechas, valores), start=1):
+        if valor is not None and cumple(valor, umbrales[fecha.month]):
+            if inicio is None:
+                inicio = dias - 1
+        elif inicio is not None:
+            mascara |= ((1 << (dias - 1 - inicio)) - 1) << inicio
+            inicio = None
+    if inicio is not None:
+        mascara |= ((1 << (dias - inicio)) - 1) << inicio
+    return mascara
+
+
+def erosionar(bits, dias_minimos):
+    """
+    Deja encendido el bit i sólo si los bits i .. i+dias_minimos-1 están todos en 1
+    (log2(dias_minimos) desplazamientos). Un tramo de L >= dias_minimos días queda
+    reducido a sus primeros L - dias_minimos + 1 bits; los más cortos desaparecen.
+    """
+    cubiertos = 1
+    while cubiertos < dias_minimos:
+        paso = min(cubiertos, dias_minimos - cubiertos)
+        bits &= bits >> paso
+        cubiertos += paso
+    return bits
+
+# ==============================================================================
+# DETECCIÓN
+# ==============================================================================
+def detectar_eventos(daily, tipos=None):
+    """
+    Eventos de una serie diaria CONTINUA (un día por posición, como la devuelve la
+    API): [{'tipo', 'inicio', 'fin', 'dias', 'valor', 'umbral'}, ...] ordenados por tipo
+    y fecha de inicio.
+    """
+    fechas = [date.fromisoformat(t) for t in daily.get('time') or []]
+    eventos = []
+    for tipo in tipos or REGLAS_EVENTOS:
+        regla = REGLAS_EVENTOS[tipo]
+        valores = daily.get(regla.variable)
+        if not fechas or not valores:
+            continue
+
+        umbrales = umbrales_mensuales(fechas, valores, regla)
+        bits = erosionar(mascara_regla(fechas, valores, regla, umbrales), regla.dias_minimos)
+        agregar = AGREGACIONES_EVENTO[regla.agregacion]
+
+        for inicio, fin in tramos_en_uno(bits):
+            fin += regla.dias_minimos - 1  # Se recuperan los días que quitó la erosión
+            eventos.append({
+                'tipo': tipo,
+                'inicio': fechas[inicio],
+                'fin': fechas[fin],
+                'dias': fin - inicio + 1,
+                'valor': round(agregar(valores[inicio:fin + 1]), 1),
+                'umbral': round(umbrales[fechas[inicio].month], 1),
+            })
+    return eventos
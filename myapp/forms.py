@@ -1,5 +1,6 @@
 from django import forms                 # Módulo base de formularios de Django.
 from .models import REGIONES_CHOICES     # Importamos la lista de tuplas de regiones desde models.py.
+from .regiones import opciones_comunas, resolver_comuna  # Comunas del dataset incluido (data/comunas.csv).
 from datetime import date                # Necesario para obtener el año actual en la validación.
 
 # ==============================================================================
@@ -8,7 +9,7 @@ from datetime import date                # Necesario para obtener el año actual
 
 class ClimaSearchForm(forms.Form):
     """
-    Define los campos que el usuario enviará desde el formulario HTML: Región y Año.
+    Define los campos que el usuario enviará desde el formulario HTML: Región, Comuna (opcional) y Año.
     Esta clase se encarga de:
     1. Generar el HTML de los campos.
     2. Recibir y limpiar los datos.
@@ -24,6 +25,16 @@ class ClimaSearchForm(forms.Form):
         required=True                    # Hace que la selección sea obligatoria (validación básica).
     )
 
+    # ----------------------------------------------------
+    # 1b. Definición del Campo 'Comuna' (Opcional)
+    # ----------------------------------------------------
+    # Si se elige, los datos se consultan en la comuna en vez de la capital regional.
+    comuna = forms.ChoiceField(
+        choices=opciones_comunas,        # Callable: el dataset se carga sólo cuando se usa el formulario.
+        label='COMUNA',
+        required=False
+    )
+
     # ----------------------------------------------------
     # 2. Definición del Campo 'Año' (Entrada de Texto Numérica)
     # ----------------------------------------------------
@@ -62,3 +73,17 @@ class ClimaSearchForm(forms.Form):
             )
             
         return año # El dato debe retornarse limpio para que el proceso continúe.
+
+    # ----------------------------------------------------
+    # 4. Validación Cruzada Región / Comuna
+    # ----------------------------------------------------
+    def clean(self):
+        cleaned_data = super().clean()
+        comuna = resolver_comuna(cleaned_data.get('comuna'))
+        region = cleaned_data.get('region')
+
+        # La comuna elegida debe pertenecer a la región seleccionada.
+        if comuna and region and comuna.region != region:
+            self.add_error('comuna', "La comuna seleccionada no pertenece a la región.")
+
+        return cleaned_data
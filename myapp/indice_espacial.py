@@ -0,0 +1,82 @@
+# indice_espacial.py
+
+# ==============================================================================
+# ÍNDICE ESPACIAL: ÁRBOL KD PARA BÚSQUEDA DEL VECINO MÁS CERCANO
+# ==============================================================================
+# Árbol KD de 2 dimensiones en Python puro (sin scipy). Con ~350 comunas la
+# búsqueda visita unas pocas decenas de nodos en vez de recorrer toda la lista.
+#
+# Las coordenadas se proyectan de forma equirectangular (longitud multiplicada
+# por el coseno de la latitud), lo que basta para comparar distancias en Chile.
+
+from math import cos, radians, sqrt
+
+
+def proyectar(lat, lon):
+    """
+    Convierte (lat, lon) a un plano (x, y) en grados "de latitud".
+    """
+    return (lon * cos(radians(lat)), lat)
+
+
+class _Nodo:
+    __slots__ = ('punto', 'item', 'eje', 'izquierda', 'derecha')
+
+    def __init__(self, punto, item, eje, izquierda, derecha):
+        self.punto = punto
+        self.item = item
+        self.eje = eje
+        self.izquierda = izquierda
+        self.derecha = derecha
+
+
+class ArbolKD:
+    """
+    Índice de vecino más cercano sobre una lista de (lat, lon, item).
+    """
+
+    def __init__(self, elementos):
+        puntos = [(proyectar(lat, lon), item) for lat, lon, item in elementos]
+        self.raiz = self._construir(puntos, 0)
+        self.tamaño = len(puntos)
+
+    def _construir(self, puntos, profundidad):
+        if not puntos:
+            return None
+        eje = profundidad % 2
+        puntos.sort(key=lambda p: p[0][eje])
+        medio = len(puntos) // 2
+        punto, item = puntos[medio]
+        return _Nodo(
+            punto, item, eje,
+            self._construir(puntos[:medio], profundidad + 1),
+            self._construir(puntos[medio + 1:], profundidad + 1),
+        )
+
+    def mas_cercano(self, lat, lon):
+        """
+        Devuelve (item, distancia_en_grados) del elemento más cercano, o (None, None) si está vacío.
+        """
+        objetivo = proyectar(lat, lon)
+        mejor = [None, float('inf')]  # [item, distancia al cuadrado]
+
+        def visitar(nodo):
+            if nodo is None:
+                return
+            dx = nodo.punto[0] - objetivo[0]
+            dy = nodo.punto[1] - objetivo[1]
+            distancia = dx * dx + dy * dy
+            if distancia < mejor[1]:
+                mejor[0], mejor[1] = nodo.item, distancia
+
+            diferencia = objetivo[nodo.eje] - nodo.punto[nodo.eje]
+            cercano, lejano = (nodo.izquierda, nodo.derecha) if diferencia < 0 else (nodo.derecha, nodo.izquierda)
+            visitar(cercano)
+            # Sólo se revisa la otra rama si la esfera de búsqueda cruza el plano de corte
+            if diferencia * diferencia < mejor[1]:
+                visitar(lejano)
+
+        visitar(self.raiz)
+        if mejor[0] is None:
+            return None, None
+        return mejor[0], sqrt(mejor[1])
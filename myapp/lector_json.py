@@ -0,0 +1,98 @@
+# lector_json.py
+
+# ==============================================================================
+# LECTURA INCREMENTAL DEL JSON DE OPEN-METEO
+# ==============================================================================
+# response.json() arma el documento completo en memoria: para rangos de décadas son
+# decenas de miles de fechas y números en listas de Python. Este lector recorre la
+# respuesta por bloques (response.iter_content) y entrega cada valor de los arreglos
+# de 'daily' a medida que llega, sin guardar nada más que el trozo pendiente del
+# bloque actual. No usa dependencias externas.
+
+import codecs
+import json
+import re
+from itertools import chain
+
+# Un token JSON (las comas, los dos puntos y los espacios se saltan: la estructura
+# se deduce de la pila de contenedores).
+_TOKEN = re.compile(r'[\s,:]*(?:([\[\]{}])|"((?:[^"\\]|\\.)*)"|([-+0-9.eE]+)|(null|true|false))')
+_LITERALES = {'null': None, 'true': True, 'false': False}
+
+
+def _numero(texto):
+    if texto.lstrip('-').isdigit():
+        return int(texto)
+    return float(texto)
+
+
+def iterar_tokens(bloques):
+    """
+    Genera (tipo, valor) por cada token de un JSON que llega en bloques de bytes:
+    tipo es '{', '}', '[', ']', 's' (string) o 'v' (número, null, true o false).
+    """
+    decodificador = codecs.getincrementaldecoder('utf-8')()
+    pendiente = ''
+
+    # Un bloque None marca el final: se procesa lo que quedó pendiente
+    for bloque in chain(bloques, [None]):
+        final = bloque is None
+        texto = pendiente + decodificador.decode(b'' if final else bloque, final=final)
+        pos = 0
+        largo = len(texto)
+        while True:
+            m = _TOKEN.match(texto, pos)
+            if m is None:
+                break
+            # Un número o literal al final del bloque puede seguir en el siguiente
+            if not final and m.end() == largo and (m.group(3) or m.group(4)):
+                break
+            pos = m.end()
+            if m.group(1):
+                yield m.group(1), None
+            elif m.group(2) is not None:
+                cadena = m.group(2)
+                yield 's', (json.loads(f'"{cadena}"') if '\\' in cadena else cadena)
+            elif m.group(3):
+                yield 'v', _numero(m.group(3))
+            else:
+                yield 'v', _LITERALES[m.group(4)]
+        pendiente = texto[pos:]
+
+    if pendiente.strip(' \t\r\n,:'):
+        raise ValueError(f"JSON inválido o incompleto cerca de: {pendiente[:40]!r}")
+
+
+def iterar_arreglos(bloques, seccion='daily'):
+    """
+    Genera (variable, indice, valor) por cada elemento de los arreglos del objeto
+    'seccion' de primer nivel, ej: ('temperature_2m_max', 0, 21.3).
+    El resto del documento se recorre sin guardarse.
+    """
+    # Cada nivel de la pila: [es_objeto, clave_actual, indice_actual]
+    pila = []
+    for tipo, valor in iterar_tokens(bloques):
+        tope = pila[-1] if pila else None
+
+        # En un objeto, un string sin clave pendiente es la clave del siguiente valor
+        if tipo == 's' and tope is not None and tope[0] and tope[1] is None:
+            tope[1] = valor
+            continue
+
+        if tipo == '{' or tipo == '[':
+            pila.append([tipo == '{', None, 0])
+            continue
+
+        if tipo == '}' or tipo == ']':
+            pila.pop()
+        elif len(pila) == 3 and not tope[0] and pila[0][1] == seccion:
+            # Valor escalar dentro de daily.<variable>[i]
+            yield pila[1][1], tope[2], valor
+
+        # El contenedor padre avanza al siguiente elemento
+        if pila:
+            padre = pila[-1]
+            if padre[0]:
+                padre[1] = None
+            else:
+                padre[2] += 1
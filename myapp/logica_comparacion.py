@@ -0,0 +1,254 @@
+# logica_comparacion.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+import json
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .regiones import REGION_NOMBRES, resolver_ubicacion
+from .cliente_api import (
+    ARCHIVE_URL, RETRASO_ARCHIVO_DIAS, VARIABLES_DIARIAS, armar_respuesta, claves_series, consultar_archivo,
+    iterar_en_paralelo, lista_variables,
+)
+from .logica_resultado import calculate_metrics, calcular_periodo
+from .models import RegistroDiario, VARIABLES_REGISTRO_DIARIO
+
+# Límites de una comparación (ubicaciones × periodos = celdas de la matriz)
+MAX_UBICACIONES_COMPARACION = 20
+MAX_PERIODOS_COMPARACION = 24
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Ubicaciones y Periodos
+# ==============================================================================
+def como_lista(valor):
+    """
+    Un código suelto ('ARICA') cuenta como lista de uno: no se recorre letra por letra.
+    """
+    if not valor:
+        return []
+    return [valor] if isinstance(valor, str) else list(valor)
+
+
+def resolver_ubicaciones(data):
+    """
+    Lista de ubicaciones pedidas ('regiones' y 'comunas', códigos o alias) o un
+    mensaje de error. Cada una: {'codigo', 'nombre', 'celda', 'lat', 'lon'}.
+    """
+    ubicaciones = []
+    pedidas = [('region_code', c) for c in como_lista(data.get('regiones'))] + \
+              [('comuna', c) for c in como_lista(data.get('comunas'))]
+    for campo, codigo in pedidas:
+        ubicacion = resolver_ubicacion({campo: codigo})
+        if not ubicacion:
+            return None, f'Ubicación no válida: {codigo}'
+        comuna = ubicacion['comuna']
+        ubicaciones.append({
+            'codigo': comuna.codigo if comuna else ubicacion['region_code'],
+            'nombre': comuna.nombre if comuna else REGION_NOMBRES[ubicacion['region_code']],
+            'celda': ubicacion['celda'],
+            'lat': ubicacion['lat'],
+            'lon': ubicacion['lon'],
+        })
+
+    if not ubicaciones:
+        return None, 'Indique al menos una región o comuna.'
+    if len(ubicaciones) > MAX_UBICACIONES_COMPARACION:
+        return None, f'Máximo {MAX_UBICACIONES_COMPARACION} ubicaciones por comparación.'
+    return ubicaciones, None
+
+
+def resolver_periodos(data):
+    """
+    Lista de periodos pedidos ([{'year': 2020, 'month': 0}, ...], month 0 = año completo)
+    recortados al último día publicado en el archivo, o un mensaje de error.
+    """
+    ultimo_dia = date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS)
+    periodos = []
+    for pedido in data.get('periodos') or []:
+        try:
+            year = int(pedido.get('year'))
+            month = int(pedido.get('month', 0))
+            start_date, end_date, label = calcular_periodo(year, month, ultimo_dia.isoformat())
+        except (TypeError, ValueError, AttributeError):
+            return None, f'Periodo no válido: {pedido}'
+        if start_date > ultimo_dia:
+            return None, f'El periodo {label} aún no tiene datos en el archivo.'
+        periodos.append({
+            'year': year,
+            'month': month,
+            'label': label if month == 0 else f"{label} {year}",
+            'desde': start_date,
+            'hasta': min(end_date, ultimo_dia),
+        })
+
+    if not periodos:
+        return None, 'Indique al menos un periodo.'
+    if len(periodos) > MAX_PERIODOS_COMPARACION:
+        return None, f'Máximo {MAX_PERIODOS_COMPARACION} periodos por comparación.'
+    return periodos, None
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Métricas desde Almacén, Caché y API
+# ==============================================================================
+def metricas_desde_almacen(piezas):
+    """
+    Resuelve con UNA consulta al almacén local las piezas (celda, desde, hasta) que
+    tengan todos sus días y variables guardados: { pieza: metrics }.
+    """
+    if not piezas:
+        return {}
+
+    filtro = Q()
+    for celda, desde, hasta in piezas:
+        filtro |= Q(celda=celda, fecha__range=(desde, hasta))
+
+    campos = list(VARIABLES_REGISTRO_DIARIO.values())
+    filas = {}
+    for celda, fecha, *valores in (RegistroDiario.objects.filter(filtro)
+                                   .values_list('celda', 'fecha', *campos).iterator(chunk_size=5000)):
+        filas[(celda, fecha)] = valores
+
+    resueltas = {}
+    for pieza in piezas:
+        celda, desde, hasta = pieza
+        dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        valores_dias = [filas.get((celda, dia)) for dia in dias]
+        # Sólo se usa el almacén si el periodo está completo (sin días ni variables faltantes)
+        if any(v is None or None in v for v in valores_dias):
+            continue
+        daily = {'time': [d.isoformat() for d in dias]}
+        for j, variable in enumerate(VARIABLES_REGISTRO_DIARIO):
+            daily[variable] = [v[j] for v in valores_dias]
+        resueltas[pieza] = calculate_metrics(daily)
+    return resueltas
+
+
+def metricas_desde_cache(piezas_coords):
+    """
+    Resuelve las piezas cuyas series ya están todas en la caché (una sola lectura múltiple).
+    """
+    claves = {}
+    for pieza, (lat, lon) in piezas_coords.items():
+        _celda, desde, hasta = pieza
+        for clave, serie in claves_series(ARCHIVE_URL, lat, lon, desde, hasta, VARIABLES_DIARIAS).items():
+            claves[clave] = (pieza, serie)
+
+    por_pieza = {}
+    for clave, valores in cache.get_many(list(claves)).items():
+        pieza, serie = claves[clave]
+        por_pieza.setdefault(pieza, {})[serie] = valores
+
+    # 'time' + cada variable diaria
+    series_por_pieza = 1 + len(lista_variables(VARIABLES_DIARIAS))
+    resueltas = {}
+    for pieza, series in por_pieza.items():
+        if len(series) < series_por_pieza:
+            continue
+        daily = armar_respuesta(series).get('daily')
+        if daily and daily.get('time'):
+            resueltas[pieza] = calculate_metrics(daily)
+    return resueltas
+
+
+def metricas_locales(celda, lat, lon, desde, hasta):
+    """
+    Métricas de un periodo sólo si ya están en la caché o en el almacén (sin descargar
+    nada), o None. Lo usan las páginas de detalle para incrustar el periodo inicial.
+    """
+    pieza = (celda, desde, hasta)
+    metricas = metricas_desde_cache({pieza: (lat, lon)}) or metricas_desde_almacen([pieza])
+    return metricas.get(pieza)
+
+
+def comparar(ubicaciones, periodos):
+    """
+    Matriz ubicaciones × periodos de métricas. Cada pieza (celda, periodo) se resuelve
+    una sola vez: primero el almacén, luego la caché y sólo lo que falte se descarga,
+    en paralelo. Devuelve (matriz, errores, fuentes).
+    """
+    coords = {}
+    for u in ubicaciones:
+        for p in periodos:
+            coords.setdefault((u['celda'], p['desde'], p['hasta']), (u['lat'], u['lon']))
+
+    metricas = metricas_desde_almacen(list(coords))
+    fuentes = {'almacen': len(metricas), 'cache': 0, 'api': 0}
+
+    faltantes = {pieza: c for pieza, c in coords.items() if pieza not in metricas}
+    desde_cache = metricas_desde_cache(faltantes)
+    metricas.update(desde_cache)
+    fuentes['cache'] = len(desde_cache)
+
+    errores_pieza = {}
+    pendientes = [pieza for pieza in faltantes if pieza not in desde_cache]
+    # Periodos parcialmente guardados: consultar_archivo sólo descarga los días que faltan
+    tareas = [(consultar_archivo, *coords[pieza], pieza[1], pieza[2]) for pieza in pendientes]
+    for pieza, (api_data, error) in zip(pendientes, iterar_en_paralelo(tareas)):
+        if error is not None:
+            print(f"❌ Error en comparación {pieza}: {str(error)}")
+            errores_pieza[pieza] = str(error)
+        elif api_data.get('daily'):
+            # Una serie con valores inválidos queda como error de su ubicación, no de toda la comparación
+            try:
+                metricas[pieza] = calculate_metrics(api_data['daily'])
+            except (TypeError, ValueError) as e:
+                print(f"❌ Datos inválidos en comparación {pieza}: {str(e)}")
+                errores_pieza[pieza] = f'Datos inválidos: {str(e)}'
+                continue
+            fuentes['api'] += 1
+
+    matriz = []
+    errores = []
+    for u in ubicaciones:
+        fila = []
+        for p in periodos:
+            pieza = (u['celda'], p['desde'], p['hasta'])
+            fila.append(metricas.get(pieza))
+            if pieza in errores_pieza:
+                errores.append({'ubicacion': u['codigo'], 'periodo': p['label'], 'message': errores_pieza[pieza]})
+        matriz.append(fila)
+    return matriz, errores, fuentes
+
+# ==============================================================================
+# VISTA AJAX: fetch_comparacion_ajax - N Ubicaciones × M Periodos
+# ==============================================================================
+@csrf_exempt
+def fetch_comparacion_ajax(request):
+    """
+    POST {'regiones': [...], 'comunas': [...], 'periodos': [{'year': 2024, 'month': 0}, ...]}
+    -> una matriz de métricas (misma forma que 'metrics' de fetch_clima_data_ajax).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Formato JSON inválido'}, status=400)
+
+    ubicaciones, error = resolver_ubicaciones(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    periodos, error = resolver_periodos(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+
+    matriz, errores, fuentes = comparar(ubicaciones, periodos)
+
+    return JsonResponse({
+        'success': True,
+        'ubicaciones': [{k: u[k] for k in ('codigo', 'nombre', 'celda')} for u in ubicaciones],
+        'periodos': [
+            {'year': p['year'], 'month': p['month'], 'label': p['label'],
+             'desde': p['desde'].isoformat(), 'hasta': p['hasta'].isoformat()}
+            for p in periodos
+        ],
+        'matriz': matriz,
+        'errores': errores,
+        'fuentes': fuentes,
+    })
@@ -0,0 +1,117 @@
+# logica_eventos.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+import json
+from datetime import date
+from django.db.models import Count, Max, Min, Sum
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .regiones import resolver_ubicacion
+from .logica_resultado import calcular_periodo
+from .models import EventoExtremo, TIPOS_EVENTO
+
+# Eventos por respuesta; 'resumen' cuenta siempre todos los del periodo
+MAX_EVENTOS_RESPUESTA = 500
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Tipos y Periodo Pedidos
+# ==============================================================================
+def resolver_tipos(data):
+    """
+    Tipos pedidos ('tipo': 'helada', lista o 'a,b'), todos si no se indica: (tipos, error).
+    """
+    tipos = data.get('tipo')
+    if not tipos:
+        return [codigo for codigo, _nombre in TIPOS_EVENTO], None
+    if isinstance(tipos, str):
+        tipos = tipos.split(',')
+    tipos = [str(t).strip() for t in tipos if str(t).strip()]
+    validos = dict(TIPOS_EVENTO)
+    desconocidos = [t for t in tipos if t not in validos]
+    if desconocidos:
+        return None, f"Tipos de evento no válidos: {', '.join(desconocidos)}"
+    return tipos, None
+
+
+def resolver_rango(data):
+    """
+    Periodo pedido como 'year' (+ 'month', 0 = año completo) o 'desde'/'hasta' (ISO):
+    (desde, hasta, error). Sin periodo, (None, None): toda la serie.
+    """
+    try:
+        if data.get('year'):
+            desde, hasta, _label = calcular_periodo(int(data['year']), int(data.get('month') or 0))
+            return desde, hasta, None
+        desde = date.fromisoformat(data['desde']) if data.get('desde') else None
+        hasta = date.fromisoformat(data['hasta']) if data.get('hasta') else None
+    except (TypeError, ValueError):
+        return None, None, 'Periodo no válido'
+    if desde and hasta and desde > hasta:
+        return None, None, "'desde' es posterior a 'hasta'"
+    return desde, hasta, None
+
+# ==============================================================================
+# VISTA AJAX: fetch_eventos_ajax - Consulta del Índice de Eventos Extremos
+# ==============================================================================
+@csrf_exempt
+def fetch_eventos_ajax(request):
+    """
+    POST {'region_code' | 'comuna' | 'lat'/'lon', 'tipo', 'year'/'month' | 'desde'/'hasta'}
+    -> eventos (precalculados por 'detectar_eventos') que se solapan con el periodo.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Formato JSON inválido'}, status=400)
+
+    ubicacion = resolver_ubicacion(data)
+    if not ubicacion:
+        return JsonResponse({'success': False, 'message': 'Ubicación no válida'}, status=400)
+    tipos, error = resolver_tipos(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    desde, hasta, error = resolver_rango(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+
+    celda = ubicacion['celda']
+    eventos = EventoExtremo.objects.filter(celda=celda)
+    if not eventos.exists():
+        return JsonResponse({
+            'success': False,
+            'message': 'Los eventos de esta ubicación aún no se han calculado (python manage.py detectar_eventos).',
+        }, status=404)
+
+    # Eventos que se solapan con [desde, hasta] (índice celda, tipo, inicio)
+    eventos = eventos.filter(tipo__in=tipos)
+    if hasta:
+        eventos = eventos.filter(inicio__lte=hasta)
+    if desde:
+        eventos = eventos.filter(fin__gte=desde)
+
+    resumen = {
+        fila.pop('tipo'): fila
+        for fila in eventos.order_by().values('tipo').annotate(
+            eventos=Count('id'), dias_totales=Sum('dias'), dias_max=Max('dias'),
+            valor_max=Max('valor'), valor_min=Min('valor'),
+        )
+    }
+    filas = list(eventos.order_by('inicio', 'tipo')
+                 .values('tipo', 'inicio', 'fin', 'dias', 'valor', 'umbral')[:MAX_EVENTOS_RESPUESTA + 1])
+
+    return JsonResponse({
+        'success': True,
+        'region_code': ubicacion['region_code'],
+        'celda': celda,
+        'desde': desde.isoformat() if desde else None,
+        'hasta': hasta.isoformat() if hasta else None,
+        'resumen': resumen,
+        'eventos': filas[:MAX_EVENTOS_RESPUESTA],
+        'truncado': len(filas) > MAX_EVENTOS_RESPUESTA,
+    })
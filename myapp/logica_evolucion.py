@@ -1,149 +1,169 @@
 # logica_evolucion.py
 
-import requests
 import json
 from datetime import date
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from collections import defaultdict 
-
-# La única dependencia es el mapeo de coordenadas, que está en views.py
-# (Si tu proyecto usa REGION_COORDS de views.py, DEBES asegurarte de que views.py no importe nada de este archivo,
-# o usa esta definición local para evitar el error de importación circular que mencionamos antes.)
-
-REGION_NAME_MAP = {
-    'METROPOLITANA': 'STGO',
-    'METROPOLITANA DE SANTIAGO': 'STGO',
-    'ARICA Y PARINACOTA': 'XV',
-    'TARAPACÁ': 'I',
-    'ANTOFAGASTA': 'II',
-    'ATACAMA': 'III',
-    'COQUIMBO': 'IV',
-    'VALPARAÍSO': 'V',
-    "O'HIGGINS": 'VI',
-    'MAULE': 'VII',
-    'ÑUBLE': 'XVI',
-    'BIOBÍO': 'VIII',
-    'LA ARAUCANÍA': 'IX',
-    'LOS RÍOS': 'XIV',
-    'LOS LAGOS': 'X',
-    'AYSÉN': 'XI',
-    'MAGALLANES': 'XII',
-}
-# --- 1. DEFINICIÓN LOCAL DE COORDENADAS (Incluye códigos y nombres como claves) ---
-REGION_COORDS = {
-    # Regiones
-    'XV':   (-18.47, -70.31),  # Arica y Parinacota
-    'I':    (-20.21, -70.14),  # Tarapacá
-    'II':   (-23.65, -70.40),  # Antofagasta
-    'III':  (-27.37, -70.33),  # Atacama
-    'IV':   (-29.90, -71.25),  # Coquimbo
-    'V':    (-33.04, -71.61),  # Valparaíso
-    'STGO': (-33.45, -70.66),  # Metropolitana de Santiago (RM)
-    'VI':   (-34.17, -70.74),  # O'Higgins
-    'VII':  (-35.43, -71.65),  # Maule
-    'XVI':  (-36.61, -72.10),  # Ñuble
-    'VIII': (-36.82, -73.04),  # Biobío
-    'IX':   (-38.74, -72.59),  # La Araucanía
-    'XIV':  (-39.81, -73.25),  # Los Ríos
-    'X':    (-41.47, -72.94),  # Los Lagos
-    'XI':   (-45.57, -72.07),  # Aysén
-    'XII':  (-53.16, -70.91),  # Magallanes
-    
-    # Nombres de regiones para compatibilidad con el AJAX:
-    'ARICA': (-18.47, -70.29),          
-    'TARAPACA': (-20.22, -70.14),       
-    'ANTOFAGASTA': (-23.65, -70.40),    
-    'ATACAMA': (-27.36, -70.33),        
-    'COQUIMBO': (-29.91, -71.25),       
-    'VALPARAISO': (-33.04, -71.60),     
-    'METROPOLITANA': (-33.44, -70.67),  
-    'OHIGGINS': (-34.10, -70.74),       
-    'MAULE': (-35.42, -71.67),          
-    'NUBLE': (-36.60, -72.10),          
-    'BIOBIO': (-36.82, -73.05),         
-    'ARAUCANIA': (-38.73, -72.60),      
-    'RIOS': (-39.81, -73.24),           
-    'LAGOS': (-41.47, -72.94),          
-    'AYSEN': (-45.57, -72.08),          
-    'MAGALLANES': (-53.16, -70.91),
-}
 
+# Registro único de regiones y comunas (resuelve alias como 'STGO' o 'Metropolitana de Santiago')
+# y cliente de Open-Meteo con caché por celda de grilla.
+from .regiones import resolver_ubicacion
+from .cliente_api import ARCHIVE_URL, TTL_RECIENTE, VARIABLES_DIARIAS, dividir_en_tramos, iterar_tramos
+from .acumuladores import AcumuladorPeriodos
+from .tendencias import calcular_tendencias
+from .logica_trabajos import encolar_trabajo, resumen_trabajo
+
+# Inicio de la serie histórica. Se piden las seis variables de calculate_metrics
+# (aunque los gráficos anuales usan cuatro) para que el mapa de calor año × mes
+# (logica_mapa_calor.py) reutilice los mismos tramos en caché.
+AÑO_INICIO_EVOLUCION = 1980
+VARIABLES_EVOLUCION = VARIABLES_DIARIAS
+
+# Tamaño de cada tramo del modo streaming (una década por tramo)
+AÑOS_POR_TRAMO = 10
 
 # ==============================================================================
 # FUNCIÓN DE PROCESAMIENTO: De Diario a Anual (Nueva Lógica)
 # ==============================================================================
 def process_daily_to_annual(daily_data):
     """
-    Recibe datos DIARIOS y los agrupa en ANUALES manualmente.
-    Esto imita el éxito de logica_resultado.py pero para una serie de tiempo.
+    Recibe datos DIARIOS (ya cargados) y los agrupa en ANUALES.
+    Usa los mismos acumuladores en curso que el modo en flujo (acumuladores.py),
+    así ambos caminos calculan exactamente lo mismo.
     """
-    if not daily_data or 'time' not in daily_data:
+    if not daily_data or not daily_data.get('time'):
         return []
 
-    # Diccionario para acumular datos por año
-    # Estructura: { '1980': {'tmax': [20, 22...], 'precip': [0, 10...] } }
-    annual_groups = defaultdict(lambda: {
-        'tmax_list': [], 
-        'tmin_list': [], 
-        'precip_list': [], 
-        'rad_list': []
-    })
+    acumulador = AcumuladorPeriodos(daily_data['time'][0])
+    acumulador.agregar_diario(daily_data)
+    return acumulador.anual()
 
-    times = daily_data.get('time', [])
-    
-    # Iteramos por cada día
-    for i, date_str in enumerate(times):
-        if not date_str: continue
-        
-        # Extraemos el año (los primeros 4 caracteres: "1980-01-01" -> "1980")
-        year = date_str[0:4]
-        
-        # Obtenemos valores (manejando posibles None)
-        tmax = daily_data['temperature_2m_max'][i]
-        tmin = daily_data['temperature_2m_min'][i]
-        prec = daily_data['precipitation_sum'][i]
-        rad  = daily_data['shortwave_radiation_sum'][i]
-
-        # Agrupamos
-        group = annual_groups[year]
-        if tmax is not None: group['tmax_list'].append(tmax)
-        if tmin is not None: group['tmin_list'].append(tmin)
-        if prec is not None: group['precip_list'].append(prec)
-        if rad is not None:  group['rad_list'].append(rad)
-
-    # Construimos el resultado final calculando promedios y sumas
-    final_data = []
-    sorted_years = sorted(annual_groups.keys())
-
-    for year in sorted_years:
-        g = annual_groups[year]
-        
-        # Solo procesamos si tenemos datos suficientes (ej. al menos 300 días para que el año sea válido)
-        # O simplemente si la lista no está vacía
-        if g['tmax_list'] and g['tmin_list']:
-            
-            # T° Max: Promedio de las máximas diarias
-            avg_tmax = sum(g['tmax_list']) / len(g['tmax_list'])
-            
-            # T° Min: Promedio de las mínimas diarias
-            avg_tmin = sum(g['tmin_list']) / len(g['tmin_list'])
-            
-            # Precipitación: Suma total del año
-            sum_precip = sum(g['precip_list'])
-            
-            # Radiación: Suma total del año
-            sum_rad = sum(g['rad_list'])
-
-            final_data.append({
-                'year': year,
-                'temp_max_avg': round(avg_tmax, 1),
-                'temp_min_avg': round(avg_tmin, 1),
-                'precip_sum': round(sum_precip, 1),
-                'radiation_sum': round(sum_rad, 1)
-            })
-
-    return final_data
+# ==============================================================================
+# SERIE POR TRAMOS: Una Década a la Vez
+# ==============================================================================
+def acumuladores_evolucion(lat, lon):
+    """
+    Descarga la serie desde 1980 década por década y genera (desde, hasta, acumulador, error)
+    en orden cronológico, con un AcumuladorPeriodos (por año y por mes) por tramo.
+    """
+    # Las décadas se descargan en paralelo, pero se entregan en orden cronológico
+    # (los tramos empiezan y terminan en límites de año: cada uno se agrega por separado).
+    # Cada tramo se lee en flujo: los valores diarios van directo a los acumuladores,
+    # sin armar el JSON ni listas por año (memoria constante). Los días que ya están en
+    # el almacén se agregan desde ahí: sólo se descargan los rangos faltantes.
+    tramos = dividir_en_tramos(date(AÑO_INICIO_EVOLUCION, 1, 1), date.today(), AÑOS_POR_TRAMO)
+    yield from iterar_tramos(ARCHIVE_URL, lat, lon, tramos, daily=VARIABLES_EVOLUCION, timeout=60,
+                             crear_acumulador=AcumuladorPeriodos)
+
+
+def tramos_evolucion(lat, lon):
+    """
+    Como acumuladores_evolucion, pero entrega la serie anual de cada tramo:
+    (desde, hasta, chart_data, error). Lo usan los modos directo, streaming y trabajo.
+    """
+    for start_date, end_date, acumulador, error in acumuladores_evolucion(lat, lon):
+        if error is not None:
+            yield start_date, end_date, None, error
+        else:
+            yield start_date, end_date, acumulador.anual(), None
+
+
+def clave_cache_evolucion(celda):
+    # La serie llega hasta hoy: se guarda en caché por celda y por día
+    return f"evolucion:anual:{celda}:{date.today().isoformat()}"
+
+
+def resultado_evolucion(chart_data):
+    """
+    Serie anual junto con sus estadísticas de tendencia (sólo años completos).
+    """
+    return {'data': chart_data, 'tendencias': calcular_tendencias(chart_data, hasta_año=date.today().year - 1)}
+
+
+def obtener_evolucion(celda, lat, lon):
+    """
+    Serie anual completa desde 1980 + tendencias, desde la caché o descargándola.
+    Si algún tramo falla se propaga su error.
+    """
+    clave = clave_cache_evolucion(celda)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    chart_data = []
+    for start_date, end_date, datos_tramo, error in tramos_evolucion(lat, lon):
+        if error is not None:
+            raise error
+        chart_data.extend(datos_tramo)
+
+    resultado = resultado_evolucion(chart_data)
+    if chart_data:
+        cache.set(clave, resultado, TTL_RECIENTE)
+    return resultado
+
+# ==============================================================================
+# MODO STREAMING: Tramos por Década -> NDJSON
+# ==============================================================================
+def generar_evolucion_ndjson(celda, lat, lon, con_tendencias=False):
+    """
+    Generador para StreamingHttpResponse: emite una línea JSON por tramo, para que
+    el gráfico pinte la primera década sin esperar al resto. La línea final puede
+    incluir las tendencias de la serie completa.
+    """
+    # Serie ya calculada hoy: se envía de una vez
+    resultado = cache.get(clave_cache_evolucion(celda))
+    if resultado is not None:
+        tramos = [(f"{AÑO_INICIO_EVOLUCION}-01-01", date.today().isoformat(), resultado['data'], None)]
+    else:
+        tramos = tramos_evolucion(lat, lon)
+
+    chart_data = []
+    con_errores = False
+    for start_date, end_date, datos_tramo, error in tramos:
+        if error is not None:
+            con_errores = True
+            print(f"❌ Error en tramo {start_date} - {end_date}: {str(error)}")
+            yield json.dumps({'tipo': 'error', 'desde': start_date, 'hasta': end_date,
+                              'message': f'Error servidor: {str(error)}'}) + '\n'
+            continue
+
+        chart_data.extend(datos_tramo)
+        yield json.dumps({'tipo': 'tramo', 'desde': start_date, 'hasta': end_date, 'data': datos_tramo}) + '\n'
+
+    if resultado is None:
+        resultado = resultado_evolucion(chart_data)
+        if chart_data and not con_errores:
+            cache.set(clave_cache_evolucion(celda), resultado, TTL_RECIENTE)
+
+    fin = {'tipo': 'fin', 'años': len(chart_data)}
+    if con_tendencias:
+        fin['tendencias'] = resultado['tendencias']
+    yield json.dumps(fin) + '\n'
+
+# ==============================================================================
+# MODO TRABAJO: Descarga en el Proceso 'procesar_trabajos'
+# ==============================================================================
+def clave_trabajo_evolucion(celda):
+    # La serie llega hasta hoy: el resultado de un trabajo sirve durante el mismo día
+    return f"evolucion:{celda}:{date.today().isoformat()}"
+
+
+def trabajo_evolucion(parametros, reportar):
+    """
+    Ejecutado por el worker (ver logica_trabajos.py): guarda cada década como
+    resultado parcial y devuelve la serie anual completa con sus tendencias.
+    """
+    chart_data = []
+    tramos = dividir_en_tramos(date(AÑO_INICIO_EVOLUCION, 1, 1), date.today(), AÑOS_POR_TRAMO)
+    for i, (start_date, end_date, datos_tramo, error) in enumerate(
+            tramos_evolucion(parametros['lat'], parametros['lon']), start=1):
+        if error is not None:
+            # El trabajo queda en 'error' y se reintenta completo en la próxima petición
+            raise error
+        chart_data.extend(datos_tramo)
+        reportar({'desde': start_date, 'hasta': end_date, 'data': datos_tramo}, int(100 * i / len(tramos)))
+    return resultado_evolucion(chart_data)
 
 # ==============================================================================
 # VISTA AJAX PRINCIPAL
@@ -158,53 +178,60 @@ def fetch_evolucion_ajax(request):
 
     try:
         data = json.loads(request.body.decode('utf-8'))
-        region_code_in = data.get('region_code', '').upper()
         
-        # Normalizar región
-        region_code = REGION_NAME_MAP.get(region_code_in, region_code_in)
+        # Normalizar ubicación (región/alias, comuna o lat/lon -> coordenadas)
+        ubicacion = resolver_ubicacion(data)
         
-        if not region_code or region_code not in REGION_COORDS:
+        if not ubicacion:
             return JsonResponse({'success': False, 'message': 'Código de región no válido.'}, status=400)
 
-        lat, lon = REGION_COORDS.get(region_code)
-        print(f"Consultando: {region_code} -> {lat}, {lon}")
-
-        # Configuración API
-        API_URL = "https://archive-api.open-meteo.com/v1/archive"
-        
-        # CAMBIO CLAVE: Usamos 1980 como inicio seguro
-        start_date = "1980-01-01" 
-        end_date = date.today().strftime('%Y-%m-%d')
-        
-        # CAMBIO CLAVE: Solicitamos 'daily' en vez de 'monthly' (Igual que logica_resultado.py)
-        params = {
-            'latitude': lat,
-            'longitude': lon,
-            'start_date': start_date,
-            'end_date': end_date,
-            'daily': 'temperature_2m_max,temperature_2m_min,precipitation_sum,shortwave_radiation_sum',
-            'timezone': 'auto'
-        }
-
-        response = requests.get(API_URL, params=params, timeout=60)
-        response.raise_for_status()
-        
-        api_data = response.json()
-        
-        # Verificamos si llegó 'daily' (que es lo que pedimos ahora)
-        if not api_data.get('daily'):
+        lat, lon = ubicacion['lat'], ubicacion['lon']
+        print(f"Consultando: {ubicacion['region_code']} -> {lat}, {lon}")
+
+        modo = data.get('modo') or ('stream' if data.get('stream') else 'directo')
+        if modo not in ('trabajo', 'stream', 'directo'):
+            return JsonResponse({'success': False, 'message': 'Modo no válido. Use: trabajo, stream, directo.'}, status=400)
+
+        # MODO TRABAJO ('modo': 'trabajo', requiere el worker procesar_trabajos): las
+        # décadas de descarga no se hacen dentro de la petición. Se encola y se responde
+        # al instante (202) con el id del trabajo; el cliente consulta el avance en
+        # /trabajo/<id>/ (logica_trabajos.py)
+        if modo == 'trabajo':
+            trabajo = encolar_trabajo(
+                'evolucion', clave_trabajo_evolucion(ubicacion['celda']), {'lat': lat, 'lon': lon}
+            )
+            return JsonResponse(resumen_trabajo(trabajo), status=200 if trabajo.estado == 'completado' else 202)
+
+        # MODO STREAMING (NDJSON): una línea por década, a medida que se descarga
+        if modo == 'stream':
+            response = StreamingHttpResponse(
+                generar_evolucion_ndjson(ubicacion['celda'], lat, lon, con_tendencias=bool(data.get('tendencias'))),
+                content_type='application/x-ndjson',
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # Evita que nginx acumule la respuesta completa
+            return response
+
+        # MODO DIRECTO (por defecto): una sola respuesta con toda
+        # la serie desde 1980. Los tramos se leen en flujo y se agregan a anual sin cargar
+        # nunca la serie diaria completa.
+        resultado = obtener_evolucion(ubicacion['celda'], lat, lon)
+        chart_data = resultado['data']
+
+        if not chart_data:
              print("DEBUG: API no devolvió bloque 'daily'.")
              return JsonResponse({'success': False, 'message': 'Sin datos diarios.'}, status=404)
 
-        # Procesamos: Diario -> Anual
-        chart_data = process_daily_to_annual(api_data['daily'])
-        
         print(f"Datos generados: {len(chart_data)} años.")
 
-        return JsonResponse({
+        respuesta = {
             'success': True,
             'data': chart_data
-        })
+        }
+        # Opcional: tendencia lineal por década, media móvil y medias decadales
+        if data.get('tendencias'):
+            respuesta['tendencias'] = resultado['tendencias']
+        return JsonResponse(respuesta)
 
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -0,0 +1,272 @@
+# logica_exportacion.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+import csv
+import json
+from datetime import date
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import RegistroDiario, VARIABLES_REGISTRO_DIARIO
+from .regiones import clave_celda, resolver_comuna, resolver_region, REGION_COORDS
+from .logica_resultado import calculate_metrics
+
+# Filas que se leen de la BD por vuelta (iteración del lado del servidor)
+FILAS_POR_LOTE = 2000
+
+# Filas por grupo (row group) en Parquet: cada grupo se envía apenas se escribe.
+# El primero es de un solo lote de la BD (la descarga empieza enseguida) y cada
+# siguiente dobla al anterior hasta este máximo (grupos grandes comprimen mejor)
+FILAS_POR_GRUPO_PARQUET = 50000
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Columnas del almacén diario, en el mismo orden que las variables de Open-Meteo
+COLUMNAS_DIARIAS = list(VARIABLES_REGISTRO_DIARIO.values())
+
+# Claves que espera calculate_metrics para cada columna del almacén
+VARIABLES_METRICAS = list(VARIABLES_REGISTRO_DIARIO)
+
+METRICAS_EXPORTADAS = [
+    'num_dias', 'temp_max_avg', 'temp_min_avg', 'precip_sum', 'wind_max',
+    'radiation_sum', 'temp_max_abs', 'temp_min_abs', 'humidity_max_abs',
+]
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Agregación en Flujo (Diario -> Mensual / Anual)
+# ==============================================================================
+def agregar_filas(filas, nivel):
+    """
+    Recibe filas (celda, fecha, *COLUMNAS_DIARIAS) ORDENADAS por celda y fecha y
+    emite una fila agregada (celda, periodo, *METRICAS_EXPORTADAS) cada vez que
+    cambia el periodo. Sólo se mantiene en memoria el periodo en curso.
+    """
+    clave_actual = None
+    grupo = None
+
+    for celda, fecha, *valores in filas:
+        periodo = str(fecha.year) if nivel == 'anual' else f"{fecha.year}-{fecha.month:02d}"
+        if (celda, periodo) != clave_actual:
+            if clave_actual:
+                yield _fila_agregada(clave_actual, grupo)
+            clave_actual = (celda, periodo)
+            grupo = {'time': [], **{var: [] for var in VARIABLES_METRICAS}}
+
+        grupo['time'].append(fecha)
+        for var, valor in zip(VARIABLES_METRICAS, valores):
+            if valor is not None:
+                grupo[var].append(valor)
+
+    if clave_actual:
+        yield _fila_agregada(clave_actual, grupo)
+
+
+def _fila_agregada(clave, grupo):
+    metrics = calculate_metrics(grupo)
+    return [*clave, *(metrics[m] for m in METRICAS_EXPORTADAS)]
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Escritores Incrementales (CSV / NDJSON / Parquet)
+# ==============================================================================
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: devuelve lo escrito en vez de guardarlo.
+    """
+    def write(self, value):
+        return value
+
+
+def escribir_csv(filas, columnas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas)
+    for fila in filas:
+        yield escritor.writerow(fila)
+
+
+def escribir_ndjson(filas, columnas):
+    for fila in filas:
+        yield json.dumps(dict(zip(columnas, fila)), cls=DjangoJSONEncoder) + '\n'
+
+
+class _Sumidero:
+    """
+    Destino de ParquetWriter que acumula bytes hasta que el generador los vacía.
+    """
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def parquet_disponible():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def escribir_parquet(filas, columnas, tipos):
+    """
+    Escribe Parquet por grupos de filas y envía cada grupo apenas está listo.
+    Requiere pyarrow (dependencia opcional: comprobar con parquet_disponible()).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tipos_arrow = {
+        'texto': pa.string(), 'fecha': pa.date32(), 'fecha_hora': pa.timestamp('us', tz='UTC'),
+        'real': pa.float64(), 'entero': pa.int64(),
+    }
+    esquema = pa.schema([(col, tipos_arrow[tipo]) for col, tipo in zip(columnas, tipos)])
+    sumidero = _Sumidero()
+    escritor = pq.ParquetWriter(sumidero, esquema)
+
+    def escribir_lote(lote):
+        columnas_lote = [
+            [float(v) if (tipo == 'real' and v is not None) else v for v in valores]
+            for valores, tipo in zip(zip(*lote), tipos)
+        ]
+        escritor.write_table(pa.Table.from_arrays(
+            [pa.array(valores, type=esquema.field(i).type) for i, valores in enumerate(columnas_lote)],
+            schema=esquema,
+        ))
+
+    lote = []
+    tamaño_grupo = FILAS_POR_LOTE
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamaño_grupo:
+            escribir_lote(lote)
+            lote = []
+            tamaño_grupo = min(tamaño_grupo * 2, FILAS_POR_GRUPO_PARQUET)
+            yield sumidero.vaciar()
+    if lote:
+        escribir_lote(lote)
+    escritor.close()
+    yield sumidero.vaciar()
+
+
+def respuesta_exportacion(filas, columnas, tipos, formato, nombre_archivo):
+    """
+    StreamingHttpResponse que escribe 'filas' en el formato pedido a medida que se leen.
+    """
+    if formato == 'csv':
+        contenido = escribir_csv(filas, columnas)
+    elif formato == 'ndjson':
+        contenido = escribir_ndjson(filas, columnas)
+    else:
+        contenido = escribir_parquet(filas, columnas, tipos)
+
+    content_type, extension = FORMATOS[formato]
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}.{extension}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def validar_formato(formato):
+    """
+    Devuelve un mensaje de error si el formato no se puede exportar, o None.
+    """
+    if formato not in FORMATOS:
+        return f"Formato no válido. Use: {', '.join(FORMATOS)}."
+    if formato == 'parquet' and not parquet_disponible():
+        return "La exportación a Parquet requiere instalar 'pyarrow'."
+    return None
+
+# ==============================================================================
+# VISTA: exportar_datos - Descarga Masiva del Almacén (sólo staff)
+# ==============================================================================
+@staff_member_required
+def exportar_datos(request):
+    """
+    GET /clima/exportar/?region=ARICA&comuna=PUENTE_ALTO&desde=1980-01-01&hasta=2020-12-31
+        &nivel=diario|mensual|anual&formato=csv|ndjson|parquet
+    'region' y 'comuna' se pueden repetir; sin ninguno se exportan todas las celdas
+    guardadas, y entonces 'desde' y 'hasta' son obligatorios.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    formato = request.GET.get('formato', 'csv')
+    nivel = request.GET.get('nivel', 'diario')
+
+    error = validar_formato(formato)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    if nivel not in ('diario', 'mensual', 'anual'):
+        return JsonResponse({'success': False, 'message': 'Nivel no válido. Use: diario, mensual, anual.'}, status=400)
+
+    # Ubicaciones -> celdas de grilla
+    celdas = set()
+    for codigo in request.GET.getlist('region'):
+        region_code = resolver_region(codigo)
+        if not region_code:
+            return JsonResponse({'success': False, 'message': f'Región no válida: {codigo}'}, status=400)
+        celdas.add(clave_celda(*REGION_COORDS[region_code]))
+    for codigo in request.GET.getlist('comuna'):
+        comuna = resolver_comuna(codigo)
+        if not comuna:
+            return JsonResponse({'success': False, 'message': f'Comuna no válida: {codigo}'}, status=400)
+        celdas.add(clave_celda(comuna.lat, comuna.lon))
+
+    if not celdas and not (request.GET.get('desde') and request.GET.get('hasta')):
+        return JsonResponse({
+            'success': False,
+            'message': "Indique 'region' o 'comuna', o un periodo con 'desde' y 'hasta'.",
+        }, status=400)
+
+    queryset = RegistroDiario.objects.all()
+    if celdas:
+        queryset = queryset.filter(celda__in=celdas)
+    try:
+        if request.GET.get('desde'):
+            queryset = queryset.filter(fecha__gte=date.fromisoformat(request.GET['desde']))
+        if request.GET.get('hasta'):
+            queryset = queryset.filter(fecha__lte=date.fromisoformat(request.GET['hasta']))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Fechas inválidas (use AAAA-MM-DD).'}, status=400)
+
+    # Iteración del lado del servidor: nunca se cargan todas las filas en memoria
+    filas = (
+        queryset.order_by('celda', 'fecha')
+        .values_list('celda', 'fecha', *COLUMNAS_DIARIAS)
+        .iterator(chunk_size=FILAS_POR_LOTE)
+    )
+
+    if nivel == 'diario':
+        columnas = ['celda', 'fecha', *COLUMNAS_DIARIAS]
+        tipos = ['texto', 'fecha'] + ['real'] * len(COLUMNAS_DIARIAS)
+    else:
+        filas = agregar_filas(filas, nivel)
+        columnas = ['celda', 'periodo', *METRICAS_EXPORTADAS]
+        tipos = ['texto', 'texto', 'entero'] + ['real'] * (len(METRICAS_EXPORTADAS) - 1)
+
+    return respuesta_exportacion(filas, columnas, tipos, formato, f"clima_{nivel}")
@@ -0,0 +1,102 @@
+# logica_mapa_calor.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+import json
+from datetime import date
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from .regiones import resolver_ubicacion
+from .cliente_api import TTL_RECIENTE
+from .acumuladores import AcumuladorPeriodos
+from .logica_evolucion import AÑO_INICIO_EVOLUCION, acumuladores_evolucion
+
+# Una matriz por cada métrica de calculate_metrics, con la misma agregación mensual:
+# (clave, variable de Open-Meteo, estadística, decimales, etiqueta, unidad)
+MATRICES_MAPA_CALOR = [
+    ('temp_max_avg', 'temperature_2m_max', 'media', 1, 'T° Máx Promedio', '°C'),
+    ('temp_min_avg', 'temperature_2m_min', 'media', 1, 'T° Mín Promedio', '°C'),
+    ('precip_sum', 'precipitation_sum', 'suma', 1, 'Precipitación Total', 'mm'),
+    ('wind_max', 'wind_speed_10m_max', 'maximo', 1, 'Viento Máximo', 'km/h'),
+    ('radiation_sum', 'shortwave_radiation_sum', 'suma', 1, 'Radiación Solar Total', 'MJ/m²'),
+    ('humidity_max_abs', 'relative_humidity_2m_max', 'maximo', 0, 'Humedad Máxima', '%'),
+]
+
+# ==============================================================================
+# FUNCIÓN DE PROCESAMIENTO: Serie Diaria -> Matrices Año × Mes
+# ==============================================================================
+def construir_mapa_calor(acumulador):
+    """
+    Matrices densas año × mes (una fila por año, 12 columnas) para cada métrica,
+    con su mínimo y máximo para la escala de colores.
+    """
+    variables = {}
+    años = []
+    for clave, variable, estadistica, decimales, etiqueta, unidad in MATRICES_MAPA_CALOR:
+        años, valores = acumulador.matriz_mensual(variable, estadistica, decimales)
+        presentes = [v for fila in valores for v in fila if v is not None]
+        variables[clave] = {
+            'etiqueta': etiqueta,
+            'unidad': unidad,
+            'valores': valores,
+            'min': min(presentes) if presentes else None,
+            'max': max(presentes) if presentes else None,
+        }
+    return {'años': años, 'variables': variables}
+
+
+def obtener_mapa_calor(celda, lat, lon):
+    """
+    Mapa de calor desde 1980 para una celda: desde la caché o agregando en una sola
+    pasada los tramos de la serie de evolución (que comparte sus descargas en caché).
+    """
+    clave = f"mapa_calor:{celda}:{date.today().isoformat()}"
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    acumulador = AcumuladorPeriodos(date(AÑO_INICIO_EVOLUCION, 1, 1))
+    for start_date, end_date, acumulador_tramo, error in acumuladores_evolucion(lat, lon):
+        if error is not None:
+            raise error
+        acumulador.combinar(acumulador_tramo)
+
+    resultado = construir_mapa_calor(acumulador)
+    if resultado['años']:
+        cache.set(clave, resultado, TTL_RECIENTE)
+    return resultado
+
+# ==============================================================================
+# VISTA AJAX: fetch_mapa_calor_ajax - Matriz Año × Mes
+# ==============================================================================
+@csrf_exempt
+def fetch_mapa_calor_ajax(request):
+    """
+    Una sola petición devuelve todos los meses de todos los años para las seis
+    métricas (en vez de una llamada a fetch_clima_data_ajax por año y mes).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body.decode('utf-8'))
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'message': 'Formato JSON inválido'}, status=400)
+
+    ubicacion = resolver_ubicacion(data)
+    if not ubicacion:
+        return JsonResponse({'success': False, 'message': 'Código de región no válido.'}, status=400)
+
+    try:
+        resultado = obtener_mapa_calor(ubicacion['celda'], ubicacion['lat'], ubicacion['lon'])
+    except Exception as e:
+        print(f"❌ Error en mapa de calor: {str(e)}")
+        return JsonResponse({'success': False, 'message': f'Error servidor: {str(e)}'}, status=500)
+
+    if not resultado['años']:
+        return JsonResponse({'success': False, 'message': 'Sin datos diarios.'}, status=404)
+
+    return JsonResponse({'success': True, **resultado})
@@ -0,0 +1,233 @@
+# logica_normales.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+import json
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+# Registro único de regiones (las normales se guardan por celda de grilla)
+from .regiones import resolver_ubicacion
+
+# Reutilizamos el cálculo de métricas y de periodos de logica_resultado
+from .logica_resultado import METRICAS_DIARIAS, calculate_metrics, obtener_metricas_periodo, resolver_campos
+from .models import NormalClimatologica
+
+# 'requests' sólo se importa si hace falta (errores HTTP), ver arranque.py
+from .arranque import importacion_diferida
+requests = importacion_diferida('requests')
+
+# Periodo de referencia estándar de la OMM para las normales
+AÑO_INICIO_NORMAL = 1991
+AÑO_FIN_NORMAL = 2020
+
+# Métricas de calculate_metrics que tienen normal ('num_dias' no es una variable climática)
+METRICAS_NORMALES = [
+    'temp_max_avg',
+    'temp_min_avg',
+    'precip_sum',
+    'wind_max',
+    'radiation_sum',
+    'temp_max_abs',
+    'temp_min_abs',
+    'humidity_max_abs',
+]
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Percentiles
+# ==============================================================================
+def percentil(valores_ordenados, p):
+    """
+    Percentil 'p' (0-100) de una lista ORDENADA, con interpolación lineal.
+    """
+    if not valores_ordenados:
+        return None
+    posicion = (len(valores_ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores_ordenados) - 1)
+    fraccion = posicion - inferior
+    return valores_ordenados[inferior] + (valores_ordenados[superior] - valores_ordenados[inferior]) * fraccion
+
+
+def rango_percentil(valores_ordenados, valor):
+    """
+    Porcentaje de la muestra que queda por debajo de 'valor' (los empates cuentan la mitad).
+    """
+    if not valores_ordenados:
+        return None
+    menores = bisect_left(valores_ordenados, valor)
+    iguales = bisect_right(valores_ordenados, valor) - menores
+    return round(100 * (menores + 0.5 * iguales) / len(valores_ordenados), 1)
+
+
+def dia_del_año(fecha):
+    """
+    Día del año en calendario bisiesto (29-feb = 60 siempre), para que un mismo
+    día del calendario tenga el mismo índice en todos los años.
+    """
+    return date(2000, fecha.month, fecha.day).timetuple().tm_yday
+
+# ==============================================================================
+# FUNCIÓN DE PROCESAMIENTO: Serie Diaria -> Normales (se ejecuta OFFLINE)
+# ==============================================================================
+def calcular_normales(daily_data):
+    """
+    Agrupa una serie diaria larga (ej: 1991-2020) por año, por año-mes y por día,
+    aplica calculate_metrics a cada grupo y devuelve la distribución de cada métrica:
+    { ('mensual', 3): {'precip_sum': [v1991, v1992, ...], ...}, ... }
+    """
+    times = daily_data.get('time', [])
+
+    # Índices de los días que pertenecen a cada grupo
+    grupos = defaultdict(list)
+    for i, date_str in enumerate(times):
+        if not date_str: continue
+        fecha = date.fromisoformat(date_str)
+        grupos[('anual', 0, fecha.year)].append(i)
+        grupos[('mensual', fecha.month, fecha.year)].append(i)
+        grupos[('diaria', dia_del_año(fecha), fecha.year)].append(i)
+
+    muestras = defaultdict(lambda: defaultdict(list))
+    for (escala, periodo, _año), indices in grupos.items():
+        # Sub-serie con sólo los días del grupo (descartando los None de la API)
+        subconjunto = {
+            clave: [serie[i] for i in indices if serie[i] is not None]
+            for clave, serie in daily_data.items()
+        }
+        metrics = calculate_metrics(subconjunto)
+        if not metrics:
+            continue
+        for metrica in METRICAS_NORMALES:
+            # Sin ningún valor de la variable en el grupo, calculate_metrics da 0.0: no es una muestra
+            if not subconjunto.get(METRICAS_DIARIAS[metrica][0]):
+                continue
+            muestras[(escala, periodo)][metrica].append(metrics[metrica])
+
+    return muestras
+
+
+def construir_registros_normales(celda, muestras):
+    """
+    Convierte las muestras de calcular_normales en instancias de NormalClimatologica.
+    """
+    registros = []
+    for (escala, periodo), metricas in muestras.items():
+        for metrica, valores in metricas.items():
+            valores = sorted(valores)
+            registros.append(NormalClimatologica(
+                celda=celda,
+                escala=escala,
+                periodo=periodo,
+                metrica=metrica,
+                media=round(sum(valores) / len(valores), 2),
+                p10=round(percentil(valores, 10), 2),
+                p50=round(percentil(valores, 50), 2),
+                p90=round(percentil(valores, 90), 2),
+                valores=valores,
+            ))
+    return registros
+
+# ==============================================================================
+# FUNCIÓN AUXILIAR: Anomalías respecto de la Normal
+# ==============================================================================
+def calcular_anomalias(celda, escala, periodo, metrics):
+    """
+    Busca las normales del periodo (una sola consulta a la tabla) y devuelve
+    (normales, anomalias, percentiles) para las métricas recibidas.
+    """
+    normales, anomalias, percentiles = {}, {}, {}
+
+    filas = NormalClimatologica.objects.filter(celda=celda, escala=escala, periodo=periodo)
+    for fila in filas:
+        valor = metrics.get(fila.metrica)
+        if valor is None:
+            continue
+        normales[fila.metrica] = {'media': fila.media, 'p10': fila.p10, 'p50': fila.p50, 'p90': fila.p90}
+        anomalias[fila.metrica] = round(valor - fila.media, 1)
+        percentiles[fila.metrica] = rango_percentil(fila.valores, valor)
+
+    return normales, anomalias, percentiles
+
+# ==============================================================================
+# VISTA AJAX: fetch_anomalias_ajax - Métricas + Anomalías
+# ==============================================================================
+@csrf_exempt
+def fetch_anomalias_ajax(request):
+    """
+    Igual que fetch_clima_data_ajax (mismos parámetros y mismas 'metrics'), pero añade
+    la normal 1991-2020, la anomalía y el rango percentil de cada métrica.
+    Acepta además 'day' (junto con 'month') para comparar un solo día.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Formato JSON inválido'}, status=400)
+
+    ubicacion = resolver_ubicacion(data)
+    if not ubicacion:
+        return JsonResponse({'error': 'Falta el código de la región'}, status=400)
+
+    try:
+        year = int(data.get('year'))
+        month = int(data.get('month', 0))
+        day = int(data['day']) if data.get('day') else None
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Año, mes o día inválidos'}, status=400)
+    period_end_limit = data.get('period_end')
+
+    # Selección opcional de métricas ('fields'): sólo se descargan y comparan esas
+    campos, error = resolver_campos(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+
+    lat, lon = ubicacion['lat'], ubicacion['lon']
+
+    try:
+        periodo_label, metrics = obtener_metricas_periodo(lat, lon, year, month, period_end_limit, day, campos)
+    except requests.exceptions.HTTPError as e:
+        return JsonResponse({'success': False, 'message': f'Error API: El servidor externo devolvió un error ({e.response.status_code}).'}, status=500)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': f'Error inesperado del servidor: {e}'}, status=500)
+
+    if not metrics:
+        return JsonResponse({'success': False, 'message': 'API no devolvió datos diarios para este periodo.'}, status=404)
+
+    return JsonResponse(respuesta_anomalias(ubicacion['celda'], year, month, day, periodo_label, metrics))
+
+
+def respuesta_anomalias(celda, year, month, day, periodo_label, metrics):
+    """
+    Cuerpo de la respuesta de fetch_anomalias_ajax para unas métricas ya calculadas
+    (también lo usa 'publicar_snapshots' para escribir los periodos cerrados).
+    """
+    # Escala y periodo de la normal correspondiente
+    if day:
+        escala, periodo = 'diaria', dia_del_año(date(year, month, day))
+        dias_esperados = 1
+    elif month:
+        escala, periodo = 'mensual', month
+        dias_esperados = (date(year + (month == 12), month % 12 + 1, 1) - date(year, month, 1)).days
+    else:
+        escala, periodo = 'anual', 0
+        dias_esperados = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+    normales, anomalias, percentiles = calcular_anomalias(celda, escala, periodo, metrics)
+
+    return {
+        'success': True,
+        'periodo_label': periodo_label,
+        'metrics': metrics,
+        'normales': normales,
+        'anomalias': anomalias,
+        'percentiles': percentiles,
+        'periodo_referencia': f'{AÑO_INICIO_NORMAL}-{AÑO_FIN_NORMAL}',
+        # Las sumas de un periodo recortado (año/mes en curso) no son comparables con la normal
+        'periodo_incompleto': metrics['num_dias'] < dias_esperados,
+    }
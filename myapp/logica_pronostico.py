@@ -3,20 +3,25 @@
 # ==============================================================================
 # IMPORTACIONES CLAVE para este módulo
 # ==============================================================================
-import requests
 import json
 from datetime import date, timedelta
 from django.http import JsonResponse, Http404 
 from django.views.decorators.csrf import csrf_exempt 
 
-# Mapeos necesarios de views.py
-from .views import REGION_COORDS 
+# Registro único de regiones y cliente de Open-Meteo (caché por celda de grilla)
+from .regiones import resolver_ubicacion
+from .cliente_api import ARCHIVE_URL, FORECAST_URL, VARIABLES_DIARIAS, consultar_archivo, consultar_open_meteo, leer_cache
+
+# 'requests' sólo se importa si hace falta (errores HTTP), ver arranque.py
+from .arranque import importacion_diferida
+requests = importacion_diferida('requests')
 
 # Importamos la función de cálculo de métricas de logica_resultado
-from .logica_resultado import calculate_metrics 
+from .logica_resultado import METRICAS_DIARIAS, calculate_metrics, resolver_campos, variables_diarias
 
-# Variables globales/constantes
-today = date.today()
+# Métricas que salen de la serie horaria (las demás, de la diaria como en calculate_metrics)
+VARIABLE_HORARIA = 'temperature_2m'
+METRICAS_HORARIAS = ['temp_12pm', 'temp_6pm']
 
 # ==============================================================================
 # FUNCIÓN AUXILIAR: Extracción de Temperaturas por Hora (12 PM y 6 PM)
@@ -55,6 +60,70 @@ def extract_hourly_temps(api_data):
         'temp_6pm': temp_6pm,
     }
 
+def variables_pronostico(campos=None):
+    """
+    (daily, hourly) que hay que pedir a Open-Meteo para los campos del slider;
+    la serie horaria sólo se pide si se muestran las temperaturas de las 12:00/18:00.
+    """
+    if campos is None:
+        return VARIABLES_DIARIAS, VARIABLE_HORARIA
+    diarios = [c for c in campos if c not in METRICAS_HORARIAS]
+    horarios = [c for c in campos if c in METRICAS_HORARIAS]
+    return variables_diarias(diarios) or None, VARIABLE_HORARIA if horarios else None
+
+
+def metricas_pronostico(api_data, campos=None):
+    """
+    Métricas diarias + temperaturas de las 12:00 y 18:00 de una respuesta de un solo día
+    (todas, o sólo las de 'campos'), o None si falta alguna de las partes pedidas.
+    """
+    daily, hourly = variables_pronostico(campos)
+    final_metrics = {}
+    if hourly:
+        hourly_metrics = extract_hourly_temps(api_data)
+        if not hourly_metrics:
+            return None
+        final_metrics.update({c: hourly_metrics[c] for c in METRICAS_HORARIAS if campos is None or c in campos})
+    if daily:
+        campos_diarios = None if campos is None else [c for c in campos if c not in METRICAS_HORARIAS]
+        daily_metrics = calculate_metrics(api_data.get('daily', {}), campos_diarios) # USAMOS calculate_metrics DE logica_resultado
+        if not daily_metrics:
+            return None
+        final_metrics.update(daily_metrics)
+    return final_metrics or None
+
+
+def fuente_pronostico(days_offset, target_date_string):
+    """
+    (API_URL, periodo_label, is_forecast_result) para un desplazamiento del slider:
+    el pasado reciente sale del Archive y hoy/futuro del Forecast.
+    """
+    if days_offset < 0: # Histórico Reciente (hasta 14 días atrás)
+        return ARCHIVE_URL, f"Histórico: {target_date_string}", False
+    if days_offset == 0:
+        return FORECAST_URL, f"Actualidad: {target_date_string}", True
+    return FORECAST_URL, f"Pronóstico: {target_date_string}", True
+
+
+def pronostico_desde_cache(lat, lon, days_offset=0):
+    """
+    Respuesta de fetch_pronostico_ajax para un día cuya descarga ya está en la caché
+    (sin llamar a la API), o None. La usa pronostico_detalle_view para incrustar hoy.
+    """
+    target_date_string = (date.today() + timedelta(days=days_offset)).strftime('%Y-%m-%d')
+    API_URL, periodo_label, is_forecast_result = fuente_pronostico(days_offset, target_date_string)
+    api_data = leer_cache(API_URL, lat, lon, target_date_string, target_date_string,
+                          VARIABLES_DIARIAS, VARIABLE_HORARIA)
+    final_metrics = metricas_pronostico(api_data) if api_data else None
+    if not final_metrics:
+        return None
+    return {
+        'success': True,
+        'periodo_label': periodo_label,
+        'metrics': final_metrics,
+        'is_forecast_result': is_forecast_result
+    }
+
 # ==============================================================================
 # VISTA AJAX: fetch_pronostico_ajax - Diario/Forecast
 # ==============================================================================
@@ -72,13 +141,20 @@ def fetch_pronostico_ajax(request):
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Formato JSON inválido'}, status=400)
 
-    region_code = data.get('region_code')
+    # Región, comuna o lat/lon -> coordenadas (ver regiones.resolver_ubicacion)
+    ubicacion = resolver_ubicacion(data)
     days_offset = int(data.get('days_offset', 0)) # Offset: -14 a +14
     
-    if not region_code:
+    if not ubicacion:
         return JsonResponse({'error': 'Falta el código de la región'}, status=400)
+
+    # Selección opcional de métricas ('fields'): define las series diarias/horarias a pedir
+    campos, error = resolver_campos(data, permitidos=METRICAS_HORARIAS + list(METRICAS_DIARIAS))
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    daily, hourly = variables_pronostico(campos)
     
-    lat, lon = REGION_COORDS.get(region_code)
+    lat, lon = ubicacion['lat'], ubicacion['lon']
 
     # 1. Calcular la fecha de consulta
     today = date.today()
@@ -86,50 +162,23 @@ def fetch_pronostico_ajax(request):
     target_date_string = target_date.strftime('%Y-%m-%d')
     
     # 2. Definir API URL y parámetros
-    if days_offset < 0: # Histórico Reciente (hasta 14 días atrás)
-        API_URL = "https://archive-api.open-meteo.com/v1/archive" 
-        start_date = target_date_string
-        end_date = target_date_string
-        periodo_label = f"Histórico: {target_date_string}"
-        is_forecast_result = False
-    
-    else: # Hoy (0) o Forecast (1 a +14)
-        API_URL = "https://api.open-meteo.com/v1/forecast"
-        start_date = target_date_string
-        end_date = target_date_string 
-        
-        if days_offset == 0:
-            periodo_label = f"Actualidad: {target_date_string}"
-        else:
-            periodo_label = f"Pronóstico: {target_date_string}"
-        
-        is_forecast_result = True
-        
-    
-    # Parámetros 
-    params = {
-        'latitude': lat,
-        'longitude': lon,
-        'start_date': start_date,
-        'end_date': end_date, 
-        'hourly': 'temperature_2m',
-        'daily': 'temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max,shortwave_radiation_sum,relative_humidity_2m_max', 
-        'timezone': 'auto'
-    }
+    API_URL, periodo_label, is_forecast_result = fuente_pronostico(days_offset, target_date_string)
+    start_date = target_date_string
+    end_date = target_date_string
 
-    # 3. Solicitud a la API
+    # 3. Solicitud a la API (ajustada a la celda de grilla y cacheada)
     try:
-        response = requests.get(API_URL, params=params)
-        response.raise_for_status() 
-        api_data = response.json()
+        if API_URL == ARCHIVE_URL:
+            # Pasado: lo diario puede salir del almacén (sólo se descarga lo que falta)
+            api_data = consultar_archivo(lat, lon, start_date, end_date, daily=daily, hourly=hourly)
+        else:
+            api_data = consultar_open_meteo(API_URL, lat, lon, start_date, end_date,
+                                            daily=daily, hourly=hourly)
         
         # 4. Procesar la respuesta
-        hourly_metrics = extract_hourly_temps(api_data) 
-        daily_metrics = calculate_metrics(api_data.get('daily', {})) # USAMOS calculate_metrics DE logica_resultado
+        final_metrics = metricas_pronostico(api_data, campos)
         
-        if hourly_metrics and daily_metrics:
-            final_metrics = {**hourly_metrics, **daily_metrics}
-            
+        if final_metrics:
             # 5. Devolver las métricas
             return JsonResponse({
                 'success': True,
@@ -141,6 +190,6 @@ def fetch_pronostico_ajax(request):
             return JsonResponse({'success': False, 'message': 'API no devolvió datos para la fecha seleccionada.'}, status=404)
             
     except requests.exceptions.HTTPError as e:
-        return JsonResponse({'success': False, 'message': f'Error API: El servidor externo devolvió un error ({response.status_code}).'}, status=500)
+        return JsonResponse({'success': False, 'message': f'Error API: El servidor externo devolvió un error ({e.response.status_code}).'}, status=500)
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error inesperado del servidor: {e}'}, status=500)
\ No newline at end of file
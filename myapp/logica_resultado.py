@@ -3,91 +3,112 @@
 # ==============================================================================
 # IMPORTACIONES CLAVE para este módulo
 # ==============================================================================
-import requests
 import json
 from datetime import date, timedelta
 from calendar import monthrange
 from django.http import JsonResponse, Http404 
 from django.views.decorators.csrf import csrf_exempt 
 
-# Mapeos necesarios de views.py
-from .views import REGION_COORDS, REGION_BACKGROUNDS, REGIONES_CHOICES 
+# Registro único de regiones y cliente de Open-Meteo (caché por celda de grilla)
+from .regiones import resolver_ubicacion
+from .cliente_api import VARIABLES_DIARIAS, consultar_archivo
 
-# Variables globales/constantes
-today = date.today()
+# 'requests' sólo se importa si hace falta (errores HTTP), ver arranque.py
+from .arranque import importacion_diferida
+requests = importacion_diferida('requests')
+
+# ==============================================================================
+# MÉTRICAS DIARIAS: Variable de Origen y Agregación
+# ==============================================================================
+# Cada métrica de calculate_metrics sale de UNA variable diaria de Open-Meteo:
+# (variable, agregación, decimales). 'num_dias' se incluye siempre.
+METRICAS_DIARIAS = {
+    'temp_max_avg': ('temperature_2m_max', 'media', 1),
+    'temp_min_avg': ('temperature_2m_min', 'media', 1),
+    'precip_sum': ('precipitation_sum', 'suma', 1),
+    'wind_max': ('wind_speed_10m_max', 'maximo', 1),
+    'radiation_sum': ('shortwave_radiation_sum', 'suma', 1),
+    'temp_max_abs': ('temperature_2m_max', 'maximo', 1),
+    'temp_min_abs': ('temperature_2m_min', 'minimo', 1),
+    'humidity_max_abs': ('relative_humidity_2m_max', 'maximo', 0),
+}
+
+
+def resolver_campos(data, permitidos=METRICAS_DIARIAS):
+    """
+    Lee la selección 'fields' de una petición (lista o 'a,b'): (campos, error).
+    campos es None si no se pidió selección (se calculan todas las métricas).
+    """
+    fields = data.get('fields')
+    if not fields:
+        return None, None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    campos = [str(f).strip() for f in fields if str(f).strip()]
+    desconocidos = [c for c in campos if c != 'num_dias' and c not in permitidos]
+    if desconocidos:
+        return None, f"Campos no válidos: {', '.join(desconocidos)}"
+    return campos, None
+
+
+def variables_diarias(campos=None):
+    """
+    Variables 'daily' de Open-Meteo que necesitan los campos pedidos, en el orden
+    de VARIABLES_DIARIAS ('' si no se pidió ningún campo diario).
+    """
+    if campos is None:
+        return VARIABLES_DIARIAS
+    necesarias = {METRICAS_DIARIAS[c][0] for c in campos if c in METRICAS_DIARIAS}
+    daily = ','.join(v for v in VARIABLES_DIARIAS.split(',') if v in necesarias)
+    # Sólo 'num_dias': basta con la columna 'time' de una variable cualquiera
+    return daily or (VARIABLES_DIARIAS.split(',')[0] if 'num_dias' in campos else '')
 
 # ==============================================================================
 # FUNCIÓN AUXILIAR: Cálculo de Métricas
 # ==============================================================================
-def calculate_metrics(daily_data):
+def calculate_metrics(daily_data, campos=None):
     """
-    Calcula todas las métricas clave de un conjunto de datos diarios.
+    Calcula las métricas clave de un conjunto de datos diarios: todas, o sólo las de
+    'campos' (sin recorrer las variables que no se pidieron).
     """
     times = daily_data.get('time', [])
-    temps_max = daily_data.get('temperature_2m_max', [])
-    temps_min = daily_data.get('temperature_2m_min', [])
-    precips = daily_data.get('precipitation_sum', [])
-    wind_speeds = daily_data.get('wind_speed_10m_max', [])
-    radiation = daily_data.get('shortwave_radiation_sum', [])
-    humidity_max = daily_data.get('relative_humidity_2m_max', [])   
     num_days = len(times)
     
     if num_days == 0:
         return None 
     
-    # Cálculo de métricas
-    temp_max_avg = round(sum(temps_max) / num_days, 1) if temps_max else 0.0
-    temp_min_avg = round(sum(temps_min) / num_days, 1) if temps_min else 0.0
-    precip_sum = round(sum(precips), 1) if precips else 0.0
-    wind_max = round(max(wind_speeds), 1) if wind_speeds else 0.0
-    radiation_sum = round(sum(radiation), 1) if radiation else 0.0
-    humidity_max_abs = round(max(humidity_max), 0) if humidity_max else 0.0
-
-    return {
-        'num_dias': num_days,
-        'temp_max_avg': temp_max_avg, 
-        'temp_min_avg': temp_min_avg, 
-        'precip_sum': precip_sum,
-        'wind_max': wind_max,
-        'radiation_sum': radiation_sum,
-        'temp_max_abs': round(max(temps_max), 1) if temps_max else 0.0,
-        'temp_min_abs': round(min(temps_min), 1) if temps_min else 0.0,
-        'humidity_max_abs': humidity_max_abs,
-    }
+    metricas = {'num_dias': num_days}
+    for campo, (variable, agregacion, decimales) in METRICAS_DIARIAS.items():
+        if campos is not None and campo not in campos:
+            continue
+        # Sólo los días con dato: los None (ej: días recientes aún sin publicar) no cuentan como 0
+        serie = [v for v in daily_data.get(variable) or [] if v is not None]
+        if not serie:
+            metricas[campo] = 0.0
+        elif agregacion == 'media':
+            metricas[campo] = round(sum(serie) / len(serie), decimales)
+        elif agregacion == 'suma':
+            metricas[campo] = round(sum(serie), decimales)
+        elif agregacion == 'maximo':
+            metricas[campo] = round(max(serie), decimales)
+        else:
+            metricas[campo] = round(min(serie), decimales)
+    return metricas
 
 # ==============================================================================
-# VISTA AJAX: fetch_clima_data_ajax - Histórico
+# FUNCIÓN AUXILIAR: Rango de Fechas de un Periodo (Año / Mes / Día)
 # ==============================================================================
-@csrf_exempt 
-def fetch_clima_data_ajax(request):
+def calcular_periodo(year, month, period_end_limit=None, day=None):
     """
-    Maneja la solicitud AJAX para Histórico Anual/Mensual (API ARCHIVE).
+    Devuelve (start_date, end_date, periodo_label) para el periodo pedido.
+    month == 0 significa el año completo; si se indica 'day' el periodo es un solo día.
     """
-    if request.method != 'POST':
-        return JsonResponse({'error': 'Método no permitido'}, status=405)
-
-    try:
-        data = json.loads(request.body)
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'Formato JSON inválido'}, status=400)
+    today = date.today()
 
-    # 1. Obtener parámetros clave
-    region_code = data.get('region_code')
-    year = int(data.get('year'))
-    month = int(data.get('month'))
-    is_forecast = data.get('is_forecast', False) 
-    period_end_limit = data.get('period_end')    
-
-    if not region_code:
-        return JsonResponse({'error': 'Falta el código de la región'}, status=400)
-    
-    lat, lon = REGION_COORDS.get(region_code)
-
-    if is_forecast:
-        return JsonResponse({'success': False, 'message': 'El pronóstico se maneja en una URL diferente.'}, status=400)
-    
-    # LÓGICA DE HISTÓRICO (Slider) - Usa la API de ARCHIVE
-    API_URL = "https://archive-api.open-meteo.com/v1/archive" 
+    if day:
+        # Día específico solicitado (se usa para las anomalías diarias)
+        start_date = date(year, month, day)
+        return start_date, start_date, start_date.strftime('%Y-%m-%d')
 
     # 2a. Definir Fechas de Inicio y Fin basadas en el mes para el ARCHIVE
     if month == 0:
@@ -113,39 +134,81 @@ def fetch_clima_data_ajax(request):
             if year == today.year and month == today.month and end_date > limit_obj:
                 end_date = limit_obj
 
-    # Parámetros para el Archive
-    params = {
-        'latitude': lat,
-        'longitude': lon,
-        'start_date': start_date,
-        'end_date': end_date, 
-        'daily': 'temperature_2m_max,temperature_2m_min,precipitation_sum,wind_speed_10m_max,shortwave_radiation_sum,relative_humidity_2m_max', 
-        'timezone': 'auto'
-    }
+    return start_date, end_date, periodo_label
 
+# ==============================================================================
+# FUNCIÓN AUXILIAR: Métricas de un Periodo desde la API ARCHIVE
+# ==============================================================================
+def obtener_metricas_periodo(lat, lon, year, month, period_end_limit=None, day=None, campos=None):
+    """
+    Descarga los datos diarios del periodo y devuelve (periodo_label, metrics).
+    Con 'campos' sólo se piden las variables (y se calculan las métricas) necesarias.
+    metrics es None si la API no devolvió datos. Los errores HTTP se propagan.
+    """
+    start_date, end_date, periodo_label = calcular_periodo(year, month, period_end_limit, day)
+
+    # Consulta al Archive (ajustada a la celda de grilla y cacheada por variable): los días
+    # ya guardados salen del almacén y a la API sólo van los rangos faltantes
+    api_data = consultar_archivo(lat, lon, start_date, end_date, daily=variables_diarias(campos))
+
+    if not api_data.get('daily'):
+        return periodo_label, None
+    return periodo_label, calculate_metrics(api_data['daily'], campos)
+
+# ==============================================================================
+# VISTA AJAX: fetch_clima_data_ajax - Histórico
+# ==============================================================================
+@csrf_exempt 
+def fetch_clima_data_ajax(request):
+    """
+    Maneja la solicitud AJAX para Histórico Anual/Mensual (API ARCHIVE).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Formato JSON inválido'}, status=400)
+
+    # 1. Obtener parámetros clave
+    # Región, comuna o lat/lon -> coordenadas (ver regiones.resolver_ubicacion)
+    ubicacion = resolver_ubicacion(data)
+    year = int(data.get('year'))
+    month = int(data.get('month'))
+    is_forecast = data.get('is_forecast', False) 
+    period_end_limit = data.get('period_end')    
+
+    if not ubicacion:
+        return JsonResponse({'error': 'Falta el código de la región'}, status=400)
+
+    # Selección opcional de métricas ('fields'): sólo se descargan y calculan esas
+    campos, error = resolver_campos(data)
+    if error:
+        return JsonResponse({'success': False, 'message': error}, status=400)
+    
+    lat, lon = ubicacion['lat'], ubicacion['lon']
+
+    if is_forecast:
+        return JsonResponse({'success': False, 'message': 'El pronóstico se maneja en una URL diferente.'}, status=400)
+    
+    # LÓGICA DE HISTÓRICO (Slider) - Usa la API de ARCHIVE
     # 3. Solicitud a la API
     try:
-        response = requests.get(API_URL, params=params)
-        response.raise_for_status() 
-        api_data = response.json()      
-        
+        periodo_label, metrics = obtener_metricas_periodo(lat, lon, year, month, period_end_limit, campos=campos)
+
         # 4. Procesar la respuesta
-        if api_data.get('daily'):
-            metrics = calculate_metrics(api_data['daily'])
-            
-            if metrics:
-                return JsonResponse({
-                    'success': True,
-                    'periodo_label': periodo_label,
-                    'metrics': metrics,
-                    'is_forecast_result': is_forecast
-                })
-            else:
-                return JsonResponse({'success': False, 'message': 'API no devolvió datos diarios para este periodo.'}, status=404)
+        if metrics:
+            return JsonResponse({
+                'success': True,
+                'periodo_label': periodo_label,
+                'metrics': metrics,
+                'is_forecast_result': is_forecast
+            })
         else:
             return JsonResponse({'success': False, 'message': 'API no devolvió datos diarios para este periodo.'}, status=404)
-            
+
     except requests.exceptions.HTTPError as e:
-        return JsonResponse({'success': False, 'message': f'Error API: El servidor externo devolvió un error ({response.status_code}).'}, status=500)
+        return JsonResponse({'success': False, 'message': f'Error API: El servidor externo devolvió un error ({e.response.status_code}).'}, status=500)
     except Exception as e:
         return JsonResponse({'success': False, 'message': f'Error inesperado del servidor: {e}'}, status=500)
@@ -0,0 +1,170 @@
+# logica_trabajos.py
+
+# ==============================================================================
+# IMPORTACIONES CLAVE para este módulo
+# ==============================================================================
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import TrabajoFondo
+
+# Función que ejecuta cada tipo de trabajo: recibe (parametros, reportar) y devuelve
+# el resultado final. 'reportar(parcial, progreso)' guarda un avance intermedio.
+# Se importan por nombre para no crear importaciones circulares con los logica_*.
+TIPOS_TRABAJO = {
+    'evolucion': 'myapp.logica_evolucion.trabajo_evolucion',
+}
+
+# Un trabajo 'en_curso' sin avances durante este tiempo se da por abandonado
+# (ej: el proceso que lo tomaba se reinició) y vuelve a la cola.
+SEGUNDOS_TRABAJO_COLGADO = 5 * 60
+
+# Valores por defecto; se pueden cambiar con settings.TRABAJOS_FONDO
+CONFIGURACION_TRABAJOS = {
+    # Hay un worker 'procesar_trabajos' supervisado: las páginas usan el modo trabajo
+    'WORKER_ACTIVO': False,
+    # Días que se conservan los trabajos terminados (completados o con error)
+    'DIAS_RETENCION': 7,
+}
+
+
+def configuracion():
+    return {**CONFIGURACION_TRABAJOS, **getattr(settings, 'TRABAJOS_FONDO', {})}
+
+# ==============================================================================
+# FUNCIONES AUXILIARES: Cola de Trabajos
+# ==============================================================================
+def encolar_trabajo(tipo, clave, parametros):
+    """
+    Devuelve el trabajo con esa clave, creándolo si no existe. Si la clave ya
+    está pendiente, en curso o completada se reutiliza; si falló, se reintenta.
+    """
+    try:
+        with transaction.atomic():
+            trabajo, creado = TrabajoFondo.objects.get_or_create(
+                clave=clave, defaults={'tipo': tipo, 'parametros': parametros}
+            )
+    except IntegrityError:
+        # Otra petición creó la misma clave al mismo tiempo
+        trabajo = TrabajoFondo.objects.get(clave=clave)
+
+    if trabajo.estado == 'error':
+        TrabajoFondo.objects.filter(pk=trabajo.pk, estado='error').update(
+            estado='pendiente', progreso=0, parciales=[], mensaje='', terminado=None, actualizado=timezone.now()
+        )
+        trabajo.refresh_from_db()
+    return trabajo
+
+
+def reencolar_colgados():
+    """
+    Devuelve a la cola los trabajos 'en_curso' que dejaron de avanzar.
+    """
+    limite = timezone.now() - timedelta(seconds=SEGUNDOS_TRABAJO_COLGADO)
+    return TrabajoFondo.objects.filter(estado='en_curso', actualizado__lt=limite).update(
+        estado='pendiente', progreso=0, parciales=[], actualizado=timezone.now()
+    )
+
+
+def limpiar_trabajos():
+    """
+    Borra los trabajos terminados hace más de DIAS_RETENCION días (se crea uno por
+    celda y día, así que sin esto la tabla sólo crece). Devuelve cuántos borró.
+    """
+    limite = timezone.now() - timedelta(days=configuracion()['DIAS_RETENCION'])
+    borrados, _detalle = TrabajoFondo.objects.filter(
+        estado__in=('completado', 'error'), terminado__lt=limite
+    ).delete()
+    return borrados
+
+
+def tomar_trabajo():
+    """
+    Reserva el trabajo pendiente más antiguo para este proceso, o None.
+    La reserva es un UPDATE condicionado: dos procesos nunca toman el mismo.
+    """
+    for trabajo in TrabajoFondo.objects.filter(estado='pendiente').order_by('creado')[:10]:
+        tomado = TrabajoFondo.objects.filter(pk=trabajo.pk, estado='pendiente').update(
+            estado='en_curso', actualizado=timezone.now()
+        )
+        if tomado:
+            trabajo.estado = 'en_curso'
+            return trabajo
+    return None
+
+
+def ejecutar_trabajo(trabajo):
+    """
+    Ejecuta un trabajo ya reservado y guarda sus avances y su resultado.
+    """
+    parciales = []
+
+    def reportar(parcial, progreso):
+        parciales.append(parcial)
+        TrabajoFondo.objects.filter(pk=trabajo.pk).update(
+            parciales=parciales, progreso=progreso, actualizado=timezone.now()
+        )
+
+    try:
+        funcion = import_string(TIPOS_TRABAJO[trabajo.tipo])
+        resultado = funcion(trabajo.parametros, reportar)
+    except Exception as e:
+        print(f"❌ Error en trabajo {trabajo.pk} ({trabajo.clave}): {str(e)}")
+        TrabajoFondo.objects.filter(pk=trabajo.pk).update(
+            estado='error', mensaje=str(e), terminado=timezone.now(), actualizado=timezone.now()
+        )
+        return False
+
+    TrabajoFondo.objects.filter(pk=trabajo.pk).update(
+        estado='completado', progreso=100, resultado=resultado,
+        terminado=timezone.now(), actualizado=timezone.now()
+    )
+    return True
+
+
+def resumen_trabajo(trabajo, desde_parcial=0):
+    """
+    Estado del trabajo para el cliente. Sólo incluye los parciales a partir de
+    'desde_parcial', para que cada consulta de sondeo traiga únicamente lo nuevo.
+    """
+    resumen = {
+        'success': trabajo.estado != 'error',
+        'trabajo_id': trabajo.pk,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'parciales': trabajo.parciales[desde_parcial:],
+        'total_parciales': len(trabajo.parciales),
+    }
+    if trabajo.estado == 'completado':
+        resumen['resultado'] = trabajo.resultado
+    if trabajo.estado == 'error':
+        resumen['message'] = f'Error servidor: {trabajo.mensaje}'
+    return resumen
+
+# ==============================================================================
+# VISTA AJAX: Estado de un Trabajo (Sondeo)
+# ==============================================================================
+def estado_trabajo_ajax(request, trabajo_id):
+    """
+    GET /clima/trabajo/<id>/?desde=N -> estado, progreso y parciales desde el N-ésimo.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'}, status=405)
+
+    try:
+        trabajo = TrabajoFondo.objects.get(pk=trabajo_id)
+    except TrabajoFondo.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Trabajo no encontrado.'}, status=404)
+
+    try:
+        desde_parcial = max(0, int(request.GET.get('desde', 0)))
+    except ValueError:
+        desde_parcial = 0
+
+    response = JsonResponse(resumen_trabajo(trabajo, desde_parcial))
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,67 @@
+# ==============================================================================
+# COMANDO: python manage.py calcular_normales
+# ==============================================================================
+# Construye OFFLINE la tabla de normales climatológicas (1991-2020) de cada región.
+# Se ejecuta una sola vez (o cuando cambie el periodo de referencia); después las
+# anomalías se resuelven con una búsqueda en la tabla, sin volver a descargar 30 años.
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from myapp.regiones import REGION_COORDS, resolver_region, clave_celda, cargar_comunas
+from myapp.cliente_api import ARCHIVE_URL, consultar_diario_por_tramos
+from myapp.cuota_api import prioridad_fondo
+from myapp.models import NormalClimatologica
+from myapp.logica_normales import (
+    AÑO_INICIO_NORMAL, AÑO_FIN_NORMAL, calcular_normales, construir_registros_normales,
+)
+
+
+class Command(BaseCommand):
+    help = "Calcula las normales climatológicas (media y percentiles) por región, mes y día del año."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', action='append', dest='regiones',
+                            help="Código de región (se puede repetir). Por defecto: todas.")
+        parser.add_argument('--comunas', action='store_true',
+                            help="Incluye también las celdas de todas las comunas del dataset.")
+        parser.add_argument('--desde', type=int, default=AÑO_INICIO_NORMAL)
+        parser.add_argument('--hasta', type=int, default=AÑO_FIN_NORMAL)
+
+    def handle(self, *args, **options):
+        regiones = [resolver_region(r) or r for r in (options['regiones'] or REGION_COORDS)]
+        desconocidas = [r for r in regiones if r not in REGION_COORDS]
+        if desconocidas:
+            raise CommandError(f"Regiones no válidas: {', '.join(desconocidas)}")
+
+        # Las normales se guardan por celda: ubicaciones que caen en la misma celda se calculan una vez
+        celdas = {}
+        for region_code in regiones:
+            lat, lon = REGION_COORDS[region_code]
+            celdas.setdefault(clave_celda(lat, lon), (region_code, lat, lon))
+        if options['comunas']:
+            for comuna in cargar_comunas().values():
+                if comuna.region in regiones:
+                    celdas.setdefault(clave_celda(comuna.lat, comuna.lon), (comuna.nombre, comuna.lat, comuna.lon))
+
+        for celda, (etiqueta, lat, lon) in celdas.items():
+            self.stdout.write(f"Descargando {etiqueta} [{celda}] ({options['desde']}-{options['hasta']})...")
+
+            # Prioridad de fondo: cede la cuota de Open-Meteo a las consultas de los usuarios
+            with prioridad_fondo():
+                api_data = consultar_diario_por_tramos(
+                    ARCHIVE_URL, lat, lon, f"{options['desde']}-01-01", f"{options['hasta']}-12-31", timeout=120,
+                )
+            daily = api_data.get('daily')
+            if not daily:
+                self.stderr.write(f"  Sin datos diarios para {etiqueta}, se omite.")
+                continue
+
+            registros = construir_registros_normales(celda, calcular_normales(daily))
+
+            # Reemplazo atómico: la tabla nunca queda a medio escribir para la celda
+            with transaction.atomic():
+                NormalClimatologica.objects.filter(celda=celda).delete()
+                NormalClimatologica.objects.bulk_create(registros, batch_size=1000)
+
+            self.stdout.write(self.style.SUCCESS(f"  {celda}: {len(registros)} normales guardadas."))
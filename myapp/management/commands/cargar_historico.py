@@ -0,0 +1,68 @@
+# ==============================================================================
+# COMANDO: python manage.py cargar_historico
+# ==============================================================================
+# Llena el almacén local (RegistroDiario) con la serie diaria de las regiones
+# (y opcionalmente de todas las comunas) para un rango de años. Cada celda se
+# descarga una sola vez, por tramos en paralelo (ver cliente_api.py). Los días que
+# ya están en el almacén no se vuelven a pedir (índice de cobertura, cobertura.py).
+
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.regiones import REGION_COORDS, resolver_region, clave_celda, cargar_comunas
+from myapp.cliente_api import (
+    ARCHIVE_URL, RETRASO_ARCHIVO_DIAS, VARIABLES_DIARIAS, consultar_diario_por_tramos, lista_variables,
+)
+from myapp.cobertura import rangos_faltantes
+from myapp.cuota_api import prioridad_fondo
+
+
+class Command(BaseCommand):
+    help = "Descarga y guarda la serie diaria histórica en el almacén local."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', action='append', dest='regiones',
+                            help="Código de región (se puede repetir). Por defecto: todas.")
+        parser.add_argument('--comunas', action='store_true',
+                            help="Incluye también las celdas de todas las comunas de esas regiones.")
+        parser.add_argument('--desde', type=int, default=1980, help="Año inicial (por defecto 1980).")
+        parser.add_argument('--hasta', type=int, default=None, help="Año final (por defecto el actual).")
+
+    def handle(self, *args, **options):
+        regiones = [resolver_region(r) or r for r in (options['regiones'] or REGION_COORDS)]
+        desconocidas = [r for r in regiones if r not in REGION_COORDS]
+        if desconocidas:
+            raise CommandError(f"Regiones no válidas: {', '.join(desconocidas)}")
+
+        # Sólo días cerrados del archivo
+        ultimo_cerrado = date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS)
+        hasta = min(date(options['hasta'], 12, 31), ultimo_cerrado) if options['hasta'] else ultimo_cerrado
+        desde = date(options['desde'], 1, 1)
+
+        celdas = {}
+        for region_code in regiones:
+            lat, lon = REGION_COORDS[region_code]
+            celdas.setdefault(clave_celda(lat, lon), (region_code, lat, lon))
+        if options['comunas']:
+            for comuna in cargar_comunas().values():
+                if comuna.region in regiones:
+                    celdas.setdefault(clave_celda(comuna.lat, comuna.lon), (comuna.nombre, comuna.lat, comuna.lon))
+
+        for celda, (etiqueta, lat, lon) in celdas.items():
+            faltantes = rangos_faltantes(celda, lista_variables(VARIABLES_DIARIAS), desde, hasta)
+            if not faltantes:
+                self.stdout.write(f"{etiqueta} [{celda}]: ya está completo ({desde} - {hasta}).")
+                continue
+
+            self.stdout.write(f"Cargando {etiqueta} [{celda}] ({len(faltantes)} rangos faltantes entre {desde} y {hasta})...")
+            dias = 0
+            try:
+                # Prioridad de fondo: cede la cuota de Open-Meteo a las consultas de los usuarios
+                with prioridad_fondo():
+                    for inicio, fin in faltantes:
+                        api_data = consultar_diario_por_tramos(ARCHIVE_URL, lat, lon, inicio, fin, timeout=120)
+                        dias += len((api_data.get('daily') or {}).get('time', []))
+            except Exception as e:
+                self.stderr.write(f"  Error en {etiqueta}: {e}")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"  {celda}: {dias} días guardados."))
@@ -0,0 +1,39 @@
+# ==============================================================================
+# COMANDO: python manage.py crear_particiones
+# ==============================================================================
+# Crea las particiones anuales de RegistroDiario que falten (PostgreSQL). Conviene
+# correrlo una vez al año: mientras un año no tiene partición, sus días quedan en
+# la partición DEFAULT, que no se poda en las consultas por rango. En SQLite no
+# hace nada.
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from myapp.particiones import AÑOS_ADELANTE, año_limite, crear_particiones, soporta_particiones
+
+
+class Command(BaseCommand):
+    help = "Crea las particiones anuales que falten en el almacén diario (sólo PostgreSQL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasta', type=int, default=None,
+                            help=f"Último año con partición (por defecto el actual + {AÑOS_ADELANTE}).")
+
+    def handle(self, *args, **options):
+        if not soporta_particiones(connection):
+            self.stdout.write(f"La base de datos ({connection.vendor}) no usa particiones, no hay nada que hacer.")
+            return
+        hasta = options['hasta'] or año_limite()
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            try:
+                creados = crear_particiones(cursor, hasta)
+            except Exception as e:
+                raise CommandError(f"No se pudieron crear las particiones: {e}")
+
+        if creados:
+            self.stdout.write(self.style.SUCCESS(
+                f"Particiones creadas: {', '.join(str(año) for año in creados)}."
+            ))
+        else:
+            self.stdout.write(f"Ya existen las particiones hasta {hasta}.")
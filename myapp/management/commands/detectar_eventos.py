@@ -0,0 +1,92 @@
+# ==============================================================================
+# COMANDO: python manage.py detectar_eventos
+# ==============================================================================
+# Construye OFFLINE el índice de eventos extremos (EventoExtremo) de todas las
+# regiones en una sola pasada: lee la serie diaria de cada celda (del almacén; sólo
+# se descargan los rangos que falten), aplica las reglas de eventos.py y reemplaza
+# los eventos de la celda. fetch_eventos_ajax consulta después sólo esta tabla.
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from myapp.regiones import REGION_COORDS, resolver_region, clave_celda, cargar_comunas
+from myapp.cliente_api import ARCHIVE_URL, RETRASO_ARCHIVO_DIAS, consultar_diario_por_tramos
+from myapp.cuota_api import prioridad_fondo
+from myapp.eventos import REGLAS_EVENTOS, detectar_eventos, variables_eventos
+from myapp.logica_evolucion import AÑO_INICIO_EVOLUCION, AÑOS_POR_TRAMO
+from myapp.models import EventoExtremo
+
+
+class Command(BaseCommand):
+    help = "Detecta olas de calor, heladas, rachas secas y lluvias intensas y guarda el índice de eventos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', action='append', dest='regiones',
+                            help="Código de región (se puede repetir). Por defecto: todas.")
+        parser.add_argument('--comunas', action='store_true',
+                            help="Incluye también las celdas de todas las comunas del dataset.")
+        parser.add_argument('--tipo', action='append', dest='tipos', choices=list(REGLAS_EVENTOS),
+                            help="Tipo de evento (se puede repetir). Por defecto: todos.")
+        parser.add_argument('--desde', type=int, default=AÑO_INICIO_EVOLUCION,
+                            help=f"Año inicial de la serie (por defecto {AÑO_INICIO_EVOLUCION}).")
+
+    def handle(self, *args, **options):
+        regiones = [resolver_region(r) or r for r in (options['regiones'] or REGION_COORDS)]
+        desconocidas = [r for r in regiones if r not in REGION_COORDS]
+        if desconocidas:
+            raise CommandError(f"Regiones no válidas: {', '.join(desconocidas)}")
+        tipos = options['tipos'] or list(REGLAS_EVENTOS)
+
+        # Los eventos se guardan por celda: ubicaciones que caen en la misma celda se procesan una vez
+        celdas = {}
+        for region_code in regiones:
+            lat, lon = REGION_COORDS[region_code]
+            celdas.setdefault(clave_celda(lat, lon), (region_code, lat, lon))
+        if options['comunas']:
+            for comuna in cargar_comunas().values():
+                if comuna.region in regiones:
+                    celdas.setdefault(clave_celda(comuna.lat, comuna.lon), (comuna.nombre, comuna.lat, comuna.lon))
+
+        # Sólo días cerrados del archivo
+        desde = date(options['desde'], 1, 1)
+        hasta = date.today() - timedelta(days=RETRASO_ARCHIVO_DIAS)
+        total = 0
+        segundos_deteccion = 0.0
+
+        for celda, (etiqueta, lat, lon) in celdas.items():
+            self.stdout.write(f"Procesando {etiqueta} [{celda}] ({desde} - {hasta})...")
+
+            # Prioridad de fondo: cede la cuota de Open-Meteo a las consultas de los usuarios
+            with prioridad_fondo():
+                try:
+                    api_data = consultar_diario_por_tramos(
+                        ARCHIVE_URL, lat, lon, desde.isoformat(), hasta.isoformat(),
+                        daily=variables_eventos(tipos), años_por_tramo=AÑOS_POR_TRAMO, timeout=120,
+                    )
+                except Exception as e:
+                    self.stderr.write(f"  Error al leer la serie de {etiqueta}: {e}. Se mantienen sus eventos anteriores.")
+                    continue
+            daily = api_data.get('daily')
+            if not daily or not daily.get('time'):
+                self.stderr.write(f"  Sin datos diarios para {etiqueta}, se omite.")
+                continue
+
+            inicio = time.perf_counter()
+            eventos = detectar_eventos(daily, tipos)
+            segundos_deteccion += time.perf_counter() - inicio
+
+            # Reemplazo atómico: la consulta nunca ve la celda a medio escribir
+            with transaction.atomic():
+                EventoExtremo.objects.filter(celda=celda, tipo__in=tipos).delete()
+                EventoExtremo.objects.bulk_create([EventoExtremo(celda=celda, **e) for e in eventos], batch_size=1000)
+
+            por_tipo = {tipo: sum(1 for e in eventos if e['tipo'] == tipo) for tipo in tipos}
+            self.stdout.write(self.style.SUCCESS(f"  {celda}: {len(eventos)} eventos {por_tipo}."))
+            total += len(eventos)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} eventos en {len(celdas)} celdas (detección: {segundos_deteccion * 1000:.0f} ms)."
+        ))
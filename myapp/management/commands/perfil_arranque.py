@@ -0,0 +1,136 @@
+# ==============================================================================
+# COMANDO: python manage.py perfil_arranque
+# ==============================================================================
+# Mide el arranque en frío de un proceso web: cuánto tarda desde que se lanza el
+# intérprete hasta que la aplicación WSGI está lista, y cuánto tardan la primera
+# y la segunda respuesta de cada ruta. Cada medición corre en un proceso NUEVO
+# (en el mismo proceso todo ya estaría importado), con y sin precalentar()
+# (myapp/arranque.py). Con --importaciones lista además los módulos que más
+# tardan en importarse (python -X importtime).
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+RUTAS_POR_DEFECTO = ['/clima/', '/clima/comparacion/']
+
+# Código que ejecuta cada proceso medido. Las marcas son time.time() (época) para
+# poder restarlas del instante en que el proceso padre lanzó al hijo.
+PROCESO_MEDIDO = r'''
+import json, os, sys, time
+marcas = {}
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', sys.argv[1])
+precalentar, rutas = sys.argv[2] == '1', sys.argv[3:]
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+marcas['django'] = time.time()
+
+if precalentar:
+    from myapp.arranque import precalentar as precalentar_proceso
+    precalentar_proceso()
+marcas['listo'] = time.time()
+
+from wsgiref.util import setup_testing_defaults
+def pedir(ruta):
+    entorno = {'PATH_INFO': ruta, 'HTTP_HOST': 'localhost', 'SERVER_NAME': 'localhost'}
+    setup_testing_defaults(entorno)
+    estado = []
+    inicio = time.time()
+    cuerpo = application(entorno, lambda s, h, e=None: estado.append(s))
+    b''.join(cuerpo)
+    getattr(cuerpo, 'close', lambda: None)()
+    return inicio, time.time(), estado[0]
+
+respuestas = {}
+for ruta in rutas:
+    primera = pedir(ruta)
+    segunda = pedir(ruta)
+    respuestas[ruta] = {'primera': primera, 'segunda': segunda}
+print('@@PERFIL@@' + json.dumps({'marcas': marcas, 'respuestas': respuestas}))
+'''
+
+
+class Command(BaseCommand):
+    help = "Mide el arranque en frío de un proceso web (importación, precalentamiento y primeras respuestas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', action='append', dest='rutas',
+                            help=f"Ruta a pedir (se puede repetir). Por defecto: {', '.join(RUTAS_POR_DEFECTO)}")
+        parser.add_argument('--repeticiones', type=int, default=3,
+                            help="Procesos medidos por modo; se informa la mediana (por defecto 3).")
+        parser.add_argument('--importaciones', type=int, default=0, metavar='N',
+                            help="Lista los N módulos de primer nivel que más tardan en importarse.")
+
+    def medir(self, precalentar, rutas):
+        """
+        Lanza un proceso nuevo y devuelve sus tiempos en ms desde el lanzamiento.
+        """
+        comando = [sys.executable, '-c', PROCESO_MEDIDO, settings.SETTINGS_MODULE, '1' if precalentar else '0', *rutas]
+        lanzado = time.time()
+        resultado = subprocess.run(comando, capture_output=True, text=True, cwd=settings.BASE_DIR)
+        salida = [l for l in resultado.stdout.splitlines() if l.startswith('@@PERFIL@@')]
+        if resultado.returncode != 0 or not salida:
+            raise CommandError(f"El proceso medido falló:\n{resultado.stderr[-2000:]}")
+
+        datos = json.loads(salida[0][len('@@PERFIL@@'):])
+
+        def ms(t):
+            return (t - lanzado) * 1000
+
+        tiempos = {'django listo': ms(datos['marcas']['django']), 'proceso listo': ms(datos['marcas']['listo'])}
+        for ruta, r in datos['respuestas'].items():
+            inicio, fin, estado = r['primera']
+            if not estado.startswith(('2', '3')):
+                raise CommandError(f"{ruta} respondió {estado}")
+            tiempos[f'1ª {ruta}'] = (fin - inicio) * 1000
+            tiempos[f'1ª {ruta} (desde el lanzamiento)'] = ms(fin)
+            inicio, fin, _estado = r['segunda']
+            tiempos[f'2ª {ruta}'] = (fin - inicio) * 1000
+        return tiempos
+
+    def importaciones(self, n):
+        """
+        Los n módulos importados directamente al arrancar que más tardan (acumulado).
+        """
+        codigo = ("import os; os.environ.setdefault('DJANGO_SETTINGS_MODULE', %r); "
+                  "from django.core.wsgi import get_wsgi_application; get_wsgi_application(); "
+                  "import django.urls; django.urls.get_resolver().reverse_dict" % settings.SETTINGS_MODULE)
+        resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo],
+                                   capture_output=True, text=True, cwd=settings.BASE_DIR)
+        modulos = []
+        for linea in resultado.stderr.splitlines():
+            partes = linea.split('|')
+            if len(partes) != 3 or not partes[1].strip().isdigit():
+                continue
+            nombre = partes[2][1:]
+            # Sólo las importaciones de primer nivel (dos espacios de sangría)
+            if nombre.startswith('  ') and not nombre.startswith('   '):
+                modulos.append((int(partes[1]) / 1000, nombre.strip()))
+        return sorted(modulos, reverse=True)[:n]
+
+    def handle(self, *args, **options):
+        rutas = options['rutas'] or RUTAS_POR_DEFECTO
+        repeticiones = max(1, options['repeticiones'])
+
+        modos = {'sin precalentar': False, 'con precalentar': True}
+        medianas = {}
+        for modo, precalentar in modos.items():
+            self.stdout.write(f"Midiendo {repeticiones} proceso(s) {modo}...")
+            medidas = [self.medir(precalentar, rutas) for _ in range(repeticiones)]
+            medianas[modo] = {clave: statistics.median(m[clave] for m in medidas) for clave in medidas[0]}
+
+        ancho = max(len(clave) for clave in medianas['sin precalentar'])
+        self.stdout.write(f"\n{'(ms, mediana)':<{ancho}}  " + "  ".join(f"{m:>16}" for m in modos))
+        for clave in medianas['sin precalentar']:
+            self.stdout.write(f"{clave:<{ancho}}  " + "  ".join(f"{medianas[m][clave]:>16.1f}" for m in modos))
+
+        if options['importaciones']:
+            self.stdout.write(f"\nImportaciones de primer nivel más lentas (ms acumulados):")
+            for ms, modulo in self.importaciones(options['importaciones']):
+                self.stdout.write(f"  {ms:8.1f}  {modulo}")
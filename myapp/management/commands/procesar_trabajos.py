@@ -0,0 +1,69 @@
+# ==============================================================================
+# COMANDO: python manage.py procesar_trabajos
+# ==============================================================================
+# Proceso worker de la cola local de trabajos (TrabajoFondo). Las vistas sólo
+# encolan las descargas largas y responden de inmediato; este proceso las ejecuta
+# una a una. Se pueden lanzar varios en paralelo: cada trabajo se reserva con un
+# UPDATE condicionado, así que nunca lo toman dos procesos.
+#
+# Debe correr bajo un supervisor que lo reinicie si se cae (systemd, supervisord o
+# un contenedor con restart=always), y sólo entonces conviene activar
+# settings.TRABAJOS_FONDO['WORKER_ACTIVO'] para que las páginas usen el modo trabajo.
+# Sin worker, fetch_evolucion_ajax sigue respondiendo en modo directo.
+# De paso borra cada hora los trabajos terminados hace más de DIAS_RETENCION días.
+
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from myapp.cuota_api import prioridad_fondo
+from myapp.logica_trabajos import ejecutar_trabajo, limpiar_trabajos, reencolar_colgados, tomar_trabajo
+
+# Cada cuánto se borran los trabajos terminados antiguos
+SEGUNDOS_ENTRE_LIMPIEZAS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Procesa los trabajos en segundo plano encolados por las vistas (descargas largas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help="Procesa los trabajos pendientes y termina (útil en cron).")
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help="Segundos de espera cuando la cola está vacía (por defecto 1).")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker de trabajos iniciado. Ctrl+C para detener.")
+        ultima_limpieza = None
+        try:
+            while True:
+                close_old_connections()
+                if ultima_limpieza is None or time.monotonic() - ultima_limpieza > SEGUNDOS_ENTRE_LIMPIEZAS:
+                    borrados = limpiar_trabajos()
+                    if borrados:
+                        self.stdout.write(f"  {borrados} trabajo(s) terminados antiguos borrados.")
+                    ultima_limpieza = time.monotonic()
+                reencolados = reencolar_colgados()
+                if reencolados:
+                    self.stderr.write(f"  {reencolados} trabajo(s) abandonados vuelven a la cola.")
+
+                trabajo = tomar_trabajo()
+                if trabajo is None:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                self.stdout.write(f"Procesando trabajo {trabajo.pk} ({trabajo.clave})...")
+                inicio = time.monotonic()
+                # Prioridad de fondo: cede la cuota de Open-Meteo a las consultas de los usuarios
+                with prioridad_fondo():
+                    completado = ejecutar_trabajo(trabajo)
+                if completado:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"  Trabajo {trabajo.pk} completado en {time.monotonic() - inicio:.1f} s."
+                    ))
+                else:
+                    self.stderr.write(f"  Trabajo {trabajo.pk} terminó con error.")
+        except KeyboardInterrupt:
+            self.stdout.write("Worker detenido.")
@@ -0,0 +1,99 @@
+# ==============================================================================
+# COMANDO: python manage.py publicar_snapshots
+# ==============================================================================
+# Escribe como archivos JSON estáticos (bajo STATIC_ROOT/snapshots) las respuestas
+# deterministas de los endpoints AJAX: evolución, mapa de calor, métricas de años y
+# meses cerrados y la ventana de pronóstico del día. Pensado para correr cada noche
+# (cron); el servidor web entrega esos archivos sin pasar por Django.
+# Ver myapp/snapshots.py para la estructura de directorios.
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.regiones import REGION_COORDS, resolver_region, clave_celda, cargar_comunas
+from myapp.cliente_api import ARCHIVE_URL, RETRASO_ARCHIVO_DIAS, consultar_diario_por_tramos
+from myapp.cuota_api import prioridad_fondo
+from myapp.logica_evolucion import AÑO_INICIO_EVOLUCION, AÑOS_POR_TRAMO
+from myapp.snapshots import (
+    ruta_snapshots, publicar_historico, publicar_pronostico, publicar_manifiesto, limpiar_versiones,
+)
+
+
+class Command(BaseCommand):
+    help = "Publica como JSON estático (STATIC_ROOT/snapshots) las respuestas AJAX precalculables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--region', action='append', dest='regiones',
+                            help="Código de región (se puede repetir). Por defecto: todas.")
+        parser.add_argument('--comunas', action='store_true',
+                            help="Incluye también las celdas de todas las comunas del dataset.")
+        parser.add_argument('--desde', type=int, default=AÑO_INICIO_EVOLUCION)
+        parser.add_argument('--sin-pronostico', action='store_true',
+                            help="No publica la ventana de pronóstico (sólo periodos cerrados).")
+        parser.add_argument('--conservar', type=int, default=2,
+                            help="Versiones anteriores que se mantienen en disco (por defecto: 2).")
+
+    def handle(self, *args, **options):
+        raiz = ruta_snapshots()
+        if raiz is None:
+            raise CommandError("Configure STATIC_ROOT para publicar los snapshots.")
+
+        regiones = [resolver_region(r) or r for r in (options['regiones'] or REGION_COORDS)]
+        desconocidas = [r for r in regiones if r not in REGION_COORDS]
+        if desconocidas:
+            raise CommandError(f"Regiones no válidas: {', '.join(desconocidas)}")
+
+        # Los archivos son por celda: ubicaciones que caen en la misma celda se publican una vez
+        celdas = {}
+        for region_code in regiones:
+            lat, lon = REGION_COORDS[region_code]
+            celdas.setdefault(clave_celda(lat, lon), (region_code, lat, lon))
+        if options['comunas']:
+            for comuna in cargar_comunas().values():
+                if comuna.region in regiones:
+                    celdas.setdefault(clave_celda(comuna.lat, comuna.lon), (comuna.nombre, comuna.lat, comuna.lon))
+
+        hoy = date.today()
+        ultimo_dia = hoy - timedelta(days=RETRASO_ARCHIVO_DIAS)
+        version = timezone.now().strftime('%Y%m%dT%H%M%S')
+        publicadas = {}
+
+        for celda, (etiqueta, lat, lon) in celdas.items():
+            self.stdout.write(f"Publicando {etiqueta} [{celda}] ({options['desde']}-{hoy.year})...")
+            directorio = raiz / version / celda
+
+            # Prioridad de fondo: cede la cuota de Open-Meteo a las consultas de los usuarios
+            with prioridad_fondo():
+                try:
+                    api_data = consultar_diario_por_tramos(
+                        ARCHIVE_URL, lat, lon, f"{options['desde']}-01-01", hoy.isoformat(),
+                        años_por_tramo=AÑOS_POR_TRAMO, timeout=120,
+                    )
+                except Exception as e:
+                    self.stderr.write(f"  Error al descargar {etiqueta}: {e}. Se mantiene su versión anterior.")
+                    continue
+                daily = api_data.get('daily')
+                if not daily or not daily.get('time'):
+                    self.stderr.write(f"  Sin datos diarios para {etiqueta}, se omite.")
+                    continue
+
+                escritos = publicar_historico(directorio, celda, daily, ultimo_dia)
+                if not options['sin_pronostico']:
+                    escritos += publicar_pronostico(directorio, lat, lon, hoy)
+
+            publicadas[celda] = {'version': version, 'fecha': hoy.isoformat()}
+            self.stdout.write(self.style.SUCCESS(f"  {celda}: {escritos} archivos."))
+
+        if not publicadas:
+            raise CommandError("No se publicó ninguna celda.")
+
+        # Recién ahora las plantillas empiezan a usar la versión nueva
+        manifiesto = publicar_manifiesto(raiz, publicadas, timezone.now().isoformat())
+        borradas = limpiar_versiones(raiz, manifiesto, options['conservar'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Versión {version}: {len(publicadas)} celdas publicadas"
+            + (f", {len(borradas)} versiones antiguas borradas." if borradas else ".")
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroclima',
+            name='region',
+            field=models.CharField(choices=[('ARICA', 'XV - Arica y Parinacota'), ('TARAPACA', 'I - Tarapacá'), ('ANTOFAGASTA', 'II - Antofagasta'), ('ATACAMA', 'III - Atacama'), ('COQUIMBO', 'IV - Coquimbo'), ('VALPARAISO', 'V - Valparaíso'), ('METROPOLITANA', 'RM - Metropolitana de Santiago'), ('OHIGGINS', "VI - O'Higgins"), ('MAULE', 'VII - Maule'), ('NUBLE', 'XVI - Ñuble'), ('BIOBIO', 'VIII - Biobío'), ('ARAUCANIA', 'IX - La Araucanía'), ('RIOS', 'XIV - Los Ríos'), ('LAGOS', 'X - Los Lagos'), ('AYSEN', 'XI - Aysén del G. Carlos Ibáñez del Campo'), ('MAGALLANES', 'XII - Magallanes y la Antártica Chilena')], max_length=50, verbose_name='Región'),
+        ),
+        migrations.CreateModel(
+            name='NormalClimatologica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('region', models.CharField(choices=[('ARICA', 'XV - Arica y Parinacota'), ('TARAPACA', 'I - Tarapacá'), ('ANTOFAGASTA', 'II - Antofagasta'), ('ATACAMA', 'III - Atacama'), ('COQUIMBO', 'IV - Coquimbo'), ('VALPARAISO', 'V - Valparaíso'), ('METROPOLITANA', 'RM - Metropolitana de Santiago'), ('OHIGGINS', "VI - O'Higgins"), ('MAULE', 'VII - Maule'), ('NUBLE', 'XVI - Ñuble'), ('BIOBIO', 'VIII - Biobío'), ('ARAUCANIA', 'IX - La Araucanía'), ('RIOS', 'XIV - Los Ríos'), ('LAGOS', 'X - Los Lagos'), ('AYSEN', 'XI - Aysén del G. Carlos Ibáñez del Campo'), ('MAGALLANES', 'XII - Magallanes y la Antártica Chilena')], max_length=50, verbose_name='Región')),
+                ('escala', models.CharField(choices=[('anual', 'Anual'), ('mensual', 'Mensual'), ('diaria', 'Diaria')], max_length=10, verbose_name='Escala')),
+                ('periodo', models.PositiveSmallIntegerField(verbose_name='Periodo')),
+                ('metrica', models.CharField(max_length=30, verbose_name='Métrica')),
+                ('media', models.FloatField()),
+                ('p10', models.FloatField()),
+                ('p50', models.FloatField()),
+                ('p90', models.FloatField()),
+                ('valores', models.JSONField(default=list)),
+            ],
+            options={
+                'verbose_name': 'Normal Climatológica',
+                'verbose_name_plural': 'Normales Climatológicas',
+                'unique_together': {('region', 'escala', 'periodo', 'metrica')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+def borrar_normales_por_region(apps, schema_editor):
+    # Las filas antiguas tienen el código de región en 'celda': hay que recalcularlas
+    # con 'python manage.py calcular_normales'.
+    apps.get_model('myapp', 'NormalClimatologica').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0002_normalclimatologica'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='normalclimatologica',
+            unique_together=set(),
+        ),
+        migrations.RenameField(
+            model_name='normalclimatologica',
+            old_name='region',
+            new_name='celda',
+        ),
+        migrations.AlterField(
+            model_name='normalclimatologica',
+            name='celda',
+            field=models.CharField(max_length=20, verbose_name='Celda de grilla'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='normalclimatologica',
+            unique_together={('celda', 'escala', 'periodo', 'metrica')},
+        ),
+        migrations.RunPython(borrar_normales_por_region, migrations.RunPython.noop),
+    ]
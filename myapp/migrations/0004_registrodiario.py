@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_normal_por_celda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('celda', models.CharField(max_length=20, verbose_name='Celda de grilla')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('temp_max', models.FloatField(blank=True, null=True, verbose_name='T° Máxima (°C)')),
+                ('temp_min', models.FloatField(blank=True, null=True, verbose_name='T° Mínima (°C)')),
+                ('precipitacion', models.FloatField(blank=True, null=True, verbose_name='Precipitación (mm)')),
+                ('viento_max', models.FloatField(blank=True, null=True, verbose_name='Viento Máximo (km/h)')),
+                ('radiacion', models.FloatField(blank=True, null=True, verbose_name='Radiación (MJ/m²)')),
+                ('humedad_max', models.FloatField(blank=True, null=True, verbose_name='Humedad Máxima (%)')),
+            ],
+            options={
+                'verbose_name': 'Registro Diario',
+                'verbose_name_plural': 'Registros Diarios',
+                'ordering': ['celda', 'fecha'],
+                'unique_together': {('celda', 'fecha')},
+            },
+        ),
+    ]
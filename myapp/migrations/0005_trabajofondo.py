@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_registrodiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoFondo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=30, verbose_name='Tipo')),
+                ('clave', models.CharField(max_length=200, unique=True, verbose_name='Clave')),
+                ('parametros', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=10, verbose_name='Estado')),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('parciales', models.JSONField(default=list)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('mensaje', models.TextField(blank=True, default='')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('terminado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo en Segundo Plano',
+                'verbose_name_plural': 'Trabajos en Segundo Plano',
+                'ordering': ['creado'],
+                'indexes': [models.Index(fields=['estado', 'creado'], name='myapp_traba_estado_54aa1d_idx')],
+            },
+        ),
+    ]
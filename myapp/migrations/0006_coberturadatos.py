@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:59
+
+from django.db import migrations, models
+
+from myapp.cobertura import mascara_de_fechas
+from myapp.models import VARIABLES_REGISTRO_DIARIO
+
+
+def construir_cobertura(apps, schema_editor):
+    # Índice inicial a partir de lo que ya está en el almacén (sólo valores no nulos)
+    RegistroDiario = apps.get_model('myapp', 'RegistroDiario')
+    CoberturaDatos = apps.get_model('myapp', 'CoberturaDatos')
+
+    celdas = RegistroDiario.objects.order_by().values_list('celda', flat=True).distinct()
+    for celda in celdas:
+        filas = RegistroDiario.objects.filter(celda=celda)
+        for variable, campo in VARIABLES_REGISTRO_DIARIO.items():
+            fechas = filas.filter(**{f'{campo}__isnull': False}).values_list('fecha', flat=True)
+            bits = mascara_de_fechas(fechas.iterator(chunk_size=5000))
+            if bits:
+                CoberturaDatos.objects.create(
+                    celda=celda, variable=variable, bits=bits.to_bytes((bits.bit_length() + 7) // 8, 'little'),
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_trabajofondo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoberturaDatos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('celda', models.CharField(max_length=20, verbose_name='Celda de grilla')),
+                ('variable', models.CharField(max_length=40, verbose_name='Variable')),
+                ('bits', models.BinaryField(default=bytes)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cobertura de Datos',
+                'verbose_name_plural': 'Cobertura de Datos',
+                'unique_together': {('celda', 'variable')},
+            },
+        ),
+        migrations.RunPython(construir_cobertura, migrations.RunPython.noop),
+    ]
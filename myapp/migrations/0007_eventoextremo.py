@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_coberturadatos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoExtremo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('celda', models.CharField(max_length=20, verbose_name='Celda de grilla')),
+                ('tipo', models.CharField(choices=[('ola_calor', 'Ola de calor'), ('helada', 'Helada'), ('racha_seca', 'Racha seca'), ('lluvia_intensa', 'Lluvia intensa')], max_length=20, verbose_name='Tipo')),
+                ('inicio', models.DateField(verbose_name='Inicio')),
+                ('fin', models.DateField(verbose_name='Fin')),
+                ('dias', models.PositiveIntegerField(verbose_name='Días')),
+                ('valor', models.FloatField(blank=True, null=True, verbose_name='Valor')),
+                ('umbral', models.FloatField(verbose_name='Umbral')),
+            ],
+            options={
+                'verbose_name': 'Evento Extremo',
+                'verbose_name_plural': 'Eventos Extremos',
+                'ordering': ['celda', 'inicio'],
+                'indexes': [models.Index(fields=['celda', 'tipo', 'inicio'], name='myapp_event_celda_35841f_idx')],
+            },
+        ),
+    ]
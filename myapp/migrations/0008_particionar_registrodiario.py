@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:02
+
+from datetime import date
+
+from django.db import migrations
+
+# Copia fija de lo necesario de myapp/particiones.py: la migración no depende del
+# código actual de la app (que puede cambiar después)
+TABLA = 'myapp_registrodiario'
+PARTICION_DEFECTO = f'{TABLA}_default'
+AÑO_PRIMERA_PARTICION = 1940
+AÑOS_ADELANTE = 5
+PAGINAS_POR_RANGO_BRIN = 32
+
+
+def particionar(apps, schema_editor):
+    # Sólo PostgreSQL: en SQLite la tabla queda como está (ver myapp/particiones.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    nueva = f'{TABLA}_particionada'
+    hasta_año = date.today().year + AÑOS_ADELANTE
+    with schema_editor.connection.cursor() as cursor:
+        # Sin INCLUDING IDENTITY: el id pasa a tomar su valor de una secuencia propia
+        cursor.execute(f"CREATE TABLE {nueva} (LIKE {TABLA} INCLUDING DEFAULTS) PARTITION BY RANGE (fecha)")
+        for año in range(AÑO_PRIMERA_PARTICION, hasta_año + 1):
+            cursor.execute(
+                f"CREATE TABLE {TABLA}_{año} PARTITION OF {nueva} "
+                f"FOR VALUES FROM ('{date(año, 1, 1)}') TO ('{date(año + 1, 1, 1)}')"
+            )
+        cursor.execute(f"CREATE TABLE {PARTICION_DEFECTO} PARTITION OF {nueva} DEFAULT")
+        cursor.execute(f"INSERT INTO {nueva} SELECT * FROM {TABLA}")
+
+        cursor.execute(f"DROP TABLE {TABLA}")
+        cursor.execute(f"ALTER TABLE {nueva} RENAME TO {TABLA}")
+
+        # Toda restricción única de una tabla particionada debe incluir la fecha
+        cursor.execute(f"ALTER TABLE {TABLA} ADD PRIMARY KEY (id, fecha)")
+        cursor.execute(f"ALTER TABLE {TABLA} ADD CONSTRAINT {TABLA}_celda_fecha_uniq UNIQUE (celda, fecha)")
+        cursor.execute(
+            f"CREATE INDEX {TABLA}_fecha_brin ON {TABLA} "
+            f"USING brin (fecha) WITH (pages_per_range = {PAGINAS_POR_RANGO_BRIN})"
+        )
+
+        secuencia = f'{TABLA}_id_seq'
+        cursor.execute(f"CREATE SEQUENCE {secuencia} OWNED BY {TABLA}.id")
+        cursor.execute(f"SELECT setval('{secuencia}', COALESCE(MAX(id), 0) + 1, false) FROM {TABLA}")
+        cursor.execute(f"ALTER TABLE {TABLA} ALTER COLUMN id SET DEFAULT nextval('{secuencia}')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_eventoextremo'),
+    ]
+
+    operations = [
+        # Al revertir, la tabla particionada se mantiene: para Django es la misma tabla
+        migrations.RunPython(particionar, migrations.RunPython.noop),
+    ]
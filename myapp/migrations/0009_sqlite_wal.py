@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:40
+
+from django.db import migrations
+
+
+def activar_wal(apps, schema_editor):
+    # Sólo SQLite: el modo WAL queda guardado en el archivo de la base, así que basta
+    # con activarlo una vez aquí (y no en cada conexión, ver settings.DATABASES)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+
+
+class Migration(migrations.Migration):
+
+    # El modo del journal no se puede cambiar dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('myapp', '0008_particionar_registrodiario'),
+    ]
+
+    operations = [
+        migrations.RunPython(activar_wal, migrations.RunPython.noop, elidable=True),
+    ]
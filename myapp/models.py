@@ -68,3 +68,198 @@ class RegistroClima(models.Model):
     # Método que define cómo se representa el objeto en texto (útil en el panel de administración de Django).
     def __str__(self):
         return f"Clima: {self.region} - {self.año}"
+
+
+# ==============================================================================
+# NORMALES CLIMATOLÓGICAS (TABLA DE CONSULTA PRECALCULADA)
+# ==============================================================================
+
+# Escalas temporales de las normales: 'periodo' vale 0 para la anual,
+# 1..12 para la mensual y 1..366 (día del año, calendario bisiesto) para la diaria.
+ESCALAS_NORMALES = [
+    ('anual', 'Anual'),
+    ('mensual', 'Mensual'),
+    ('diaria', 'Diaria'),
+]
+
+# Cada fila guarda la distribución de UNA métrica de calculate_metrics para una
+# celda de grilla y un periodo, calculada offline por el comando 'calcular_normales'.
+class NormalClimatologica(models.Model):
+
+    # Clave canónica de la celda de grilla (ver regiones.clave_celda), ej: '-33.40_-70.70'.
+    celda = models.CharField(
+        max_length=20,
+        verbose_name="Celda de grilla"
+    )
+
+    escala = models.CharField(
+        max_length=10,
+        choices=ESCALAS_NORMALES,
+        verbose_name="Escala"
+    )
+
+    # 0 = anual, 1..12 = mes, 1..366 = día del año.
+    periodo = models.PositiveSmallIntegerField(verbose_name="Periodo")
+
+    # Clave de la métrica tal como la devuelve calculate_metrics (ej: 'precip_sum').
+    metrica = models.CharField(max_length=30, verbose_name="Métrica")
+
+    media = models.FloatField()
+    p10 = models.FloatField()
+    p50 = models.FloatField()
+    p90 = models.FloatField()
+
+    # Muestra ordenada (un valor por año de referencia) para calcular el rango percentil.
+    valores = models.JSONField(default=list)
+
+    class Meta:
+        # Una sola fila por celda, periodo y métrica: la consulta es una búsqueda directa.
+        unique_together = ('celda', 'escala', 'periodo', 'metrica')
+        verbose_name = "Normal Climatológica"
+        verbose_name_plural = "Normales Climatológicas"
+
+    def __str__(self):
+        return f"Normal: {self.celda} - {self.escala} {self.periodo} - {self.metrica}"
+
+
+# ==============================================================================
+# ALMACÉN LOCAL DE DATOS DIARIOS (SERIE HISTÓRICA POR CELDA DE GRILLA)
+# ==============================================================================
+
+# Correspondencia entre las variables diarias de Open-Meteo y los campos del modelo.
+VARIABLES_REGISTRO_DIARIO = {
+    'temperature_2m_max': 'temp_max',
+    'temperature_2m_min': 'temp_min',
+    'precipitation_sum': 'precipitacion',
+    'wind_speed_10m_max': 'viento_max',
+    'shortwave_radiation_sum': 'radiacion',
+    'relative_humidity_2m_max': 'humedad_max',
+}
+
+# Un registro por celda y día. Se llena al descargar periodos cerrados del archivo
+# (ver almacen.py) y con el comando 'cargar_historico'.
+class RegistroDiario(models.Model):
+
+    # Clave canónica de la celda de grilla (ver regiones.clave_celda).
+    celda = models.CharField(max_length=20, verbose_name="Celda de grilla")
+    fecha = models.DateField(verbose_name="Fecha")
+
+    # Las variables pueden faltar si la descarga que creó el registro no las pidió.
+    temp_max = models.FloatField(null=True, blank=True, verbose_name="T° Máxima (°C)")
+    temp_min = models.FloatField(null=True, blank=True, verbose_name="T° Mínima (°C)")
+    precipitacion = models.FloatField(null=True, blank=True, verbose_name="Precipitación (mm)")
+    viento_max = models.FloatField(null=True, blank=True, verbose_name="Viento Máximo (km/h)")
+    radiacion = models.FloatField(null=True, blank=True, verbose_name="Radiación (MJ/m²)")
+    humedad_max = models.FloatField(null=True, blank=True, verbose_name="Humedad Máxima (%)")
+
+    class Meta:
+        # El índice único (celda, fecha) sirve también para las consultas por rango.
+        # En PostgreSQL la tabla además se particiona por año (ver particiones.py).
+        unique_together = ('celda', 'fecha')
+        ordering = ['celda', 'fecha']
+        verbose_name = "Registro Diario"
+        verbose_name_plural = "Registros Diarios"
+
+    def __str__(self):
+        return f"Diario: {self.celda} - {self.fecha}"
+
+
+# Índice de cobertura del almacén: un bit por día (desde 1940) que indica si el día
+# ya está guardado para esa celda y variable. Permite calcular qué rangos faltan
+# sin recorrer RegistroDiario (ver cobertura.py). Se actualiza en cada guardado.
+class CoberturaDatos(models.Model):
+
+    celda = models.CharField(max_length=20, verbose_name="Celda de grilla")
+    # Variable diaria de Open-Meteo (clave de VARIABLES_REGISTRO_DIARIO)
+    variable = models.CharField(max_length=40, verbose_name="Variable")
+    # Bit i (little-endian) = día FECHA_BASE_COBERTURA + i
+    bits = models.BinaryField(default=bytes)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('celda', 'variable')
+        verbose_name = "Cobertura de Datos"
+        verbose_name_plural = "Cobertura de Datos"
+
+    def __str__(self):
+        return f"Cobertura: {self.celda} - {self.variable}"
+
+
+# ==============================================================================
+# TRABAJOS EN SEGUNDO PLANO (COLA LOCAL EN LA BASE DE DATOS)
+# ==============================================================================
+
+ESTADOS_TRABAJO = [
+    ('pendiente', 'Pendiente'),
+    ('en_curso', 'En curso'),
+    ('completado', 'Completado'),
+    ('error', 'Error'),
+]
+
+# Descargas largas que las vistas encolan y procesa el comando 'procesar_trabajos'
+# (ver logica_trabajos.py). La clave identifica el trabajo: dos peticiones iguales
+# comparten la misma fila y, si ya terminó, reutilizan su resultado.
+class TrabajoFondo(models.Model):
+
+    tipo = models.CharField(max_length=30, verbose_name="Tipo")
+    clave = models.CharField(max_length=200, unique=True, verbose_name="Clave")
+    parametros = models.JSONField(default=dict)
+
+    estado = models.CharField(max_length=10, choices=ESTADOS_TRABAJO, default='pendiente', verbose_name="Estado")
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name="Progreso (%)")
+
+    # Resultados parciales (ej: una entrada por década) a medida que avanza el trabajo.
+    parciales = models.JSONField(default=list)
+    resultado = models.JSONField(null=True, blank=True)
+    mensaje = models.TextField(blank=True, default='')
+
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['creado']
+        indexes = [models.Index(fields=['estado', 'creado'])]
+        verbose_name = "Trabajo en Segundo Plano"
+        verbose_name_plural = "Trabajos en Segundo Plano"
+
+    def __str__(self):
+        return f"Trabajo {self.pk}: {self.clave} ({self.estado})"
+
+
+# ==============================================================================
+# EVENTOS EXTREMOS (ÍNDICE PRECALCULADO SOBRE LA SERIE DIARIA)
+# ==============================================================================
+
+TIPOS_EVENTO = [
+    ('ola_calor', 'Ola de calor'),
+    ('helada', 'Helada'),
+    ('racha_seca', 'Racha seca'),
+    ('lluvia_intensa', 'Lluvia intensa'),
+]
+
+# Un evento = un tramo de días consecutivos que cumplen la regla de su tipo (ver
+# eventos.py). Lo llena el comando 'detectar_eventos'; fetch_eventos_ajax sólo
+# consulta esta tabla, nunca vuelve a recorrer la serie diaria.
+class EventoExtremo(models.Model):
+
+    celda = models.CharField(max_length=20, verbose_name="Celda de grilla")
+    tipo = models.CharField(max_length=20, choices=TIPOS_EVENTO, verbose_name="Tipo")
+    inicio = models.DateField(verbose_name="Inicio")
+    fin = models.DateField(verbose_name="Fin")
+    dias = models.PositiveIntegerField(verbose_name="Días")
+
+    # Valor característico del evento (máximo, mínimo o total según el tipo) y el
+    # umbral de la regla en el mes en que empezó.
+    valor = models.FloatField(null=True, blank=True, verbose_name="Valor")
+    umbral = models.FloatField(verbose_name="Umbral")
+
+    class Meta:
+        ordering = ['celda', 'inicio']
+        # Consultas por celda, tipo y periodo (el evento se solapa con [desde, hasta])
+        indexes = [models.Index(fields=['celda', 'tipo', 'inicio'])]
+        verbose_name = "Evento Extremo"
+        verbose_name_plural = "Eventos Extremos"
+
+    def __str__(self):
+        return f"Evento: {self.celda} - {self.tipo} {self.inicio} ({self.dias} días)"
@@ -0,0 +1,99 @@
+# particiones.py
+
+# ==============================================================================
+# PARTICIONES ANUALES DEL ALMACÉN DIARIO (sólo PostgreSQL)
+# ==============================================================================
+# En el perfil de producción (PostgreSQL, ver settings.DATABASES) la tabla de
+# RegistroDiario se particiona por RANGE(fecha) con una partición por año
+# (myapp_registrodiario_<año>) más una DEFAULT para los años que aún no tienen la
+# suya. Las consultas por rango de fechas de una celda sólo leen las particiones
+# de esos años (y en cada una, el índice único (celda, fecha)); el índice BRIN por
+# fecha cubre los recorridos de todas las celdas (ej: exportación por periodo)
+# ocupando unas pocas páginas.
+#
+# La migración 0008 convierte la tabla (con su propia copia de estas constantes) y
+# crea las particiones hasta AÑOS_ADELANTE años después del actual; 'python
+# manage.py crear_particiones' agrega las siguientes. En SQLite (desarrollo) no se
+# particiona nada.
+
+from datetime import date
+
+from .cobertura import FECHA_BASE_COBERTURA
+
+TABLA = 'myapp_registrodiario'
+PARTICION_DEFECTO = f'{TABLA}_default'
+
+# Primera partición: el archivo de Open-Meteo empieza en 1940
+AÑO_PRIMERA_PARTICION = FECHA_BASE_COBERTURA.year
+# Años futuros que se dejan creados
+AÑOS_ADELANTE = 5
+
+
+def soporta_particiones(conexion):
+    return conexion.vendor == 'postgresql'
+
+
+def año_limite():
+    return date.today().year + AÑOS_ADELANTE
+
+
+def nombre_particion(año):
+    return f'{TABLA}_{año}'
+
+
+def sql_particion(año, padre=TABLA):
+    return (
+        f"CREATE TABLE {nombre_particion(año)} PARTITION OF {padre} "
+        f"FOR VALUES FROM ('{date(año, 1, 1)}') TO ('{date(año + 1, 1, 1)}')"
+    )
+
+
+def años_particionados(cursor):
+    """
+    Años que ya tienen partición propia (sin contar la DEFAULT).
+    """
+    cursor.execute(
+        """
+        SELECT hija.relname FROM pg_inherits
+        JOIN pg_class hija ON hija.oid = pg_inherits.inhrelid
+        JOIN pg_class padre ON padre.oid = pg_inherits.inhparent
+        WHERE padre.relname = %s
+        """,
+        [TABLA],
+    )
+    prefijo = f'{TABLA}_'
+    return {
+        int(nombre[len(prefijo):]) for (nombre,) in cursor.fetchall()
+        if nombre[len(prefijo):].isdigit()
+    }
+
+# ==============================================================================
+# PARTICIONES NUEVAS (comando crear_particiones)
+# ==============================================================================
+def crear_particiones(cursor, hasta_año):
+    """
+    Crea las particiones anuales que falten hasta 'hasta_año' y les traslada las filas
+    que ya estaban en la DEFAULT. Debe ir dentro de una transacción. Devuelve los
+    años creados.
+    """
+    existentes = años_particionados(cursor)
+    nuevos = [año for año in range(AÑO_PRIMERA_PARTICION, hasta_año + 1) if año not in existentes]
+    if not nuevos:
+        return []
+
+    # No se puede crear la partición de un año que ya tiene filas en la DEFAULT: se
+    # desprende la DEFAULT, se crean las particiones y se le sacan esas filas
+    cursor.execute(f"ALTER TABLE {TABLA} DETACH PARTITION {PARTICION_DEFECTO}")
+    for año in nuevos:
+        cursor.execute(sql_particion(año))
+        cursor.execute(
+            f"""
+            WITH movidas AS (
+                DELETE FROM {PARTICION_DEFECTO} WHERE fecha >= %s AND fecha < %s RETURNING *
+            )
+            INSERT INTO {TABLA} SELECT * FROM movidas
+            """,
+            [date(año, 1, 1), date(año + 1, 1, 1)],
+        )
+    cursor.execute(f"ALTER TABLE {TABLA} ATTACH PARTITION {PARTICION_DEFECTO} DEFAULT")
+    return nuevos
@@ -0,0 +1,283 @@
+# perfilado.py
+
+# ==============================================================================
+# PERFILADO A PEDIDO DE PETICIONES (cProfile)
+# ==============================================================================
+# Para ver en producción dónde se va el tiempo de un endpoint sin redesplegar:
+#   - Un usuario staff agrega la cabecera 'X-Perfilar: 1' (o '?perfilar=1') a la
+#     petición; la respuesta trae 'X-Perfil: <nombre>' con el archivo generado.
+#   - settings.PERFILADO['MUESTREO'] perfila además esa fracción de las peticiones.
+# Se perfila la vista completa: espera a Open-Meteo, response.json(), agregación y
+# serialización del JsonResponse; en las respuestas en streaming, también cada
+# trozo que se genera. Las descargas en paralelo (cliente_api.iterar_en_paralelo)
+# se perfilan en su hilo y se suman al perfil de la petición.
+#
+# Cada perfil se guarda como <nombre>.prof (pstats; ej: snakeviz, python -m pstats)
+# junto a <nombre>.json con los datos de la petición. Se listan y descargan en
+# /admin/perfiles/.
+
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+# Valores por defecto (se pueden cambiar con settings.PERFILADO)
+CONFIGURACION_PERFILADO = {
+    'DIRECTORIO': 'perfiles',
+    'MUESTREO': 0.0,                # Fracción de peticiones perfiladas al azar (0 = sólo a pedido)
+    'RUTAS': ['/clima/'],           # Prefijos de ruta que se pueden perfilar
+    'CONSERVAR': 200,               # Perfiles que se mantienen en disco (los más nuevos)
+}
+
+CABECERA_PERFILAR = 'HTTP_X_PERFILAR'
+PARAMETRO_PERFILAR = 'perfilar'
+
+# Funciones que se resumen en el .json (ordenadas por tiempo acumulado)
+FUNCIONES_RESUMEN = 25
+
+NOMBRE_PERFIL = re.compile(r'^[\w.-]+$')
+
+# Perfiles de los hilos del pool creados durante la petición perfilada (None = no se perfila)
+_perfiles_hilos = contextvars.ContextVar('perfiles_hilos', default=None)
+
+
+def configuracion():
+    return {**CONFIGURACION_PERFILADO, **getattr(settings, 'PERFILADO', {})}
+
+
+def directorio_perfiles():
+    return Path(configuracion()['DIRECTORIO'])
+
+
+def en_hilo_perfilado(funcion, *args):
+    """
+    Ejecuta una tarea del pool; si la petición que la lanzó se está perfilando, la
+    perfila en este hilo (cProfile sólo ve el hilo en el que se activa).
+    """
+    perfiles = _perfiles_hilos.get()
+    if perfiles is None:
+        return funcion(*args)
+    perfil = cProfile.Profile()
+    if not activar(perfil):
+        return funcion(*args)
+    perfiles.append(perfil)
+    try:
+        return funcion(*args)
+    finally:
+        perfil.disable()
+
+
+def activar(perfil):
+    """
+    Activa el perfilador; False si no se puede (desde Python 3.12 sólo puede haber
+    uno activo por intérprete). Perfilar nunca debe cambiar la respuesta: en ese
+    caso se sigue sin perfilar.
+    """
+    try:
+        perfil.enable()
+    except ValueError:
+        return False
+    return True
+
+# ==============================================================================
+# MIDDLEWARE
+# ==============================================================================
+class PerfiladoMiddleware:
+    """
+    Perfila las peticiones marcadas por un usuario staff o elegidas por muestreo.
+    Va después de AuthenticationMiddleware (necesita request.user).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def motivo(self, request):
+        """
+        'cabecera', 'parametro' o 'muestreo' si la petición se perfila, si no None.
+        """
+        conf = configuracion()
+        if not request.path.startswith(tuple(conf['RUTAS'])):
+            return None
+        pedido = ('cabecera' if request.META.get(CABECERA_PERFILAR) else
+                  'parametro' if request.GET.get(PARAMETRO_PERFILAR) else None)
+        if pedido:
+            usuario = getattr(request, 'user', None)
+            return pedido if usuario is not None and usuario.is_staff else None
+        if conf['MUESTREO'] and random.random() < conf['MUESTREO']:
+            return 'muestreo'
+        return None
+
+    def __call__(self, request):
+        motivo = self.motivo(request)
+        if motivo is None:
+            return self.get_response(request)
+
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        if not activar(perfil):
+            # Otra petición se está perfilando en este proceso: se atiende sin perfilar
+            return self.get_response(request)
+        hilos = []
+        token = _perfiles_hilos.set(hilos)
+        try:
+            response = self.get_response(request)
+        finally:
+            perfil.disable()
+            _perfiles_hilos.reset(token)
+
+        nombre = f"{timezone.now():%Y%m%dT%H%M%S}-{os.getpid()}-{random.randrange(16 ** 6):06x}"
+        metadatos = {
+            'nombre': nombre,
+            'fecha': timezone.now().isoformat(),
+            'motivo': motivo,
+            'metodo': request.method,
+            'ruta': request.path,
+            'consulta': request.META.get('QUERY_STRING', ''),
+            'usuario': request.user.get_username() if getattr(request, 'user', None) and request.user.is_authenticated else '',
+            'estado': response.status_code,
+            'hilos': 0,
+        }
+
+        if response.streaming:
+            # El cuerpo se genera después de salir de la vista: se sigue perfilando al iterarlo
+            response.streaming_content = self.perfilar_flujo(
+                perfil, hilos, response.streaming_content, metadatos, inicio,
+            )
+        else:
+            metadatos['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            guardar_perfil(perfil, hilos, metadatos)
+
+        if motivo != 'muestreo':
+            response['X-Perfil'] = nombre
+        return response
+
+    def perfilar_flujo(self, perfil, hilos, contenido, metadatos, inicio):
+        try:
+            iterador = iter(contenido)
+            while True:
+                # Cada trozo puede generarse en otro contexto (ASGI): se marca en cada uno
+                token = _perfiles_hilos.set(hilos)
+                activo = activar(perfil)
+                try:
+                    trozo = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    if activo:
+                        perfil.disable()
+                    _perfiles_hilos.reset(token)
+                yield trozo
+        finally:
+            metadatos['duracion_ms'] = round((time.perf_counter() - inicio) * 1000, 1)
+            guardar_perfil(perfil, hilos, metadatos)
+
+# ==============================================================================
+# ARCHIVOS DE PERFIL
+# ==============================================================================
+def guardar_perfil(perfil, hilos, metadatos):
+    """
+    Escribe <nombre>.prof (perfil de la petición + el de sus hilos) y <nombre>.json,
+    y borra los perfiles más antiguos que 'CONSERVAR'.
+    """
+    directorio = directorio_perfiles()
+    try:
+        directorio.mkdir(parents=True, exist_ok=True)
+        estadisticas = pstats.Stats(perfil)
+        for perfil_hilo in hilos:
+            estadisticas.add(perfil_hilo)
+        metadatos['hilos'] = len(hilos)
+        metadatos['funciones'] = resumen_funciones(estadisticas)
+        metadatos['mas_costosa'] = max(resumen_funciones(estadisticas, None), key=lambda f: f['propio_ms'], default=None)
+
+        estadisticas.dump_stats(directorio / f"{metadatos['nombre']}.prof")
+        with open(directorio / f"{metadatos['nombre']}.json", 'w', encoding='utf-8') as f:
+            json.dump(metadatos, f, ensure_ascii=False)
+        limpiar_perfiles(directorio, configuracion()['CONSERVAR'])
+    except OSError as e:
+        # El perfilado nunca debe romper la respuesta
+        print(f"❌ No se pudo guardar el perfil {metadatos['nombre']}: {e}")
+
+
+def resumen_funciones(estadisticas, limite=FUNCIONES_RESUMEN):
+    """
+    Las funciones con más tiempo acumulado: [{'funcion', 'llamadas', 'propio_ms', 'acumulado_ms'}].
+    """
+    filas = []
+    for (archivo, linea, funcion), (_primitivas, llamadas, propio, acumulado, _llamadores) in estadisticas.stats.items():
+        filas.append({
+            # Las funciones de C (built-in) no tienen archivo: cProfile las registra como '~'
+            'funcion': funcion if archivo == '~' else f"{funcion} ({os.path.basename(archivo)}:{linea})",
+            'llamadas': llamadas,
+            'propio_ms': round(propio * 1000, 2),
+            'acumulado_ms': round(acumulado * 1000, 2),
+        })
+    filas.sort(key=lambda f: f['acumulado_ms'], reverse=True)
+    return filas[:limite]
+
+
+def limpiar_perfiles(directorio, conservar):
+    perfiles = sorted(directorio.glob('*.prof'), key=lambda p: p.name, reverse=True)
+    for viejo in perfiles[conservar:]:
+        viejo.unlink(missing_ok=True)
+        viejo.with_suffix('.json').unlink(missing_ok=True)
+
+
+def listar_perfiles():
+    """
+    Metadatos de los perfiles en disco, del más nuevo al más antiguo.
+    """
+    perfiles = []
+    for archivo in sorted(directorio_perfiles().glob('*.json'), key=lambda p: p.name, reverse=True):
+        try:
+            with open(archivo, encoding='utf-8') as f:
+                perfiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return perfiles
+
+
+def ruta_perfil(nombre):
+    """
+    Ruta del .prof de un perfil listado, o Http404 (el nombre nunca sale del directorio).
+    """
+    if not NOMBRE_PERFIL.match(nombre or ''):
+        raise Http404("Perfil no encontrado")
+    ruta = directorio_perfiles() / f"{nombre}.prof"
+    if not ruta.is_file():
+        raise Http404("Perfil no encontrado")
+    return ruta
+
+# ==============================================================================
+# VISTAS DEL ADMIN (/admin/perfiles/, sólo staff: ver mysite/urls.py)
+# ==============================================================================
+def lista_perfiles_view(request):
+    return render(request, 'admin/perfiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Perfiles de peticiones',
+        'perfiles': listar_perfiles(),
+        'configuracion': configuracion(),
+    })
+
+
+def descargar_perfil_view(request, nombre):
+    """
+    Descarga el .prof; con '?formato=texto' muestra el informe de pstats.
+    """
+    ruta = ruta_perfil(nombre)
+    if request.GET.get('formato') == 'texto':
+        salida = io.StringIO()
+        pstats.Stats(str(ruta), stream=salida).sort_stats('cumulative').print_stats(60)
+        return HttpResponse(salida.getvalue(), content_type='text/plain; charset=utf-8')
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
@@ -0,0 +1,248 @@
+# regiones.py
+
+# ==============================================================================
+# REGISTRO ÚNICO DE REGIONES Y CELDAS DE GRILLA
+# ==============================================================================
+# Antes las coordenadas estaban definidas tres veces (views.py y dos copias en
+# logica_evolucion.py) con valores distintos, por lo que un mismo lugar generaba
+# peticiones y claves de caché diferentes. Ahora todo el proyecto resuelve las
+# regiones aquí y cada ubicación se "ajusta" a la celda de la grilla del modelo
+# de Open-Meteo, cuya clave canónica usan todas las descargas, cachés y tablas.
+
+import csv
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from .models import REGIONES_CHOICES
+from .indice_espacial import ArbolKD
+
+# Resolución de la grilla del archivo histórico de Open-Meteo (ERA5-Land, 0.1°).
+# Dos coordenadas dentro de la misma celda devuelven exactamente la misma serie.
+GRID_RESOLUCION = 0.1
+
+# ------------------------------------------------------------------------------
+# Coordenadas de referencia (capital regional) por código interno
+# ------------------------------------------------------------------------------
+REGION_COORDS = {
+    'ARICA': (-18.47, -70.29),
+    'TARAPACA': (-20.22, -70.14),
+    'ANTOFAGASTA': (-23.65, -70.40),
+    'ATACAMA': (-27.36, -70.33),
+    'COQUIMBO': (-29.91, -71.25),
+    'VALPARAISO': (-33.04, -71.60),
+    'METROPOLITANA': (-33.44, -70.67),
+    'OHIGGINS': (-34.10, -70.74),
+    'MAULE': (-35.42, -71.67),
+    'NUBLE': (-36.60, -72.10),
+    'BIOBIO': (-36.82, -73.05),
+    'ARAUCANIA': (-38.73, -72.60),
+    'RIOS': (-39.81, -73.24),
+    'LAGOS': (-41.47, -72.94),
+    'AYSEN': (-45.57, -72.08),
+    'MAGALLANES': (-53.16, -70.91),
+}
+
+REGION_BACKGROUNDS = {  #editar nombres de imagenes y añadir las imagenes a la carpeta statics/img cn los mismos nombres y en jpg!!!
+    'ARICA': 'ARICA.jpg',
+    'TARAPACA': 'TARAPACA.jpg',
+    'ANTOFAGASTA': 'ANTOGASTA.jpg',
+    'ATACAMA': 'ATACAMA.jpg',
+    'COQUIMBO': 'COQUIMBO.jpg',
+    'VALPARAISO': 'VALPARAISO.jpg',
+    'METROPOLITANA': 'SANTIAGO.jpg',
+    'OHIGGINS': 'OHIGGINS.jpg',
+    'MAULE': 'MAULE.jpg',
+    'NUBLE': 'ÑUBLE.jpg',
+    'BIOBIO': 'BIOBIO.jpg',
+    'ARAUCANIA': 'ARAUCANIA.jpg',
+    'RIOS': 'RIOS.jpg',
+    'LAGOS': 'LAGOS.jpg',
+    'AYSEN': 'AYSEN.jpg',
+    'MAGALLANES': 'MAGALLANES.jpg',
+}
+
+# ------------------------------------------------------------------------------
+# Alias aceptados (números romanos y nombres legibles) -> código interno
+# ------------------------------------------------------------------------------
+REGION_ALIASES = {
+    'XV': 'ARICA', 'ARICA Y PARINACOTA': 'ARICA',
+    'I': 'TARAPACA', 'TARAPACÁ': 'TARAPACA',
+    'II': 'ANTOFAGASTA',
+    'III': 'ATACAMA',
+    'IV': 'COQUIMBO',
+    'V': 'VALPARAISO', 'VALPARAÍSO': 'VALPARAISO',
+    'RM': 'METROPOLITANA', 'STGO': 'METROPOLITANA', 'METROPOLITANA DE SANTIAGO': 'METROPOLITANA',
+    'VI': 'OHIGGINS', "O'HIGGINS": 'OHIGGINS',
+    'VII': 'MAULE',
+    'XVI': 'NUBLE', 'ÑUBLE': 'NUBLE',
+    'VIII': 'BIOBIO', 'BIOBÍO': 'BIOBIO',
+    'IX': 'ARAUCANIA', 'LA ARAUCANÍA': 'ARAUCANIA',
+    'XIV': 'RIOS', 'LOS RÍOS': 'RIOS',
+    'X': 'LAGOS', 'LOS LAGOS': 'LAGOS',
+    'XI': 'AYSEN', 'AYSÉN': 'AYSEN',
+    'XII': 'MAGALLANES',
+}
+
+REGION_NOMBRES = dict(REGIONES_CHOICES)
+
+# ------------------------------------------------------------------------------
+# Comunas (dataset incluido en myapp/data/comunas.csv)
+# ------------------------------------------------------------------------------
+RUTA_COMUNAS = Path(__file__).resolve().parent / 'data' / 'comunas.csv'
+
+Comuna = namedtuple('Comuna', 'codigo nombre region lat lon')
+
+# Una coordenada arbitraria se acepta si está a menos de esta distancia (en grados,
+# ~110 km) de alguna comuna; así se descartan puntos fuera de Chile.
+DISTANCIA_MAXIMA_COMUNA = 1.0
+
+# ==============================================================================
+# FUNCIONES DEL REGISTRO
+# ==============================================================================
+def resolver_region(codigo):
+    """
+    Devuelve el código interno (ej: 'METROPOLITANA') para un código o alias
+    ('STGO', 'RM', 'Metropolitana de Santiago'...), o None si no se reconoce.
+    """
+    if not codigo:
+        return None
+    codigo = str(codigo).strip().upper()
+    if codigo in REGION_COORDS:
+        return codigo
+    return REGION_ALIASES.get(codigo)
+
+
+def celda_grilla(lat, lon):
+    """
+    Ajusta una coordenada al centro de su celda en la grilla del modelo.
+    """
+    return (
+        round(round(lat / GRID_RESOLUCION) * GRID_RESOLUCION, 2),
+        round(round(lon / GRID_RESOLUCION) * GRID_RESOLUCION, 2),
+    )
+
+
+def clave_celda(lat, lon):
+    """
+    Clave canónica de la celda que contiene (lat, lon), ej: '-33.40_-70.70'.
+    """
+    lat_c, lon_c = celda_grilla(lat, lon)
+    return f"{lat_c:.2f}_{lon_c:.2f}"
+
+
+def coordenadas_region(codigo):
+    """
+    Coordenadas (ajustadas a la grilla) de una región o alias, o None.
+    """
+    region_code = resolver_region(codigo)
+    if not region_code:
+        return None
+    return celda_grilla(*REGION_COORDS[region_code])
+
+
+def clave_region(codigo):
+    """
+    Clave canónica de celda de una región o alias, o None.
+    """
+    region_code = resolver_region(codigo)
+    if not region_code:
+        return None
+    return clave_celda(*REGION_COORDS[region_code])
+
+
+# ==============================================================================
+# COMUNAS E ÍNDICE DE VECINO MÁS CERCANO
+# ==============================================================================
+@lru_cache(maxsize=1)
+def cargar_comunas():
+    """
+    Lee el dataset de comunas una sola vez por proceso: { 'PUENTE_ALTO': Comuna(...), ... }.
+    """
+    with open(RUTA_COMUNAS, encoding='utf-8', newline='') as f:
+        return {
+            fila['codigo']: Comuna(fila['codigo'], fila['nombre'], fila['region'], float(fila['lat']), float(fila['lon']))
+            for fila in csv.DictReader(f)
+        }
+
+
+@lru_cache(maxsize=1)
+def indice_comunas():
+    """
+    Árbol KD sobre las comunas (se construye una vez por proceso).
+    """
+    return ArbolKD([(c.lat, c.lon, c) for c in cargar_comunas().values()])
+
+
+def resolver_comuna(codigo):
+    """
+    Devuelve la Comuna para su código (ej: 'PUENTE_ALTO'), o None.
+    """
+    if not codigo:
+        return None
+    return cargar_comunas().get(str(codigo).strip().upper())
+
+
+def comuna_mas_cercana(lat, lon):
+    """
+    Comuna más cercana a una coordenada arbitraria, o None si está demasiado lejos.
+    """
+    comuna, distancia = indice_comunas().mas_cercano(lat, lon)
+    if comuna is None or distancia > DISTANCIA_MAXIMA_COMUNA:
+        return None
+    return comuna
+
+
+def opciones_comunas():
+    """
+    Choices agrupados por región para el formulario (se evalúa de forma perezosa).
+    """
+    por_region = {}
+    for comuna in sorted(cargar_comunas().values(), key=lambda c: c.nombre):
+        por_region.setdefault(comuna.region, []).append((comuna.codigo, comuna.nombre))
+    return [('', 'Toda la región')] + [
+        (nombre, por_region.get(codigo, [])) for codigo, nombre in REGIONES_CHOICES
+    ]
+
+
+def resolver_ubicacion(data):
+    """
+    Resuelve la ubicación pedida por una vista AJAX, en este orden de prioridad:
+    'comuna' (código), 'lat'/'lon' o 'region_code'. Un punto 'lat'/'lon' se ajusta a su
+    propia celda de la grilla; la comuna más cercana sólo valida que esté en Chile y le
+    da la región y la etiqueta.
+    Devuelve {'region_code', 'comuna', 'lat', 'lon', 'celda'} o None si no es válida.
+    """
+    comuna = resolver_comuna(data.get('comuna'))
+
+    if comuna is None and data.get('lat') not in (None, '') and data.get('lon') not in (None, ''):
+        try:
+            lat, lon = celda_grilla(float(data['lat']), float(data['lon']))
+        except (TypeError, ValueError, OverflowError):
+            return None
+        cercana = comuna_mas_cercana(lat, lon)
+        if cercana is None:
+            return None
+        return {
+            'region_code': cercana.region,
+            'comuna': cercana,
+            'lat': lat,
+            'lon': lon,
+            'celda': clave_celda(lat, lon),
+        }
+
+    if comuna is not None:
+        region_code, lat, lon = comuna.region, comuna.lat, comuna.lon
+    else:
+        region_code = resolver_region(data.get('region_code'))
+        if not region_code:
+            return None
+        lat, lon = REGION_COORDS[region_code]
+
+    return {
+        'region_code': region_code,
+        'comuna': comuna,
+        'lat': lat,
+        'lon': lon,
+        'celda': clave_celda(lat, lon),
+    }
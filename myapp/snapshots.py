@@ -0,0 +1,248 @@
+# snapshots.py
+
+# ==============================================================================
+# SNAPSHOTS ESTÁTICOS: RESPUESTAS AJAX PRECALCULADAS COMO ARCHIVOS JSON
+# ==============================================================================
+# Lo que devuelven los endpoints AJAX para periodos cerrados no cambia. El comando
+# 'publicar_snapshots' lo escribe cada noche bajo STATIC_ROOT, con la MISMA forma
+# que la respuesta del endpoint, para que el servidor web (nginx) lo entregue sin
+# pasar por Django. Las plantillas piden primero el archivo y, si no existe (404),
+# llaman al endpoint dinámico.
+#
+#   snapshots/actual.json                                 manifiesto: versión de cada celda
+#   snapshots/<versión>/<celda>/evolucion.json            = fetch_evolucion_ajax
+#   snapshots/<versión>/<celda>/mapa_calor.json           = fetch_mapa_calor_ajax
+#   snapshots/<versión>/<celda>/metricas/<año>.json       = fetch_anomalias_ajax (año cerrado)
+#   snapshots/<versión>/<celda>/metricas/<año>-<mm>.json  = fetch_anomalias_ajax (mes cerrado)
+#   snapshots/<versión>/<celda>/pronostico/<offset>.json  = fetch_pronostico_ajax (sólo ese día)
+#
+# Cada publicación escribe un directorio de versión nuevo y recién al final cambia
+# el manifiesto (reemplazo atómico), así una página nunca mezcla dos versiones y el
+# servidor web puede cachear los archivos versionados indefinidamente.
+
+import json
+import os
+import shutil
+from calendar import monthrange
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cliente_api import ARCHIVE_URL, FORECAST_URL, VARIABLES_DIARIAS, consultar_open_meteo
+from .acumuladores import AcumuladorPeriodos
+from .logica_resultado import calculate_metrics, calcular_periodo
+from .logica_evolucion import resultado_evolucion
+from .logica_mapa_calor import construir_mapa_calor
+from .logica_normales import respuesta_anomalias
+from .logica_pronostico import fuente_pronostico, metricas_pronostico
+
+DIRECTORIO_SNAPSHOTS = 'snapshots'
+MANIFIESTO_SNAPSHOTS = 'actual.json'
+
+# Segundos que cada proceso web reutiliza el manifiesto leído del disco
+TTL_MANIFIESTO = 60
+
+# Ventana del slider de pronóstico (misma que pronostico_detalle.html)
+DIAS_PRONOSTICO_ATRAS = 14
+DIAS_PRONOSTICO_ADELANTE = 14
+
+# ==============================================================================
+# LECTURA: Manifiesto y URLs para las Plantillas
+# ==============================================================================
+def ruta_snapshots():
+    """
+    Directorio raíz de los snapshots, o None si no hay STATIC_ROOT configurado.
+    """
+    if not getattr(settings, 'STATIC_ROOT', None):
+        return None
+    return Path(settings.STATIC_ROOT) / DIRECTORIO_SNAPSHOTS
+
+
+def leer_manifiesto():
+    """
+    {'generado': ..., 'celdas': {celda: {'version', 'fecha'}}} de la última publicación
+    (vacío si nunca se publicó). Se guarda unos segundos en la caché del proceso.
+    """
+    manifiesto = cache.get('snapshots:manifiesto')
+    if manifiesto is not None:
+        return manifiesto
+
+    raiz = ruta_snapshots()
+    manifiesto = {'celdas': {}}
+    if raiz is not None:
+        try:
+            with open(raiz / MANIFIESTO_SNAPSHOTS, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError):
+            pass
+    cache.set('snapshots:manifiesto', manifiesto, TTL_MANIFIESTO)
+    return manifiesto
+
+
+def contexto_snapshots(celda, hoy=None):
+    """
+    Variables de plantilla para una celda: 'snapshot_url' (base de sus archivos, o ''
+    si no tiene snapshot) y 'snapshot_pronostico' (True si la ventana de pronóstico
+    publicada corresponde a hoy; la de otro día ya no sirve).
+    """
+    publicada = leer_manifiesto().get('celdas', {}).get(celda)
+    if not publicada:
+        return {'snapshot_url': '', 'snapshot_pronostico': False}
+
+    hoy = hoy or date.today()
+    return {
+        'snapshot_url': f"{settings.STATIC_URL}{DIRECTORIO_SNAPSHOTS}/{publicada['version']}/{celda}/",
+        'snapshot_pronostico': publicada.get('fecha') == hoy.isoformat(),
+    }
+
+# ==============================================================================
+# ESCRITURA: Archivos de una Celda
+# ==============================================================================
+def escribir_json(ruta, contenido):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(contenido, f, separators=(',', ':'))
+
+
+def _recortar(serie_diaria, desde, hasta):
+    """
+    Días [desde, hasta) de un bloque 'daily'; None si falta algún valor (ese periodo
+    no se publica y la plantilla lo pide al endpoint).
+    """
+    recorte = {variable: valores[desde:hasta] for variable, valores in serie_diaria.items()}
+    if any(v is None for valores in recorte.values() for v in valores):
+        return None
+    return recorte
+
+
+def publicar_historico(directorio, celda, daily, ultimo_dia):
+    """
+    Escribe la evolución, el mapa de calor y las métricas de cada año y mes cerrado
+    (hasta 'ultimo_dia') de una serie diaria completa. Devuelve los archivos escritos.
+    """
+    inicio = date.fromisoformat(daily['time'][0])
+    acumulador = AcumuladorPeriodos(inicio)
+    acumulador.agregar_diario(daily)
+
+    evolucion = resultado_evolucion(acumulador.anual())
+    escribir_json(directorio / 'evolucion.json', {'success': True, **evolucion})
+    escribir_json(directorio / 'mapa_calor.json', {'success': True, **construir_mapa_calor(acumulador)})
+    escritos = 2
+
+    def indice(dia):
+        return (dia - inicio).days
+
+    for year in range(inicio.year, ultimo_dia.year + 1):
+        periodos = [(month, date(year, month, 1), date(year, month, monthrange(year, month)[1]))
+                    for month in range(1, 13)]
+        periodos.append((0, date(year, 1, 1), date(year, 12, 31)))
+
+        for month, desde, hasta in periodos:
+            if desde < inicio or hasta > ultimo_dia:
+                continue  # Periodo abierto (o anterior a la serie): queda para el endpoint
+            recorte = _recortar(daily, indice(desde), indice(hasta) + 1)
+            if not recorte:
+                continue
+            _start, _end, periodo_label = calcular_periodo(year, month)
+            respuesta = respuesta_anomalias(celda, year, month, None, periodo_label, calculate_metrics(recorte))
+            nombre = f"{year}-{month:02d}.json" if month else f"{year}.json"
+            escribir_json(directorio / 'metricas' / nombre, respuesta)
+            escritos += 1
+
+    return escritos
+
+
+def _dia_de_respuesta(api_data, fecha):
+    """
+    Recorta una respuesta de varios días (daily + hourly) a un solo día, con la forma
+    de la consulta de un día que hace fetch_pronostico_ajax.
+    """
+    daily = api_data.get('daily') or {}
+    hourly = api_data.get('hourly') or {}
+    fechas = daily.get('time') or []
+    if fecha not in fechas:
+        return None
+    i = fechas.index(fecha)
+    horas = [j for j, t in enumerate(hourly.get('time') or []) if t.startswith(fecha)]
+    return {
+        'daily': _recortar(daily, i, i + 1),
+        'hourly': {variable: [valores[j] for j in horas] for variable, valores in hourly.items()},
+    }
+
+
+def publicar_pronostico(directorio, lat, lon, hoy):
+    """
+    Escribe la ventana del slider de pronóstico (-14..+14 días) con DOS descargas
+    (Archive para el pasado reciente y Forecast para hoy y adelante) en vez de una por día.
+    Devuelve los archivos escritos.
+    """
+    ventanas = [
+        (ARCHIVE_URL, -DIAS_PRONOSTICO_ATRAS, -1),
+        (FORECAST_URL, 0, DIAS_PRONOSTICO_ADELANTE),
+    ]
+    escritos = 0
+    for api_url, desde, hasta in ventanas:
+        try:
+            api_data = consultar_open_meteo(api_url, lat, lon,
+                                            (hoy + timedelta(days=desde)).isoformat(),
+                                            (hoy + timedelta(days=hasta)).isoformat(),
+                                            daily=VARIABLES_DIARIAS, hourly='temperature_2m')
+        except Exception as e:
+            print(f"❌ Error en ventana de pronóstico {desde}..{hasta}: {str(e)}")
+            continue
+
+        for days_offset in range(desde, hasta + 1):
+            fecha = (hoy + timedelta(days=days_offset)).isoformat()
+            dia = _dia_de_respuesta(api_data, fecha)
+            final_metrics = metricas_pronostico(dia) if dia and dia['daily'] else None
+            if not final_metrics:
+                continue
+            _api_url, periodo_label, is_forecast_result = fuente_pronostico(days_offset, fecha)
+            escribir_json(directorio / 'pronostico' / f"{days_offset}.json", {
+                'success': True,
+                'periodo_label': periodo_label,
+                'metrics': final_metrics,
+                'is_forecast_result': is_forecast_result,
+            })
+            escritos += 1
+    return escritos
+
+# ==============================================================================
+# PUBLICACIÓN: Manifiesto Atómico y Limpieza de Versiones
+# ==============================================================================
+def publicar_manifiesto(raiz, celdas, generado):
+    """
+    Une las celdas recién publicadas con las del manifiesto anterior (una publicación
+    parcial, ej: '--region', no borra las demás) y lo reemplaza de forma atómica.
+    """
+    anterior = {}
+    try:
+        with open(raiz / MANIFIESTO_SNAPSHOTS, encoding='utf-8') as f:
+            anterior = json.load(f).get('celdas', {})
+    except (OSError, ValueError):
+        pass
+
+    manifiesto = {'generado': generado, 'celdas': {**anterior, **celdas}}
+    temporal = raiz / f".{MANIFIESTO_SNAPSHOTS}.tmp"
+    escribir_json(temporal, manifiesto)
+    os.replace(temporal, raiz / MANIFIESTO_SNAPSHOTS)
+    cache.delete('snapshots:manifiesto')
+    return manifiesto
+
+
+def limpiar_versiones(raiz, manifiesto, conservar):
+    """
+    Borra los directorios de versión que el manifiesto ya no usa, salvo los
+    'conservar' más recientes (páginas abiertas con el manifiesto anterior).
+    Devuelve las versiones borradas.
+    """
+    en_uso = {c['version'] for c in manifiesto['celdas'].values()}
+    versiones = sorted((p for p in raiz.iterdir() if p.is_dir() and p.name not in en_uso),
+                       key=lambda p: p.name, reverse=True)
+    borradas = []
+    for directorio in versiones[conservar:]:
+        shutil.rmtree(directorio, ignore_errors=True)
+        borradas.append(directorio.name)
+    return borradas
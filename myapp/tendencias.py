@@ -0,0 +1,120 @@
+# tendencias.py
+
+# ==============================================================================
+# ESTADÍSTICAS DE TENDENCIA PARA LA SERIE ANUAL (EVOLUCIÓN HISTÓRICA)
+# ==============================================================================
+# Tendencia lineal (mínimos cuadrados) con intervalo de confianza del 95%, media
+# móvil y medias por década de cada métrica anual. Todo se calcula en una pasada
+# sobre la serie (a lo sumo unas décadas de valores), con sumas acumuladas y sin
+# dependencias externas: el proyecto no usa numpy y, con ~45 puntos por métrica,
+# un cálculo vectorizado no ahorraría nada frente a estas sumas. El resultado se
+# guarda en la caché junto con la serie (logica_evolucion.obtener_evolucion).
+
+import math
+
+# Métricas de la serie anual (process_daily_to_annual / AcumuladorPeriodos.anual)
+METRICAS_TENDENCIA = ['temp_max_avg', 'temp_min_avg', 'precip_sum', 'radiation_sum']
+
+# Ventana de la media móvil (años)
+VENTANA_MEDIA_MOVIL = 10
+
+# Valores críticos de t de Student (dos colas, 95%) por grados de libertad.
+# Para grados intermedios se usa la fila inferior más cercana (más conservadora).
+T_CRITICO_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131,
+    16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074,
+    23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045,
+    30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980,
+}
+T_CRITICO_95_INFINITO = 1.960
+
+
+def t_critico_95(grados):
+    if grados >= 120:
+        return T_CRITICO_95[120] if grados < 1000 else T_CRITICO_95_INFINITO
+    return T_CRITICO_95[max(g for g in T_CRITICO_95 if g <= grados)]
+
+# ==============================================================================
+# FUNCIONES DE CÁLCULO
+# ==============================================================================
+def tendencia_lineal(años, valores):
+    """
+    Recta de mínimos cuadrados valor = a + b * año. Devuelve la pendiente por
+    década con su intervalo de confianza del 95%, o None con menos de 3 años.
+    """
+    n = len(años)
+    if n < 3:
+        return None
+
+    media_x = sum(años) / n
+    media_y = sum(valores) / n
+    sxx = sum((x - media_x) ** 2 for x in años)
+    sxy = sum((x - media_x) * (y - media_y) for x, y in zip(años, valores))
+    if sxx == 0:
+        return None
+
+    pendiente = sxy / sxx
+    intercepto = media_y - pendiente * media_x
+    residuos = sum((y - (intercepto + pendiente * x)) ** 2 for x, y in zip(años, valores))
+    error_pendiente = math.sqrt(residuos / (n - 2) / sxx)
+    margen = t_critico_95(n - 2) * error_pendiente
+
+    return {
+        'pendiente_decada': round(pendiente * 10, 3),
+        'ic95': [round((pendiente - margen) * 10, 3), round((pendiente + margen) * 10, 3)],
+        # El IC no incluye el 0: la tendencia es estadísticamente significativa
+        'significativa': (pendiente - margen) * (pendiente + margen) > 0,
+        # Valores de la recta para cada año (para superponerla en el gráfico)
+        'ajuste': [round(intercepto + pendiente * x, 2) for x in años],
+        'n': n,
+    }
+
+
+def media_movil(valores, ventana=VENTANA_MEDIA_MOVIL):
+    """
+    Media móvil hacia atrás con suma acumulada; None mientras no hay 'ventana' valores.
+    """
+    resultado = []
+    suma = 0.0
+    for i, valor in enumerate(valores):
+        suma += valor
+        if i >= ventana:
+            suma -= valores[i - ventana]
+        resultado.append(round(suma / ventana, 2) if i >= ventana - 1 else None)
+    return resultado
+
+
+def medias_decadales(años, valores):
+    """
+    [{'decada': 1980, 'media': x, 'n': años_con_dato}, ...] en orden cronológico.
+    """
+    grupos = {}
+    for año, valor in zip(años, valores):
+        grupo = grupos.setdefault(año // 10 * 10, [0, 0.0])
+        grupo[0] += 1
+        grupo[1] += valor
+    return [
+        {'decada': decada, 'media': round(suma / n, 2), 'n': n}
+        for decada, (n, suma) in sorted(grupos.items())
+    ]
+
+
+def calcular_tendencias(chart_data, hasta_año=None):
+    """
+    Estadísticas de tendencia de cada métrica de la serie anual:
+    { 'temp_max_avg': {'tendencia', 'media_movil', 'medias_decadales'}, ..., 'años': [...] }
+    Los años posteriores a 'hasta_año' (ej: el año en curso, incompleto) se excluyen.
+    """
+    filas = [d for d in chart_data if hasta_año is None or int(d['year']) <= hasta_año]
+    años = [int(d['year']) for d in filas]
+
+    tendencias = {'años': [str(a) for a in años], 'ventana_media_movil': VENTANA_MEDIA_MOVIL}
+    for metrica in METRICAS_TENDENCIA:
+        valores = [d[metrica] for d in filas]
+        tendencias[metrica] = {
+            'tendencia': tendencia_lineal(años, valores),
+            'media_movil': media_movil(valores),
+            'medias_decadales': medias_decadales(años, valores),
+        }
+    return tendencias
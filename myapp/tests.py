@@ -1,3 +1,679 @@
-from django.test import TestCase
+import io
+import json
+import random
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import cuota_api
+from .almacen import guardar_diario, leer_diario
+from .cobertura import FECHA_BASE_COBERTURA, mascara_de_fechas, rangos_en_cero, rangos_faltantes, tramos_en_uno
+from .eventos import REGLAS_EVENTOS, detectar_eventos, erosionar, umbrales_mensuales
+from .indice_espacial import ArbolKD, proyectar
+from .lector_json import iterar_arreglos, iterar_tokens
+from .cliente_api import ARCHIVE_URL, VARIABLES_DIARIAS, claves_series
+from .logica_comparacion import MAX_UBICACIONES_COMPARACION, comparar, resolver_periodos, resolver_ubicaciones
+from .logica_evolucion import clave_cache_evolucion
+from .logica_exportacion import COLUMNAS_DIARIAS, FILAS_POR_LOTE, agregar_filas, escribir_parquet, parquet_disponible
+from .logica_normales import calcular_normales
+from .logica_resultado import calcular_periodo, calculate_metrics, resolver_campos, variables_diarias
+from .logica_trabajos import TIPOS_TRABAJO, encolar_trabajo, ejecutar_trabajo, limpiar_trabajos, tomar_trabajo
+from .models import EventoExtremo, RegistroDiario, TrabajoFondo, VARIABLES_REGISTRO_DIARIO
+from .regiones import REGION_COORDS, cargar_comunas, clave_celda, comuna_mas_cercana, resolver_ubicacion
+from .tendencias import calcular_tendencias, media_movil, medias_decadales, t_critico_95, tendencia_lineal
+
+
+def serie_diaria(desde, dias, **variables):
+    """
+    Bloque 'daily' como el de la API: 'time' desde 'desde' y una lista por variable.
+    """
+    daily = {'time': [(desde + timedelta(days=i)).isoformat() for i in range(dias)]}
+    daily.update(variables)
+    return daily
+
+# ==============================================================================
+# MÉTRICAS Y NORMALES
+# ==============================================================================
+class NormalesTests(TestCase):
+
+    def test_media_sobre_los_dias_con_valor(self):
+        daily = serie_diaria(date(2000, 1, 1), 3, temperature_2m_max=[10.0, 20.0])
+        metricas = calculate_metrics(daily)
+        self.assertEqual(metricas['num_dias'], 3)
+        self.assertEqual(metricas['temp_max_avg'], 15.0)
+
+    def test_dias_sin_dato_no_sesgan_la_normal(self):
+        # Dos eneros: 1991 completo a 10 °C y 1992 con la mitad de los días en None
+        daily = serie_diaria(date(1991, 1, 1), 31, temperature_2m_max=[10.0] * 31)
+        otro = serie_diaria(date(1992, 1, 1), 31, temperature_2m_max=[20.0] * 15 + [None] * 16)
+        daily = {clave: daily[clave] + otro[clave] for clave in daily}
+
+        muestras = calcular_normales(daily)
+        self.assertEqual(sorted(muestras[('mensual', 1)]['temp_max_avg']), [10.0, 20.0])
+        self.assertEqual(sorted(muestras[('anual', 0)]['temp_max_avg']), [10.0, 20.0])
+
+    def test_none_sin_filtrar(self):
+        daily = serie_diaria(date(2000, 1, 1), 4, temperature_2m_max=[10.0, None, 20.0, None],
+                             precipitation_sum=[None, None, None, None])
+        metricas = calculate_metrics(daily)
+        self.assertEqual((metricas['temp_max_avg'], metricas['temp_max_abs']), (15.0, 20.0))
+        self.assertEqual(metricas['precip_sum'], 0.0)
+
+    def test_grupo_sin_valores_no_es_muestra(self):
+        # 1991 sin precipitación registrada: no aporta un 0.0 a la normal
+        daily = serie_diaria(date(1991, 1, 1), 2, temperature_2m_max=[10.0, 12.0], precipitation_sum=[None, None])
+        otro = serie_diaria(date(1992, 1, 1), 2, temperature_2m_max=[11.0, 13.0], precipitation_sum=[4.0, 6.0])
+        daily = {clave: daily[clave] + otro[clave] for clave in daily}
+
+        muestras = calcular_normales(daily)
+        self.assertEqual(muestras[('anual', 0)]['precip_sum'], [10.0])
+        self.assertEqual(sorted(muestras[('anual', 0)]['temp_max_avg']), [11.0, 12.0])
+
+    def test_sin_dias_no_hay_metricas(self):
+        self.assertIsNone(calculate_metrics({'time': []}))
+
+# ==============================================================================
+# ÍNDICE ESPACIAL DE COMUNAS
+# ==============================================================================
+class ArbolKDTests(TestCase):
+
+    def test_coincide_con_la_busqueda_lineal(self):
+        azar = random.Random(7)
+        puntos = [(azar.uniform(-56, -17), azar.uniform(-76, -66), i) for i in range(300)]
+        arbol = ArbolKD(puntos)
+
+        def distancia(lat, lon, punto):
+            x, y = proyectar(lat, lon)
+            px, py = proyectar(punto[0], punto[1])
+            return (x - px) ** 2 + (y - py) ** 2
+
+        for _ in range(200):
+            lat, lon = azar.uniform(-56, -17), azar.uniform(-76, -66)
+            esperado = min(puntos, key=lambda p: distancia(lat, lon, p))
+            item, _distancia = arbol.mas_cercano(lat, lon)
+            self.assertEqual(item, esperado[2])
+
+    def test_arbol_vacio(self):
+        self.assertEqual(ArbolKD([]).mas_cercano(-33.4, -70.6), (None, None))
+
+    def test_comuna_mas_cercana(self):
+        arica = cargar_comunas()['ARICA']
+        self.assertEqual(comuna_mas_cercana(arica.lat + 0.01, arica.lon - 0.01), arica)
+        # En medio del océano no hay comuna a menos de DISTANCIA_MAXIMA_COMUNA
+        self.assertIsNone(comuna_mas_cercana(-30.0, -90.0))
+
+    def test_resolver_ubicacion_por_coordenadas(self):
+        arica = cargar_comunas()['ARICA']
+        ubicacion = resolver_ubicacion({'lat': str(arica.lat), 'lon': str(arica.lon)})
+        self.assertEqual(ubicacion['comuna'], arica)
+        self.assertEqual(ubicacion['region_code'], 'ARICA')
+        self.assertIsNone(resolver_ubicacion({'lat': 'x', 'lon': '1'}))
+
+    def test_resolver_ubicacion_conserva_el_punto_pedido(self):
+        # Un punto a ~30 km de la comuna más cercana usa su propia celda, no la de la comuna
+        arica = cargar_comunas()['ARICA']
+        lat, lon = arica.lat + 0.3, arica.lon + 0.2
+        ubicacion = resolver_ubicacion({'lat': lat, 'lon': lon})
+        self.assertEqual(ubicacion['celda'], clave_celda(lat, lon))
+        self.assertNotEqual(ubicacion['celda'], clave_celda(arica.lat, arica.lon))
+        self.assertEqual(ubicacion['region_code'], 'ARICA')
+        # Fuera de Chile no hay comuna que lo valide
+        self.assertIsNone(resolver_ubicacion({'lat': 40.0, 'lon': -3.7}))
+
+# ==============================================================================
+# EXPORTACIÓN DEL ALMACÉN
+# ==============================================================================
+class ExportacionTests(TestCase):
+
+    def setUp(self):
+        self.celda = clave_celda(*REGION_COORDS['ARICA'])
+        RegistroDiario.objects.bulk_create([
+            RegistroDiario(celda=self.celda, fecha=date(2000, 1, 1) + timedelta(days=i), temp_max=20.0 + i)
+            for i in range(3)
+        ])
+        self.staff = User.objects.create_user('staff', is_staff=True)
+
+    def test_columnas_desde_el_modelo(self):
+        self.assertEqual(COLUMNAS_DIARIAS, list(VARIABLES_REGISTRO_DIARIO.values()))
+
+    def test_requiere_staff(self):
+        respuesta = self.client.get('/clima/exportar/', {'region': 'ARICA'})
+        self.assertEqual(respuesta.status_code, 302)
+
+        self.client.force_login(User.objects.create_user('usuario'))
+        respuesta = self.client.get('/clima/exportar/', {'region': 'ARICA'})
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_sin_ubicacion_exige_periodo(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/clima/exportar/').status_code, 400)
+        self.assertEqual(self.client.get('/clima/exportar/', {'desde': '2000-01-01'}).status_code, 400)
+        respuesta = self.client.get('/clima/exportar/', {'desde': '2000-01-01', 'hasta': '2000-01-02'})
+        self.assertEqual(respuesta.status_code, 200)
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(len(lineas), 3)  # Cabecera + 2 días
+
+    def test_csv_diario_de_una_region(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get('/clima/exportar/', {'region': 'ARICA', 'formato': 'csv'})
+        lineas = b''.join(respuesta.streaming_content).decode().splitlines()
+        self.assertEqual(lineas[0], ','.join(['celda', 'fecha', *COLUMNAS_DIARIAS]))
+        self.assertEqual(lineas[1].split(',')[:3], [self.celda, '2000-01-01', '20.0'])
+
+    @unittest.skipUnless(parquet_disponible(), 'requiere pyarrow')
+    def test_parquet_envia_el_primer_grupo_tras_un_lote(self):
+        import pyarrow.parquet as pq
+        leidas = []
+
+        def filas():
+            for i in range(7 * FILAS_POR_LOTE):
+                leidas.append(i)
+                yield (self.celda, float(i))
+
+        partes = escribir_parquet(filas(), ['celda', 'valor'], ['texto', 'real'])
+        primera = next(partes)
+        self.assertEqual(len(leidas), FILAS_POR_LOTE)
+
+        archivo = pq.ParquetFile(io.BytesIO(primera + b''.join(partes)))
+        grupos = [archivo.metadata.row_group(i).num_rows for i in range(archivo.num_row_groups)]
+        self.assertEqual(grupos, [FILAS_POR_LOTE, 2 * FILAS_POR_LOTE, 4 * FILAS_POR_LOTE])
+
+    def test_agregado_mensual_ignora_dias_sin_dato(self):
+        filas = [
+            ('c', date(2000, 1, 1), 10.0, None, None, None, None, None),
+            ('c', date(2000, 1, 2), None, None, None, None, None, None),
+            ('c', date(2000, 2, 1), 30.0, None, None, None, None, None),
+        ]
+        enero, febrero = agregar_filas(filas, 'mensual')
+        self.assertEqual(enero[:4], ['c', '2000-01', 2, 10.0])
+        self.assertEqual(febrero[:4], ['c', '2000-02', 1, 30.0])
+
+# ==============================================================================
+# CUOTA COMPARTIDA DE OPEN-METEO
+# ==============================================================================
+class CuotaApiTests(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(CUOTA_OPEN_METEO={
+            'RUTA': Path(directorio.name) / 'cuota.sqlite3',
+            'TASA': 2.0, 'CAPACIDAD': 4.0, 'RESERVA_INTERACTIVA': 2.0,
+            'PAUSA_FONDO_429': 10.0, 'PAUSA_FONDO_MAXIMA': 40.0,
+        })
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Reloj controlado: el balde sólo se recarga cuando el test avanza el tiempo
+        self.ahora = 1000.0
+        reloj = mock.patch.object(cuota_api.time, 'time', lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def tomar(self, prioridad):
+        return cuota_api._intentar_tomar(prioridad)
+
+    def test_interactiva_usa_todo_el_balde(self):
+        for _ in range(4):
+            self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        # Balde vacío: falta 1 token a 2 tokens/s
+        self.assertAlmostEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0.5)
+
+    def test_recarga_segun_el_tiempo_sin_pasar_la_capacidad(self):
+        for _ in range(4):
+            self.tomar(cuota_api.PRIORIDAD_INTERACTIVA)
+        self.ahora += 1.0  # 2 tokens
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        self.assertGreater(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+
+        self.ahora += 3600.0
+        for _ in range(4):
+            self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        self.assertGreater(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+
+    def test_fondo_respeta_la_reserva_interactiva(self):
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_FONDO), 0)
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_FONDO), 0)
+        # Quedan 2 tokens = la reserva: el fondo espera, la interactiva no
+        self.assertAlmostEqual(self.tomar(cuota_api.PRIORIDAD_FONDO), 0.5)
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+
+    def test_fondo_cede_mientras_una_interactiva_espera(self):
+        for _ in range(4):
+            self.tomar(cuota_api.PRIORIDAD_INTERACTIVA)
+        self.assertGreater(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        self.ahora += 0.5
+        espera = self.tomar(cuota_api.PRIORIDAD_FONDO)
+        self.assertAlmostEqual(espera, cuota_api.VIGENCIA_ESPERA_INTERACTIVA - 0.5)
+
+    def test_429_pausa_el_fondo_con_retroceso(self):
+        cuota_api.registrar_respuesta(429)
+        self.ahora += 20.0  # Balde lleno otra vez, pero el fondo sigue pausado
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_INTERACTIVA), 0)
+        self.assertEqual(self.tomar(cuota_api.PRIORIDAD_FONDO), 0)
+
+        cuota_api.registrar_respuesta(429)
+        cuota_api.registrar_respuesta(429)  # 10 -> 20 -> 40 s
+        self.ahora += 39.0
+        self.assertAlmostEqual(self.tomar(cuota_api.PRIORIDAD_FONDO), 1.0)
+
+    def test_prioridad_fondo_es_local_al_bloque(self):
+        self.assertEqual(cuota_api.prioridad_actual(), cuota_api.PRIORIDAD_INTERACTIVA)
+        with cuota_api.prioridad_fondo():
+            self.assertEqual(cuota_api.prioridad_actual(), cuota_api.PRIORIDAD_FONDO)
+        self.assertEqual(cuota_api.prioridad_actual(), cuota_api.PRIORIDAD_INTERACTIVA)
+
+# ==============================================================================
+# TRABAJOS EN SEGUNDO PLANO
+# ==============================================================================
+def trabajo_de_prueba(parametros, reportar):
+    # Tipo de trabajo registrado sólo en los tests: informa la prioridad de la cuota
+    reportar({'paso': 1}, 50)
+    if parametros.get('fallar'):
+        raise RuntimeError('falla de prueba')
+    return {'prioridad': cuota_api.prioridad_actual()}
+
+
+@mock.patch.dict(TIPOS_TRABAJO, {'prueba': 'myapp.tests.trabajo_de_prueba'})
+class TrabajosTests(TestCase):
+
+    def test_tomar_reserva_cada_trabajo_una_sola_vez(self):
+        primero = encolar_trabajo('prueba', 'a', {})
+        segundo = encolar_trabajo('prueba', 'b', {})
+
+        self.assertEqual(tomar_trabajo().pk, primero.pk)
+        self.assertEqual(tomar_trabajo().pk, segundo.pk)
+        self.assertIsNone(tomar_trabajo())
+        self.assertEqual(set(TrabajoFondo.objects.values_list('estado', flat=True)), {'en_curso'})
+
+    def test_no_toma_el_reservado_por_otro_proceso(self):
+        primero = encolar_trabajo('prueba', 'a', {})
+        segundo = encolar_trabajo('prueba', 'b', {})
+        TrabajoFondo.objects.filter(pk=primero.pk).update(estado='en_curso')
+        self.assertEqual(tomar_trabajo().pk, segundo.pk)
+
+    def test_encolar_reutiliza_la_clave_y_reintenta_los_fallidos(self):
+        trabajo = encolar_trabajo('prueba', 'a', {'fallar': True})
+        self.assertEqual(encolar_trabajo('prueba', 'a', {}).pk, trabajo.pk)
+
+        self.assertFalse(ejecutar_trabajo(tomar_trabajo()))
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'error')
+
+        trabajo = encolar_trabajo('prueba', 'a', {})
+        self.assertEqual((trabajo.estado, trabajo.progreso, trabajo.parciales), ('pendiente', 0, []))
+
+    def test_worker_ejecuta_con_prioridad_de_fondo(self):
+        trabajo = encolar_trabajo('prueba', 'a', {})
+        call_command('procesar_trabajos', una_vez=True, stdout=io.StringIO(), stderr=io.StringIO())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.parciales, [{'paso': 1}])
+        self.assertEqual(trabajo.resultado, {'prioridad': cuota_api.PRIORIDAD_FONDO})
+
+    def test_limpiar_borra_solo_los_terminados_antiguos(self):
+        for clave in ('viejo', 'reciente', 'viejo_pendiente'):
+            encolar_trabajo('prueba', clave, {})
+        hace_un_mes = timezone.now() - timedelta(days=30)
+        TrabajoFondo.objects.filter(clave='viejo').update(estado='completado', terminado=hace_un_mes)
+        TrabajoFondo.objects.filter(clave='reciente').update(estado='error', terminado=timezone.now())
+        TrabajoFondo.objects.filter(clave='viejo_pendiente').update(creado=hace_un_mes)
+
+        self.assertEqual(limpiar_trabajos(), 1)
+        self.assertEqual(set(TrabajoFondo.objects.values_list('clave', flat=True)), {'reciente', 'viejo_pendiente'})
+
+
+class EvolucionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def pedir(self, **datos):
+        return self.client.post('/clima/fetch_evolucion_ajax/', json.dumps({'region_code': 'ARICA', **datos}),
+                                content_type='application/json')
+
+    def test_modo_trabajo_encola_la_descarga(self):
+        respuesta = self.pedir(modo='trabajo')
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertEqual(respuesta.json()['estado'], 'pendiente')
+        self.assertEqual(TrabajoFondo.objects.get().tipo, 'evolucion')
+        # La misma serie el mismo día reutiliza el trabajo
+        self.assertEqual(self.pedir(modo='trabajo').json()['trabajo_id'], respuesta.json()['trabajo_id'])
+
+    def test_serie_en_cache_se_responde_directo(self):
+        celda = resolver_ubicacion({'region_code': 'ARICA'})['celda']
+        cache.set(clave_cache_evolucion(celda), {'data': [{'year': '2000'}], 'tendencias': {}})
+        respuesta = self.pedir()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['data'], [{'year': '2000'}])
+        self.assertFalse(TrabajoFondo.objects.exists())
+
+    def test_modo_no_valido(self):
+        self.assertEqual(self.pedir(modo='otro').status_code, 400)
+
+# ==============================================================================
+# LECTOR INCREMENTAL DE JSON
+# ==============================================================================
+class LectorJsonTests(TestCase):
+
+    DOCUMENTO = {
+        'latitude': -33.45,
+        'daily_units': {'time': 'iso8601', 'temperature_2m_max': '°C'},
+        'daily': {
+            'time': ['2000-01-01', '2000-01-02', '2000-01-03'],
+            'temperature_2m_max': [21.3, -0.5, None],
+            'precipitation_sum': [0, 1.25e-1, 12],
+        },
+        'nota': 'Ñuñoa "centro" \\ fin',
+        'lista': [[1, 2], {'daily': [9]}],
+    }
+
+    def esperado(self):
+        return [
+            (variable, i, valor)
+            for variable, valores in self.DOCUMENTO['daily'].items()
+            for i, valor in enumerate(valores)
+        ]
+
+    def test_mismo_resultado_con_cualquier_tamaño_de_bloque(self):
+        datos = json.dumps(self.DOCUMENTO, ensure_ascii=False).encode('utf-8')
+        for tamaño in (1, 2, 3, 7, 64, len(datos)):
+            bloques = [datos[i:i + tamaño] for i in range(0, len(datos), tamaño)]
+            with self.subTest(tamaño=tamaño):
+                self.assertEqual(list(iterar_arreglos(bloques)), self.esperado())
+
+    def test_numero_partido_entre_bloques(self):
+        tokens = list(iterar_tokens([b'[12', b'34.5', b', -1e', b'3, nu', b'll]']))
+        self.assertEqual(tokens, [('[', None), ('v', 1234.5), ('v', -1e3), ('v', None), (']', None)])
+
+    def test_string_con_escapes(self):
+        tokens = list(iterar_tokens([b'["a\\"b', b'\\u00f1"]']))
+        self.assertEqual(tokens[1], ('s', 'a"bñ'))
+
+    def test_documento_incompleto(self):
+        with self.assertRaises(ValueError):
+            list(iterar_tokens([b'{"daily": {"time": ["2000-01-01"], "x": [1.5, tru']))
+
+# ==============================================================================
+# TENDENCIAS DE LA SERIE ANUAL
+# ==============================================================================
+class TendenciasTests(TestCase):
+
+    def test_recta_exacta(self):
+        años = list(range(1990, 2000))
+        tendencia = tendencia_lineal(años, [0.02 * a for a in años])
+        self.assertEqual(tendencia['pendiente_decada'], 0.2)
+        self.assertEqual(tendencia['ic95'], [0.2, 0.2])
+        self.assertTrue(tendencia['significativa'])
+        self.assertEqual(tendencia['n'], 10)
+
+    def test_intervalo_de_confianza(self):
+        # b = 0.8, residuos = 3.6, error = sqrt(3.6 / 3 / 10), t(3 g.l.) = 3.182
+        tendencia = tendencia_lineal([2000, 2001, 2002, 2003, 2004], [1, 3, 2, 5, 4])
+        self.assertEqual(tendencia['pendiente_decada'], 8.0)
+        self.assertEqual(tendencia['ic95'], [-3.023, 19.023])
+        self.assertFalse(tendencia['significativa'])
+        self.assertEqual(tendencia['ajuste'], [1.4, 2.2, 3.0, 3.8, 4.6])
+
+    def test_sin_datos_suficientes(self):
+        self.assertIsNone(tendencia_lineal([2000, 2001], [1, 2]))
+        self.assertIsNone(tendencia_lineal([2000, 2000, 2000], [1, 2, 3]))
+
+    def test_tabla_t(self):
+        self.assertEqual(t_critico_95(2), 4.303)
+        self.assertEqual(t_critico_95(30), 2.042)
+        self.assertEqual(t_critico_95(35), 2.042)  # Fila inferior más cercana
+        self.assertEqual(t_critico_95(500), 1.980)
+        self.assertEqual(t_critico_95(5000), 1.960)
+
+    def test_media_movil_y_decadas(self):
+        self.assertEqual(media_movil([1, 2, 3, 4, 5], ventana=2), [None, 1.5, 2.5, 3.5, 4.5])
+        self.assertEqual(medias_decadales([1998, 1999, 2000], [1, 2, 6]), [
+            {'decada': 1990, 'media': 1.5, 'n': 2},
+            {'decada': 2000, 'media': 6.0, 'n': 1},
+        ])
+
+    def test_excluye_años_incompletos(self):
+        chart_data = [
+            {'year': str(a), 'temp_max_avg': 20.0, 'temp_min_avg': 10.0, 'precip_sum': 300.0, 'radiation_sum': 5000.0}
+            for a in range(2000, 2006)
+        ]
+        tendencias = calcular_tendencias(chart_data, hasta_año=2004)
+        self.assertEqual(tendencias['años'], ['2000', '2001', '2002', '2003', '2004'])
+        self.assertEqual(tendencias['temp_max_avg']['tendencia']['pendiente_decada'], 0.0)
+
+# ==============================================================================
+# COMPARACIÓN DE UBICACIONES
+# ==============================================================================
+class ComparacionTests(TestCase):
+
+    def test_codigo_suelto_es_una_ubicacion(self):
+        ubicaciones, error = resolver_ubicaciones({'regiones': 'ARICA', 'comunas': 'PUENTE_ALTO'})
+        self.assertIsNone(error)
+        self.assertEqual([u['codigo'] for u in ubicaciones], ['ARICA', 'PUENTE_ALTO'])
+
+    def test_listas_y_errores(self):
+        ubicaciones, error = resolver_ubicaciones({'regiones': ['ARICA', 'STGO']})
+        self.assertIsNone(error)
+        self.assertEqual(len(ubicaciones), 2)
+
+        self.assertEqual(resolver_ubicaciones({'regiones': 'NO_EXISTE'}), (None, 'Ubicación no válida: NO_EXISTE'))
+        self.assertIsNotNone(resolver_ubicaciones({})[1])
+        demasiadas = {'regiones': ['ARICA'] * (MAX_UBICACIONES_COMPARACION + 1)}
+        self.assertIsNotNone(resolver_ubicaciones(demasiadas)[1])
+
+    def test_errores_por_ubicacion(self):
+        cache.clear()
+        ubicaciones, _error = resolver_ubicaciones({'regiones': ['ARICA', 'MAGALLANES']})
+        periodos, _error = resolver_periodos({'periodos': [{'year': 2000, 'month': 1}]})
+        arica = ubicaciones[0]['lat']
+
+        def consultar(lat, lon, desde, hasta):
+            # Arica: serie con días sin dato; Magallanes: un valor que no es número
+            dias = (hasta - desde).days + 1
+            valor = None if lat == arica else 'x'
+            return {'daily': serie_diaria(desde, dias, temperature_2m_max=[20.0] * (dias - 1) + [valor])}
+
+        with mock.patch('myapp.logica_comparacion.consultar_archivo', consultar):
+            matriz, errores, fuentes = comparar(ubicaciones, periodos)
+
+        self.assertEqual(matriz[0][0]['temp_max_avg'], 20.0)
+        self.assertIsNone(matriz[1][0])
+        self.assertEqual([e['ubicacion'] for e in errores], [ubicaciones[1]['codigo']])
+        self.assertEqual(fuentes['api'], 1)
+
+    def test_detalle_con_dias_sin_dato_en_cache(self):
+        # El año en curso guardado en la caché con los últimos días aún sin dato
+        cache.clear()
+        lat, lon = REGION_COORDS['ARICA']
+        hoy = date.today()
+        limite = (hoy - timedelta(days=1)).isoformat()
+        desde, hasta, _label = calcular_periodo(hoy.year, 0, limite)
+        dias = (hasta - desde).days + 1
+        daily = serie_diaria(desde, dias)
+        cache.set_many({
+            clave: daily['time'] if variable == 'time' else [1.0] * (dias - 3) + [None] * 3
+            for clave, (_seccion, variable) in claves_series(ARCHIVE_URL, lat, lon, desde, hasta, VARIABLES_DIARIAS).items()
+        })
+
+        session = self.client.session
+        session['clima_params'] = {'region_code': 'ARICA', 'region_nombre': 'Arica', 'año': hoy.year,
+                                   'lat': lat, 'lon': lon, 'imagen_fondo': 'ARICA.jpg', 'is_historical': False}
+        session.save()
+        respuesta = self.client.get('/clima/resultados/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['metricas_iniciales']['metrics']['temp_max_avg'], 1.0)
+
+# ==============================================================================
+# PROYECCIÓN DE CAMPOS ('fields')
+# ==============================================================================
+class ProyeccionCamposTests(TestCase):
+
+    DAILY = serie_diaria(
+        date(2000, 1, 1), 2,
+        temperature_2m_max=[10.0, 14.0], temperature_2m_min=[1.0, -1.0], precipitation_sum=[0.5, 2.0],
+    )
+
+    def test_solo_los_campos_pedidos(self):
+        metricas = calculate_metrics(self.DAILY, ['temp_max_avg', 'precip_sum'])
+        self.assertEqual(metricas, {'num_dias': 2, 'temp_max_avg': 12.0, 'precip_sum': 2.5})
+
+    def test_sin_proyeccion_calcula_todo(self):
+        metricas = calculate_metrics(self.DAILY)
+        self.assertEqual(metricas['temp_min_abs'], -1.0)
+        self.assertEqual(metricas['wind_max'], 0.0)  # Variable ausente
+
+    def test_variables_necesarias(self):
+        self.assertEqual(variables_diarias(['temp_max_avg', 'temp_max_abs']), 'temperature_2m_max')
+        self.assertEqual(variables_diarias(['precip_sum', 'temp_min_abs']), 'temperature_2m_min,precipitation_sum')
+        # Sólo 'num_dias': basta con una variable cualquiera
+        self.assertTrue(variables_diarias(['num_dias']))
+
+    def test_resolver_campos(self):
+        self.assertEqual(resolver_campos({}), (None, None))
+        self.assertEqual(resolver_campos({'fields': 'temp_max_avg, num_dias'}), (['temp_max_avg', 'num_dias'], None))
+        campos, error = resolver_campos({'fields': ['temp_max_avg', 'otro']})
+        self.assertIsNone(campos)
+        self.assertIn('otro', error)
+
+# ==============================================================================
+# ÍNDICE DE COBERTURA Y ALMACÉN DIARIO
+# ==============================================================================
+class CoberturaTests(TestCase):
+
+    def test_tramos_en_uno(self):
+        self.assertEqual(list(tramos_en_uno(0)), [])
+        self.assertEqual(list(tramos_en_uno(0b1)), [(0, 0)])
+        self.assertEqual(list(tramos_en_uno(0b1110011010)), [(1, 1), (3, 4), (7, 9)])
+        self.assertEqual(list(tramos_en_uno((1 << 5000) - 1)), [(0, 4999)])
+
+    def test_tramos_coinciden_con_recorrido_bit_a_bit(self):
+        azar = random.Random(3)
+        for _ in range(50):
+            bits = azar.getrandbits(200)
+            esperado, inicio = [], None
+            for i in range(201):
+                if (bits >> i) & 1 and inicio is None:
+                    inicio = i
+                elif not (bits >> i) & 1 and inicio is not None:
+                    esperado.append((inicio, i - 1))
+                    inicio = None
+            self.assertEqual(list(tramos_en_uno(bits)), esperado)
+
+    def test_rangos_en_cero(self):
+        base = FECHA_BASE_COBERTURA
+
+        def dia(i):
+            return base + timedelta(days=i)
+
+        bits = mascara_de_fechas([dia(i) for i in (2, 3, 4, 8)])
+        self.assertEqual(rangos_en_cero(bits, dia(0), dia(9)), [(dia(0), dia(1)), (dia(5), dia(7)), (dia(9), dia(9))])
+        self.assertEqual(rangos_en_cero(bits, dia(2), dia(4)), [])
+        # Antes de la fecha base todo falta
+        antes = base - timedelta(days=3)
+        self.assertEqual(rangos_en_cero(bits, antes, dia(1)), [(antes, base - timedelta(days=1)), (dia(0), dia(1))])
+
+    def test_guardar_marca_solo_los_dias_con_valor(self):
+        daily = serie_diaria(
+            date(2000, 1, 1), 4,
+            temperature_2m_max=[10.0, None, 12.0, 13.0], temperature_2m_min=[1.0, 2.0, 3.0, 4.0],
+        )
+        self.assertEqual(guardar_diario('celda', daily), 4)
+
+        desde, hasta = date(2000, 1, 1), date(2000, 1, 4)
+        self.assertEqual(rangos_faltantes('celda', ['temperature_2m_min'], desde, hasta), [])
+        self.assertEqual(rangos_faltantes('celda', ['temperature_2m_max'], desde, hasta),
+                         [(date(2000, 1, 2), date(2000, 1, 2))])
+        self.assertIsNone(leer_diario('celda', desde, hasta, ['temperature_2m_max']))
+
+        # Una descarga posterior completa el día y el almacén ya responde solo
+        guardar_diario('celda', serie_diaria(date(2000, 1, 2), 1, temperature_2m_max=[11.0]))
+        self.assertEqual(rangos_faltantes('celda', ['temperature_2m_max'], desde, hasta), [])
+        self.assertEqual(leer_diario('celda', desde, hasta, ['temperature_2m_max'])['temperature_2m_max'],
+                         [10.0, 11.0, 12.0, 13.0])
+
+    def test_guardar_respeta_hasta(self):
+        daily = serie_diaria(date(2000, 1, 1), 5, precipitation_sum=[0.0] * 5)
+        self.assertEqual(guardar_diario('celda', daily, hasta=date(2000, 1, 3)), 3)
+        self.assertEqual(RegistroDiario.objects.filter(celda='celda').count(), 3)
+
+# ==============================================================================
+# EVENTOS EXTREMOS
+# ==============================================================================
+class EventosTests(TestCase):
+
+    def test_erosion_descarta_tramos_cortos(self):
+        # Tramos (1, 4), (6, 8) y (10, 11): con 3 días mínimos el último desaparece
+        bits = 0b110111011110
+        self.assertEqual(list(tramos_en_uno(erosionar(bits, 3))), [(1, 2), (6, 6)])
+        self.assertEqual(erosionar(bits, 1), bits)
+        self.assertEqual(erosionar(bits, 5), 0)
+
+    def test_heladas(self):
+        daily = serie_diaria(date(2000, 7, 1), 5, temperature_2m_min=[-1.0, -2.5, 3.0, -0.4, None])
+        eventos = detectar_eventos(daily, ['helada'])
+        self.assertEqual([(e['inicio'], e['fin'], e['dias'], e['valor']) for e in eventos], [
+            (date(2000, 7, 1), date(2000, 7, 2), 2, -2.5),
+            (date(2000, 7, 4), date(2000, 7, 4), 1, -0.4),
+        ])
+
+    def test_coincide_con_recorrido_dia_a_dia(self):
+        azar = random.Random(11)
+        dias = 3 * 365
+        daily = serie_diaria(
+            date(1995, 1, 1), dias,
+            temperature_2m_max=[azar.gauss(25, 5) if azar.random() > 0.02 else None for _ in range(dias)],
+            temperature_2m_min=[azar.gauss(5, 4) for _ in range(dias)],
+            precipitation_sum=[azar.expovariate(1) if azar.random() < 0.1 else 0.0 for _ in range(dias)],
+        )
+        fechas = [date.fromisoformat(t) for t in daily['time']]
+
+        esperados = []
+        for tipo, regla in REGLAS_EVENTOS.items():
+            valores = daily[regla.variable]
+            umbrales = umbrales_mensuales(fechas, valores, regla)
+            inicio = None
+            for i in range(dias + 1):
+                cumple = i < dias and valores[i] is not None and regla.comparacion(valores[i], umbrales[fechas[i].month])
+                if cumple and inicio is None:
+                    inicio = i
+                elif not cumple and inicio is not None:
+                    if i - inicio >= regla.dias_minimos:
+                        esperados.append((tipo, fechas[inicio], fechas[i - 1], i - inicio))
+                    inicio = None
+
+        eventos = detectar_eventos(daily)
+        self.assertTrue(eventos)
+        self.assertEqual([(e['tipo'], e['inicio'], e['fin'], e['dias']) for e in eventos], esperados)
+
+    def pedir(self, **datos):
+        return self.client.post('/clima/fetch_eventos_ajax/', json.dumps({'region_code': 'ARICA', **datos}),
+                                content_type='application/json')
+
+    def test_consulta_de_eventos(self):
+        celda = resolver_ubicacion({'region_code': 'ARICA'})['celda']
+        self.assertEqual(self.pedir().status_code, 404)
+
+        EventoExtremo.objects.bulk_create([
+            EventoExtremo(celda=celda, tipo='helada', inicio=date(2000, 7, 1), fin=date(2000, 7, 2), dias=2, valor=-2.0, umbral=0.0),
+            EventoExtremo(celda=celda, tipo='helada', inicio=date(2001, 7, 1), fin=date(2001, 7, 1), dias=1, valor=-1.0, umbral=0.0),
+            EventoExtremo(celda=celda, tipo='ola_calor', inicio=date(2000, 6, 30), fin=date(2000, 7, 3), dias=4, valor=35.0, umbral=30.0),
+        ])
+        datos = self.pedir(tipo='helada').json()
+        self.assertEqual(datos['resumen']['helada']['eventos'], 2)
+        self.assertEqual(datos['resumen']['helada']['dias_totales'], 3)
+
+        # Se incluyen los eventos que se solapan con el periodo
+        datos = self.pedir(desde='2000-07-02', hasta='2000-12-31').json()
+        self.assertEqual([(e['tipo'], e['inicio']) for e in datos['eventos']],
+                         [('ola_calor', '2000-06-30'), ('helada', '2000-07-01')])
+        self.assertFalse(datos['truncado'])
+        self.assertEqual(self.pedir(tipo='tornado').status_code, 400)
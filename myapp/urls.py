@@ -9,6 +9,12 @@ from . import views
 from .logica_resultado import fetch_clima_data_ajax
 from .logica_pronostico import fetch_pronostico_ajax 
 from .logica_evolucion import fetch_evolucion_ajax
+from .logica_mapa_calor import fetch_mapa_calor_ajax
+from .logica_comparacion import fetch_comparacion_ajax
+from .logica_normales import fetch_anomalias_ajax
+from .logica_eventos import fetch_eventos_ajax
+from .logica_exportacion import exportar_datos
+from .logica_trabajos import estado_trabajo_ajax
 
 # La variable 'urlpatterns' es obligatoria en Django para definir las rutas.
 urlpatterns = [
@@ -18,6 +24,7 @@ urlpatterns = [
     path('resultados/', views.resultados_detalle_view, name='resultados_detalle'),
     path('pronostico/', views.pronostico_detalle_view, name='pronostico_detalle'),
     path('evolucion/', views.evolucion_historica_view, name='evolucion_historica'),
+    path('comparacion/', views.comparacion_view, name='comparacion'),
     
     # --- Rutas AJAX (ahora apuntan a las funciones importadas) ---
     # La lógica de resultados_detalle_view (Anual/Mensual)
@@ -28,4 +35,22 @@ urlpatterns = [
     
     # La lógica de Evolución Histórica (Gráficos)
     path('fetch_evolucion_ajax/', fetch_evolucion_ajax, name='fetch_evolucion_ajax'),
+
+    # Mapa de calor año × mes de las seis métricas (Evolución Histórica)
+    path('fetch_mapa_calor_ajax/', fetch_mapa_calor_ajax, name='fetch_mapa_calor_ajax'),
+
+    # Comparación: N regiones/comunas × M periodos en una sola matriz de métricas
+    path('fetch_comparacion_ajax/', fetch_comparacion_ajax, name='fetch_comparacion_ajax'),
+
+    # Métricas del periodo + anomalías respecto de la normal 1991-2020
+    path('fetch_anomalias_ajax/', fetch_anomalias_ajax, name='fetch_anomalias_ajax'),
+
+    # Eventos extremos (olas de calor, heladas, ...) del índice precalculado
+    path('fetch_eventos_ajax/', fetch_eventos_ajax, name='fetch_eventos_ajax'),
+
+    # Estado de un trabajo en segundo plano (sondeo desde el navegador)
+    path('trabajo/<int:trabajo_id>/', estado_trabajo_ajax, name='estado_trabajo_ajax'),
+
+    # Exportación masiva (CSV / NDJSON / Parquet) del almacén de datos diarios
+    path('exportar/', exportar_datos, name='exportar_datos'),
 ]
\ No newline at end of file
@@ -1,7 +1,6 @@
 # ==============================================================================
 # IMPORTACIONES CLAVE
 # ==============================================================================
-import requests                          
 from django.shortcuts import render, redirect 
 from datetime import date, timedelta 
 import json
@@ -15,48 +14,18 @@ from django.views.decorators.csrf import csrf_exempt
 from .forms import ClimaSearchForm       
 from .models import REGIONES_CHOICES, RegistroClima 
 from django.db.models import ObjectDoesNotExist 
-today = date.today()
 # ==============================================================================
-# MAPEO DE DATOS (COORDENADAS) Y FONDOS REGIONALES (SE MANTIENEN IGUALES)
+# MAPEO DE DATOS (COORDENADAS) Y FONDOS REGIONALES
 # ==============================================================================
-
-REGION_COORDS = {
-    'ARICA': (-18.47, -70.29),          
-    'TARAPACA': (-20.22, -70.14),       
-    'ANTOFAGASTA': (-23.65, -70.40),    
-    'ATACAMA': (-27.36, -70.33),        
-    'COQUIMBO': (-29.91, -71.25),       
-    'VALPARAISO': (-33.04, -71.60),     
-    'METROPOLITANA': (-33.44, -70.67),  
-    'OHIGGINS': (-34.10, -70.74),       
-    'MAULE': (-35.42, -71.67),          
-    'NUBLE': (-36.60, -72.10),          
-    'BIOBIO': (-36.82, -73.05),         
-    'ARAUCANIA': (-38.73, -72.60),      
-    'RIOS': (-39.81, -73.24),           
-    'LAGOS': (-41.47, -72.94),          
-    'AYSEN': (-45.57, -72.08),          
-    'MAGALLANES': (-53.16, -70.91),     
-}
-
-REGION_BACKGROUNDS = {  #editar nombres de imagenes y añadir las imagenes a la carpeta statics/img cn los mismos nombres y en jpg!!!
-    'ARICA': 'ARICA.jpg',
-    'TARAPACA': 'TARAPACA.jpg',
-    'ANTOFAGASTA': 'ANTOGASTA.jpg',
-    'ATACAMA': 'ATACAMA.jpg',
-    'COQUIMBO': 'COQUIMBO.jpg',
-    'VALPARAISO': 'VALPARAISO.jpg',
-    'METROPOLITANA': 'SANTIAGO.jpg',
-    'OHIGGINS': 'OHIGGINS.jpg',
-    'MAULE': 'MAULE.jpg',
-    'NUBLE': 'ÑUBLE.jpg',
-    'BIOBIO': 'BIOBIO.jpg',
-    'ARAUCANIA': 'ARAUCANIA.jpg',
-    'RIOS': 'RIOS.jpg',
-    'LAGOS': 'LAGOS.jpg',
-    'AYSEN': 'AYSEN.jpg',
-    'MAGALLANES': 'MAGALLANES.jpg',
-}
+# Definidos una sola vez en regiones.py (registro único de regiones); se
+# re-exportan aquí para no romper los imports existentes.
+from .regiones import REGION_COORDS, REGION_BACKGROUNDS, cargar_comunas, resolver_comuna, clave_celda
+from .snapshots import contexto_snapshots
+from .logica_resultado import calcular_periodo
+from .logica_normales import respuesta_anomalias
+from .logica_comparacion import metricas_locales
+from .logica_pronostico import pronostico_desde_cache
+from .logica_trabajos import configuracion as configuracion_trabajos
 
 # ==============================================================================
 # VISTA PRINCIPAL (clima_view) - (Se mantiene igual)
@@ -87,9 +56,16 @@ def clima_view(request):
                 lat, lon = REGION_COORDS.get(region_code)
                 region_nombre = dict(REGIONES_CHOICES).get(region_code)
 
+                # Si se eligió una comuna, sus coordenadas reemplazan a las de la capital regional
+                comuna = resolver_comuna(form.cleaned_data.get('comuna'))
+                if comuna:
+                    lat, lon = comuna.lat, comuna.lon
+
                 request.session['clima_params'] = {
                     'region_nombre': region_nombre,
                     'region_code': region_code,
+                    'comuna_code': comuna.codigo if comuna else '',
+                    'comuna_nombre': comuna.nombre if comuna else '',
                     'año': año_buscado,
                     'lat': lat,
                     'lon': lon,
@@ -102,6 +78,7 @@ def clima_view(request):
     context = {
         'form': form,
         'regiones': REGIONES_CHOICES,
+        'comunas': sorted(cargar_comunas().values(), key=lambda c: c.nombre),
         'mensaje_error': mensaje_error,
     }
     return render(request, 'myapp/consulta_clima.html', context)
@@ -131,6 +108,21 @@ def resultados_detalle_view(request):
         current_year = int(year_from_form)
     else:
         current_year = today.year 
+
+    # Métricas anuales del año elegido incrustadas en la página si ya están en la caché
+    # o en el almacén: la primera pintura no espera una segunda petición AJAX.
+    lat, lon = clima_params['lat'], clima_params['lon']
+    celda = clave_celda(lat, lon)
+    metricas_iniciales = None
+    start_date, end_date, periodo_label = calcular_periodo(current_year, 0, limit_date_string)
+    try:
+        metrics = metricas_locales(celda, lat, lon, start_date, end_date)
+        if metrics:
+            metricas_iniciales = respuesta_anomalias(celda, current_year, 0, None, periodo_label, metrics)
+    except (TypeError, ValueError, KeyError) as e:
+        # Una serie guardada con datos raros no debe tumbar la página: el periodo se pide por AJAX
+        print(f"⚠️ Sin métricas iniciales para {celda}: {str(e)}")
+        metricas_iniciales = None
     
     # Preparamos el contexto
     context = {
@@ -138,7 +130,10 @@ def resultados_detalle_view(request):
         'current_year': current_year,     
         'current_month': today.month, 
         'limit_date': limit_date_string,  
-        'forecast_url': 'pronostico_detalle'
+        'forecast_url': 'pronostico_detalle',
+        'metricas_iniciales': metricas_iniciales,
+        # JSON estáticos precalculados de la celda (ver snapshots.py)
+        **contexto_snapshots(celda),
     }
     
     return render(request, 'myapp/resultados_detalle.html', context)
@@ -161,6 +156,9 @@ def pronostico_detalle_view(request):
     context = {
         'data': clima_params,
         'today_date_string': today.strftime('%Y-%m-%d'), # Fecha de hoy para centrar el slider
+        # Métricas de hoy incrustadas si su descarga ya está en la caché (ver resultados_detalle_view)
+        'metricas_iniciales': pronostico_desde_cache(clima_params['lat'], clima_params['lon']),
+        **contexto_snapshots(clave_celda(clima_params['lat'], clima_params['lon']), today),
     }
     
     return render(request, 'myapp/pronostico_detalle.html', context)
@@ -184,5 +182,30 @@ def evolucion_historica_view(request):
     
     context = {
         'data': clima_params,
+        # Con un worker procesar_trabajos activo la descarga larga se hace en modo trabajo
+        'usar_trabajos': configuracion_trabajos()['WORKER_ACTIVO'],
+        **contexto_snapshots(clave_celda(clima_params['lat'], clima_params['lon'])),
+    }
+    return render(request, 'myapp/evolucion_historica.html', context)
+
+
+# ==============================================================================
+# VISTA (PÁGINA): Comparación de Regiones y Periodos
+# ==============================================================================
+MESES_COMPARACION = [
+    (1, 'Enero'), (2, 'Febrero'), (3, 'Marzo'), (4, 'Abril'), (5, 'Mayo'), (6, 'Junio'),
+    (7, 'Julio'), (8, 'Agosto'), (9, 'Septiembre'), (10, 'Octubre'), (11, 'Noviembre'), (12, 'Diciembre'),
+]
+
+def comparacion_view(request):
+    """
+    Página de comparación: N regiones × M periodos en una sola petición AJAX.
+    No depende de la sesión (no requiere pasar por el formulario).
+    """
+    context = {
+        'regiones': REGIONES_CHOICES,
+        'meses': MESES_COMPARACION,
+        # Por defecto el último año completo
+        'año_defecto': date.today().year - 1,
     }
-    return render(request, 'myapp/evolucion_historica.html', context)
\ No newline at end of file
+    return render(request, 'myapp/comparacion.html', context)
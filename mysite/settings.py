@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,6 +47,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.perfilado.PerfiladoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -56,29 +58,79 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Cada plantilla se compila una sola vez por proceso; precalentar()
+            # (myapp/arranque.py) las compila todas antes de recibir tráfico.
+            # En DEBUG el autoreload vacía esta caché al editar una plantilla.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
+# wsgi.py / asgi.py precalientan cada proceso (rutas, plantillas, comunas y
+# manifiesto de snapshots) antes de que reciba tráfico. Ver myapp/arranque.py
+# y 'python manage.py perfil_arranque'.
+PRECALENTAR_AL_INICIAR = True
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite para desarrollo (por defecto). Perfil de producción: PostgreSQL con
+# CLIMA_DB_MOTOR=postgresql (requiere psycopg); ahí la tabla del almacén diario
+# se particiona por año, con índice BRIN por fecha, y se carga con COPY (ver
+# myapp/particiones.py y myapp/almacen.py). Para probarlo en local:
+#   docker run -d --name clima-pg -p 5432:5432 -e POSTGRES_USER=clima -e POSTGRES_PASSWORD=clima postgres:16
+#   CLIMA_DB_MOTOR=postgresql CLIMA_DB_CLAVE=clima python manage.py migrate
+# Las conexiones se reutilizan durante CLIMA_DB_CONN_MAX_AGE segundos (0 = una por petición).
+
+CONN_MAX_AGE_BD = int(os.environ.get('CLIMA_DB_CONN_MAX_AGE', 60))
+
+if os.environ.get('CLIMA_DB_MOTOR') == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('CLIMA_DB_NOMBRE', 'clima'),
+            'USER': os.environ.get('CLIMA_DB_USUARIO', 'clima'),
+            'PASSWORD': os.environ.get('CLIMA_DB_CLAVE', ''),
+            'HOST': os.environ.get('CLIMA_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('CLIMA_DB_PUERTO', '5432'),
+            'CONN_MAX_AGE': CONN_MAX_AGE_BD,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                # WAL (las lecturas no esperan a las escrituras de las descargas en paralelo ni
+                # de los comandos de fondo) se activa una sola vez en la migración 0009 y queda
+                # en el archivo; aquí sólo lo que vale por conexión: synchronous=NORMAL basta con WAL
+                'init_command': 'PRAGMA synchronous=NORMAL',
+                # Las transacciones toman el bloqueo de escritura al empezar: dos escritores
+                # esperan su turno (timeout = busy_timeout de SQLite) en vez de fallar con
+                # 'database is locked'
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+            'CONN_MAX_AGE': CONN_MAX_AGE_BD,
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
-}
 
 
 # Password validation
@@ -117,8 +169,57 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Destino de collectstatic y de los snapshots JSON de 'publicar_snapshots'
+# (STATIC_ROOT/snapshots, ver myapp/snapshots.py); en producción lo sirve nginx.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-STATIC_URL = '/static/'
\ No newline at end of file
+STATIC_URL = '/static/'
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Guarda las respuestas de Open-Meteo por celda de grilla (ver myapp/cliente_api.py).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'clima-open-meteo',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Cuota compartida de peticiones a Open-Meteo (ver myapp/cuota_api.py).
+# El archivo SQLite lo comparten todos los procesos del servidor y los comandos.
+
+CUOTA_OPEN_METEO = {
+    'RUTA': BASE_DIR / 'cuota_open_meteo.sqlite3',
+    'TASA': 5.0,
+    'CAPACIDAD': 20.0,
+    'RESERVA_INTERACTIVA': 5.0,
+}
+
+# Cola de trabajos en segundo plano (ver myapp/logica_trabajos.py). Poner
+# 'WORKER_ACTIVO': True sólo si 'python manage.py procesar_trabajos' corre bajo un
+# supervisor (systemd, supervisord...); si no, la evolución histórica se descarga en
+# modo directo. Los trabajos terminados se borran tras 'DIAS_RETENCION' días.
+
+TRABAJOS_FONDO = {
+    'WORKER_ACTIVO': False,
+    'DIAS_RETENCION': 7,
+}
+
+# Perfilado a pedido de peticiones (ver myapp/perfilado.py). Un usuario staff lo
+# activa con la cabecera 'X-Perfilar: 1' o con '?perfilar=1'; 'MUESTREO' perfila
+# además esa fracción de las peticiones a 'RUTAS'. Listado y descarga en /admin/perfiles/.
+
+PERFILADO = {
+    'DIRECTORIO': BASE_DIR / 'perfiles',
+    'MUESTREO': 0.0,
+    'RUTAS': ['/clima/'],
+    'CONSERVAR': 200,
+}
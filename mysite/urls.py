@@ -10,11 +10,18 @@ The `urlpatterns` list routes URLs to views. For more information please see:
 from django.contrib import admin
 from django.urls import path, include # 'include' es esencial para enlazar las rutas de las apps.
 
+from myapp.perfilado import lista_perfiles_view, descargar_perfil_view
+
 # La lista 'urlpatterns' mapea patrones de URL a acciones.
 urlpatterns = [
     # --------------------------------------------------------------------------
     # RUTA DEL ADMINISTRADOR DE DJANGO
     # --------------------------------------------------------------------------
+    # Perfiles de peticiones (myapp/perfilado.py). Van antes que 'admin/' y, con
+    # admin_view, exigen sesión de un usuario staff.
+    path('admin/perfiles/', admin.site.admin_view(lista_perfiles_view), name='perfiles'),
+    path('admin/perfiles/<str:nombre>/', admin.site.admin_view(descargar_perfil_view), name='descargar_perfil'),
+
     # Mapea la URL '/admin/' al panel de administración de Django.
     path('admin/', admin.site.urls),
     
@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+# Deja el proceso listo (rutas, plantillas, registro de comunas) antes de que
+# el servidor le envíe la primera petición. Ver myapp/arranque.py.
+from django.conf import settings
+
+if getattr(settings, 'PRECALENTAR_AL_INICIAR', True):
+    from myapp.arranque import precalentar
+    precalentar()